@@ -11,6 +11,9 @@
 #define MAX_TEXT 512
 #define MAX_NOTIFICATION 1024
 #define MAX_NOTIFICATIONS 100
+// Shards de notificações (mesmos valores de Configuracao.py): o tópico é publicado na porta base + shard
+#define NOTIFICATION_SHARDS 4
+#define SHARD_PUBLIC_BASE_PORT 6030
 
 typedef struct {
     char username[MAX_USERNAME];
@@ -38,6 +41,17 @@ void write_log(User *user, const char *level, const char *msg) {
     fflush(user->logfile);
 }
 
+// Shard de notificações de um tópico: CRC32 (o mesmo do zlib) % NOTIFICATION_SHARDS, como no proxy
+int notification_shard(const char *topic) {
+    unsigned int crc = 0xFFFFFFFFu;
+    for (const unsigned char *p = (const unsigned char*)topic; *p; p++) {
+        crc ^= *p;
+        for (int bit = 0; bit < 8; bit++)
+            crc = (crc >> 1) ^ (0xEDB88320u & (0u - (crc & 1u)));
+    }
+    return (int)((crc ^ 0xFFFFFFFFu) % NOTIFICATION_SHARDS);
+}
+
 // NOTIFICATION LISTENER THREAD
 void* notification_listener(void *arg) {
     User *user = (User*)arg;
@@ -84,7 +98,15 @@ int user_signup(User *user) {
             snprintf(user->notifyTopic, sizeof(user->notifyTopic), "%s", json_string_value(json_object_get(reply, "topic")));
             printf("Usuário '%s' cadastrado! ID=%d, tópico='%s'\n", user->username, user->userId, user->notifyTopic);
 
-            zmq_setsockopt(user->notificationSocket, ZMQ_SUBSCRIBE, user->notifyTopic, strlen(user->notifyTopic));
+            // Notificações chegam pelo encaminhador do shard do tópico
+            char endpoint[64];
+            snprintf(endpoint, sizeof(endpoint), "tcp://localhost:%d",
+                     SHARD_PUBLIC_BASE_PORT + notification_shard(user->notifyTopic));
+            zmq_connect(user->notificationSocket, endpoint);
+            // O espaço delimita o tópico: evita que 'notificacao_user_1' receba as do usuário 10
+            char subscription[sizeof(user->notifyTopic) + 1];
+            snprintf(subscription, sizeof(subscription), "%s ", user->notifyTopic);
+            zmq_setsockopt(user->notificationSocket, ZMQ_SUBSCRIBE, subscription, strlen(subscription));
 
             // LOG INDIVIDUAL
             char logfname[MAX_USERNAME + 8];
@@ -409,7 +431,6 @@ int main() {
     user.reqSocket = zmq_socket(user.context, ZMQ_REQ);
     zmq_connect(user.reqSocket, "tcp://localhost:5555");
     user.notificationSocket = zmq_socket(user.context, ZMQ_SUB);
-    zmq_connect(user.notificationSocket, "tcp://localhost:6010");
 
     if (!user_signup(&user)) {
         printf("Erro ao cadastrar usuário.\n");
@@ -3,14 +3,19 @@ import org.json.JSONObject;
 import org.zeromq.ZMQ;
 
 import java.io.IOException;
+import java.nio.charset.StandardCharsets;
 import java.text.SimpleDateFormat;
 import java.util.*;
 import java.util.concurrent.locks.ReentrantLock;
 import java.util.logging.*;
 import java.util.logging.Formatter;
+import java.util.zip.CRC32;
 
 public class Usuario {
     private static final int MAX_NOTIFICATIONS = 100;
+    // Shards de notificações (mesmos valores de Configuracao.py): o tópico é publicado na porta base + shard
+    private static final int NOTIFICATION_SHARDS = 4;
+    private static final int SHARD_PUBLIC_BASE_PORT = 6030;
     private String username;
     private int userId;
     private String notifyTopic;
@@ -44,7 +49,6 @@ public class Usuario {
         reqSocket = context.socket(ZMQ.REQ);
         reqSocket.connect("tcp://localhost:5555");
         notifSocket = context.socket(ZMQ.SUB);
-        notifSocket.connect("tcp://localhost:6010");
 
         if (!signupUser(scanner)) {
             System.err.println("Erro ao cadastrar usuário!");
@@ -104,6 +108,13 @@ public class Usuario {
         System.out.println("7. Sair");
     }
 
+    // Shard de notificações de um tópico: CRC32 % NOTIFICATION_SHARDS, como no proxy
+    private static int notificationShard(String topic) {
+        CRC32 crc = new CRC32();
+        crc.update(topic.getBytes(StandardCharsets.UTF_8));
+        return (int) (crc.getValue() % NOTIFICATION_SHARDS);
+    }
+
     // ==== SIGNUP ====
     private boolean signupUser(Scanner scanner) {
         while (true) {
@@ -118,7 +129,10 @@ public class Usuario {
             if (resp.getInt("ret") == 0) {
                 userId = resp.getInt("id");
                 notifyTopic = resp.getString("topic");
-                notifSocket.subscribe(notifyTopic.getBytes());
+                // Notificações chegam pelo encaminhador do shard do tópico (mesmo cálculo de Configuracao.py)
+                notifSocket.connect("tcp://localhost:" + (SHARD_PUBLIC_BASE_PORT + notificationShard(notifyTopic)));
+                // O espaço delimita o tópico: evita que 'notificacao_user_1' receba as do usuário 10
+                notifSocket.subscribe((notifyTopic + " ").getBytes(StandardCharsets.UTF_8));
                 log("INFO", "Usuário '" + username + "' cadastrado com sucesso. ID: " + userId + ", tópico: " + notifyTopic);
                 System.out.printf("Usuário '%s' cadastrado! ID=%d, tópico='%s'\n", username, userId, notifyTopic);
                 return true;
@@ -0,0 +1,415 @@
+# Armazenamento em camadas do banco de dados: janela quente em memória e segmentos frios em disco
+import bisect
+import glob
+import heapq
+import json
+import logging
+import mmap
+import os
+from collections import namedtuple
+
+import Cache
+
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024  # Tamanho a partir do qual um segmento é selado e outro é aberto
+SPARSE_INDEX_INTERVAL = 64  # Registros por bloco frio (uma entrada do índice esparso por bloco)
+BLOCK_CACHE_SIZE = 64  # Blocos frios decodificados mantidos em memória (leituras repetidas da mesma página)
+
+# Entrada do índice esparso: intervalo de chaves do bloco e sua posição no segmento
+BlocoFrio = namedtuple("BlocoFrio", ["first_key", "last_key", "segment", "offset", "length"])
+
+
+class Segmentos:
+    """
+    Conjunto de arquivos de segmento somente-anexação ("<prefixo>-000001.seg", ...).
+    Cada bloco é gravado uma única vez e nunca alterado; o segmento atual é selado ao atingir
+    SEGMENT_MAX_BYTES. A leitura usa mmap: só as páginas do bloco lido são trazidas do disco.
+    Segmentos de execuções anteriores são mantidos: scan() percorre os seus blocos para que
+    os armazenamentos reconstruam os índices, e os novos blocos são anexados ao último segmento.
+    """
+
+    def __init__(self, directory, prefix):
+        self.directory = directory
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+        self.files = []  # número do segmento -> arquivo aberto
+        self.sizes = []
+        self.maps = []  # número do segmento -> mmap (refeito quando o segmento cresce)
+        for path in sorted(glob.glob(os.path.join(directory, f"{prefix}-*.seg"))):
+            self.files.append(open(path, "ab+"))
+            self.sizes.append(os.path.getsize(path))
+            self.maps.append(None)
+        if not self.files:
+            self._open_segment()
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, f"{self.prefix}-{len(self.files) + 1:06d}.seg")
+        self.files.append(open(path, "ab+"))
+        self.sizes.append(0)
+        self.maps.append(None)
+
+    def append(self, data):
+        """
+        Anexa um bloco ao segmento atual. Retorna (número do segmento, offset).
+        """
+        if self.sizes[-1] + len(data) > SEGMENT_MAX_BYTES and self.sizes[-1] > 0:
+            self.files[-1].close()  # Segmento selado: a partir daqui só é lido pelo mmap
+            self._open_segment()
+        segment = len(self.files) - 1
+        offset = self.sizes[segment]
+        self.files[segment].write(data)
+        self.files[segment].flush()
+        self.sizes[segment] += len(data)
+        return segment, offset
+
+    def scan(self):
+        """
+        Percorre os blocos já gravados, em ordem de gravação: (segmento, offset, tamanho, conteúdo).
+        Os blocos são JSON ASCII (json.dumps) gravados em sequência, então offsets em bytes e em
+        caracteres coincidem. Um bloco incompleto no fim de um segmento (gravação interrompida) é descartado.
+        """
+        decoder = json.JSONDecoder()
+        for segment, size in enumerate(self.sizes):
+            if size == 0:
+                continue
+            with open(self.files[segment].name, "rb") as f:
+                text = f.read().decode('ascii', errors='replace')
+            offset = 0
+            while offset < size:
+                try:
+                    record, end = decoder.raw_decode(text, offset)
+                except ValueError:
+                    logging.warning(f"[ARMAZENAMENTO] Bloco incompleto descartado em {self.files[segment].name} "
+                                    f"(offset {offset}, {size - offset} bytes)")
+                    self.files[segment].truncate(offset)
+                    self.sizes[segment] = offset
+                    break
+                yield segment, offset, end - offset, record
+                offset = end
+
+    def read(self, segment, offset, length):
+        """
+        Lê e decodifica um bloco JSON. O recorte do mmap é feito sem cópia (memoryview);
+        só o próprio bloco é copiado para o decodificador.
+        """
+        segment_map = self.maps[segment]
+        if segment_map is None or len(segment_map) < offset + length:
+            with open(self.files[segment].name, "rb") as f:
+                segment_map = self.maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with memoryview(segment_map) as view, view[offset:offset + length] as block:
+            return json.loads(bytes(block))
+
+    def disk_usage(self):
+        return sum(self.sizes)
+
+
+class Diario:
+    """
+    Registro somente-anexação (uma linha JSON por alteração) dos dados do banco que não ficam nos
+    segmentos: cadastros, seguidores e notificações. Cada alteração é gravada ao ser feita e o
+    registro é relido por inteiro no início. Uma linha incompleta no fim (gravação interrompida) é descartada.
+    """
+
+    def __init__(self, directory, name="registro.ndjson"):
+        os.makedirs(directory, exist_ok=True)
+        self.file = open(os.path.join(directory, name), "ab+")
+
+    def records(self):
+        """
+        Percorre os registros já gravados, em ordem de gravação.
+        """
+        self.file.seek(0)
+        offset = 0
+        for line in self.file:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("linha sem fim")  # Cada registro é gravado junto com o seu fim de linha
+                record = json.loads(line)
+            except ValueError:
+                logging.warning(f"[ARMAZENAMENTO] Registro incompleto descartado em {self.file.name} (offset {offset})")
+                self.file.truncate(offset)
+                return
+            offset += len(line)
+            yield record
+
+    def append(self, *records):
+        self.file.write(b"".join(json.dumps(record).encode('utf-8') + b"\n" for record in records))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ArmazenamentoPosts:
+    """
+    Posts ordenados por chave (HLC, id do servidor). Os mais recentes ficam em memória (janela quente,
+    limitada a hot_limit); ao exceder o limite, os mais antigos vão para os segmentos em blocos de
+    SPARSE_INDEX_INTERVAL posts, e só o índice esparso (intervalo de chaves de cada bloco) fica em memória.
+    Posts atrasados (chave menor que a de blocos já gravados) são aceitos: a leitura intercala os
+    blocos pelo intervalo de chaves.
+    """
+
+    def __init__(self, directory, hot_limit, spill_batch, key):
+        self.segments = Segmentos(directory, "posts")
+        self.hot_limit = hot_limit
+        self.spill_batch = spill_batch  # Posts enviados ao disco de uma vez quando a janela transborda
+        self.key = key
+        self.hot = []  # posts quentes, ordenados por chave
+        self.hot_keys = []
+        self.blocks = []  # índice esparso, ordenado pela última chave de cada bloco
+        self.block_last_keys = []
+        # Menor primeira chave de blocks[i:]: com posts atrasados os intervalos dos blocos se sobrepõem,
+        # e get() para no primeiro bloco a partir do qual nenhum começa antes da chave procurada
+        self.block_min_first_keys = []
+        self.block_cache = Cache.CacheLRU("blocos_posts", capacity=BLOCK_CACHE_SIZE, ttl=float("inf"))
+        self.cold_count = 0
+        # Blocos de execuções anteriores: só o índice esparso volta à memória
+        for segment, offset, length, records in self.segments.scan():
+            self._index_block(BlocoFrio(key(records[0]), key(records[-1]), segment, offset, length))
+            self.cold_count += len(records)
+
+    def __len__(self):
+        return self.cold_count + len(self.hot)
+
+    def add(self, post):
+        key = self.key(post)
+        position = bisect.bisect_right(self.hot_keys, key)
+        self.hot_keys.insert(position, key)
+        self.hot.insert(position, post)
+        if len(self.hot) > self.hot_limit:
+            self._spill(self.spill_batch)
+
+    def extend(self, posts):
+        """
+        Carga em massa: intercala os posts (em qualquer ordem) com a janela quente de uma só vez
+        e grava o excedente em blocos, sem a inserção ordenada post a post de add().
+        """
+        posts = sorted(posts, key=self.key)
+        self.hot = list(heapq.merge(self.hot, posts, key=self.key))
+        self.hot_keys = [self.key(post) for post in self.hot]
+        if len(self.hot) > self.hot_limit:
+            self._spill(len(self.hot) - self.hot_limit)
+
+    def _spill(self, count):
+        """
+        Grava os "count" posts mais antigos da janela quente em blocos imutáveis e os retira da memória.
+        """
+        batch, self.hot = self.hot[:count], self.hot[count:]
+        batch_keys, self.hot_keys = self.hot_keys[:count], self.hot_keys[count:]
+        for start in range(0, len(batch), SPARSE_INDEX_INTERVAL):
+            records = batch[start:start + SPARSE_INDEX_INTERVAL]
+            keys = batch_keys[start:start + SPARSE_INDEX_INTERVAL]
+            data = json.dumps(records).encode('utf-8')
+            segment, offset = self.segments.append(data)
+            self._index_block(BlocoFrio(keys[0], keys[-1], segment, offset, len(data)))
+        self.cold_count += len(batch)
+
+    def _index_block(self, block):
+        position = bisect.bisect_right(self.block_last_keys, block.last_key)
+        self.block_last_keys.insert(position, block.last_key)
+        self.blocks.insert(position, block)
+        # Em geral o bloco novo é o último: só ele e os anteriores com primeira chave maior mudam
+        following = self.block_min_first_keys[position] if position < len(self.block_min_first_keys) else None
+        self.block_min_first_keys.insert(position, block.first_key if following is None else min(block.first_key, following))
+        for i in range(position - 1, -1, -1):
+            if self.block_min_first_keys[i] <= block.first_key:
+                break
+            self.block_min_first_keys[i] = block.first_key
+
+    def _load(self, block):
+        return self.block_cache.get_or_load(
+            (block.segment, block.offset),
+            lambda: self.segments.read(block.segment, block.offset, block.length))
+
+    def get(self, key):
+        """
+        Post com a chave informada (janela quente ou bloco frio), ou None.
+        """
+        position = bisect.bisect_left(self.hot_keys, key)
+        if position < len(self.hot_keys) and self.hot_keys[position] == key:
+            return self.hot[position]
+        for i in range(bisect.bisect_left(self.block_last_keys, key), len(self.blocks)):
+            if self.block_min_first_keys[i] > key:
+                break  # Nenhum bloco daqui em diante começa antes da chave
+            block = self.blocks[i]
+            if block.first_key <= key:
+                for post in self._load(block):
+                    if self.key(post) == key:
+                        return post
+        return None
+
+    def descending(self, before=None):
+        """
+        Percorre os posts do mais recente para o mais antigo, a partir de antes da chave "before".
+        Os blocos frios são lidos sob demanda: um post só é entregue quando nenhum bloco ainda
+        não lido pode conter chave maior que a dele.
+        """
+        hot_index = (len(self.hot_keys) if before is None else bisect.bisect_left(self.hot_keys, before)) - 1
+        unread = [block for block in self.blocks if before is None or block.first_key < before]
+        cold = []  # heap de máximo dos posts de blocos já lidos: (chave negada, desempate, post)
+        loaded = 0
+        while True:
+            best = self.hot_keys[hot_index] if hot_index >= 0 else None
+            if cold:
+                cold_key = tuple(-k for k in cold[0][0])
+                if best is None or cold_key > best:
+                    best = cold_key
+            if unread and (best is None or unread[-1].last_key >= best):
+                for post in self._load(unread.pop()):
+                    key = self.key(post)
+                    if before is None or key < before:
+                        heapq.heappush(cold, (tuple(-k for k in key), loaded, post))
+                        loaded += 1
+                continue
+            if best is None:
+                return
+            if hot_index >= 0 and self.hot_keys[hot_index] == best:
+                yield self.hot[hot_index]
+                hot_index -= 1
+            else:
+                yield heapq.heappop(cold)[2]
+
+    def flush(self):
+        """
+        Grava toda a janela quente nos segmentos (encerramento): o próximo início recupera todos os posts.
+        """
+        if self.hot:
+            self._spill(len(self.hot))
+
+    def ascending(self, after=None):
+        """
+        Percorre os posts do mais antigo para o mais recente, a partir de depois da chave "after".
+        Simétrico a descending(): um bloco frio só é lido quando pode conter a próxima chave,
+        então quem para de iterar (ex.: após uma página) não lê os blocos seguintes.
+        """
+        hot_index = 0 if after is None else bisect.bisect_right(self.hot_keys, after)
+        # Blocos ainda não lidos, com o de menor primeira chave no fim da lista
+        unread = sorted((block for block in self.blocks if after is None or block.last_key > after),
+                        key=lambda block: block.first_key, reverse=True)
+        cold = []  # heap de mínimo dos posts de blocos já lidos: (chave, desempate, post)
+        loaded = 0
+        while True:
+            best = self.hot_keys[hot_index] if hot_index < len(self.hot_keys) else None
+            if cold and (best is None or cold[0][0] < best):
+                best = cold[0][0]
+            if unread and (best is None or unread[-1].first_key <= best):
+                for post in self._load(unread.pop()):
+                    key = self.key(post)
+                    if after is None or key > after:
+                        heapq.heappush(cold, (key, loaded, post))
+                        loaded += 1
+                continue
+            if best is None:
+                return
+            if hot_index < len(self.hot_keys) and self.hot_keys[hot_index] == best:
+                yield self.hot[hot_index]
+                hot_index += 1
+            else:
+                yield heapq.heappop(cold)[2]
+
+
+class ArmazenamentoConversas:
+    """
+    Mensagens privadas por conversa (par de usuários, sem direção), ordenadas por HLC.
+    Cada conversa mantém em memória no máximo hot_limit mensagens; o excedente mais antigo
+    vai para os segmentos como um bloco, e a conversa guarda apenas o índice esparso dos seus blocos.
+    Cada bloco registra a conversa a que pertence, para o índice ser reconstruído a partir dos segmentos.
+    """
+
+    def __init__(self, directory, hot_limit):
+        self.segments = Segmentos(directory, "mensagens")
+        self.hot_limit = hot_limit
+        self.hot = {}  # conversa -> ([hlc, ...], [[mensagem, timestamp, sender], ...])
+        self.blocks = {}  # conversa -> [BlocoFrio, ...] (chaves = HLCs)
+        self.block_cache = Cache.CacheLRU("blocos_mensagens", capacity=BLOCK_CACHE_SIZE, ttl=float("inf"))
+        # Blocos de execuções anteriores ([hlcs, mensagens, [usuário, usuário]]), na ordem de gravação
+        for segment, offset, length, (hlcs, _, users) in self.segments.scan():
+            self.blocks.setdefault(tuple(users), []).append(BlocoFrio(hlcs[0], hlcs[-1], segment, offset, length))
+
+    def conversations(self):
+        """
+        Conversas armazenadas (pares de usuários), em memória ou só em disco.
+        """
+        return set(self.hot) | set(self.blocks)
+
+    def last(self, a, b):
+        """
+        Última mensagem da conversa (hlc, [mensagem, timestamp, sender]), ou None.
+        O bloco gravado por último nem sempre é o mais recente (a carga em massa grava histórico
+        antigo depois de blocos mais novos): vale o bloco de maior HLC, comparado à janela quente.
+        """
+        conversation = self.conversation(a, b)
+        hlcs, entries = self.hot.get(conversation, ([], []))
+        candidates = [(hlcs[-1], entries[-1])] if hlcs else []
+        blocks = self.blocks.get(conversation)
+        if blocks:
+            block_hlcs, block_entries, _ = self._load(max(blocks, key=lambda block: block.last_key))
+            candidates.append((block_hlcs[-1], block_entries[-1]))
+        return max(candidates, key=lambda item: item[0]) if candidates else None
+
+    def _load(self, block):
+        return self.block_cache.get_or_load(
+            (block.segment, block.offset),
+            lambda: self.segments.read(block.segment, block.offset, block.length))
+
+    @staticmethod
+    def conversation(a, b):
+        return (a, b) if a <= b else (b, a)
+
+    def insert(self, a, b, hlc, entry):
+        """
+        Insere a mensagem na posição do seu HLC.
+        """
+        hlcs, entries = self.hot.setdefault(self.conversation(a, b), ([], []))
+        position = bisect.bisect_right(hlcs, hlc)
+        hlcs.insert(position, hlc)
+        entries.insert(position, entry)
+        if len(entries) > self.hot_limit:
+            self._spill(self.conversation(a, b))
+
+    def extend(self, a, b, messages):
+        """
+        Carga em massa de uma conversa: messages é uma lista de (hlc, [mensagem, timestamp, sender]).
+        O histórico que não cabe na janela quente vai para o disco em blocos de até hot_limit mensagens.
+        """
+        conversation = self.conversation(a, b)
+        hlcs, entries = self.hot.get(conversation, ([], []))
+        merged = list(heapq.merge(zip(hlcs, entries), sorted(messages, key=lambda item: item[0]),
+                                  key=lambda item: item[0]))
+        cold = len(merged) - self.hot_limit // 2 if len(merged) > self.hot_limit else 0
+        for start in range(0, cold, self.hot_limit):
+            block = merged[start:min(cold, start + self.hot_limit)]
+            self._write_block(conversation, [hlc for hlc, _ in block], [entry for _, entry in block])
+        self.hot[conversation] = ([hlc for hlc, _ in merged[cold:]], [entry for _, entry in merged[cold:]])
+
+    def flush(self):
+        """
+        Grava as janelas quentes de todas as conversas nos segmentos (encerramento).
+        """
+        for conversation, (hlcs, entries) in self.hot.items():
+            if entries:
+                self._write_block(conversation, hlcs, entries)
+        self.hot = {}
+
+    def _spill(self, conversation):
+        hlcs, entries = self.hot[conversation]
+        count = len(entries) - self.hot_limit // 2
+        self._write_block(conversation, hlcs[:count], entries[:count])
+        self.hot[conversation] = (hlcs[count:], entries[count:])
+
+    def _write_block(self, conversation, hlcs, entries):
+        data = json.dumps([hlcs, entries, list(conversation)]).encode('utf-8')
+        segment, offset = self.segments.append(data)
+        self.blocks.setdefault(conversation, []).append(BlocoFrio(hlcs[0], hlcs[-1], segment, offset, len(data)))
+
+    def read(self, a, b):
+        """
+        Todas as mensagens da conversa, na ordem de HLC.
+        """
+        conversation = self.conversation(a, b)
+        hlcs, entries = self.hot.get(conversation, ([], []))
+        runs = []
+        for block in self.blocks.get(conversation, []):
+            block_hlcs, block_entries, _ = self._load(block)
+            runs.append(list(zip(block_hlcs, block_entries)))
+        runs.append(list(zip(hlcs, entries)))  # Por último: em empates de HLC, as mais antigas vêm antes
+        return [entry for _, entry in heapq.merge(*runs, key=lambda item: item[0])]
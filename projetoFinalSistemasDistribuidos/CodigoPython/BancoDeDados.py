@@ -1,184 +1,865 @@
+import argparse
+import bisect
+import heapq
+import itertools
+import json
 import logging
 import threading
+import time
+from collections import deque
+from datetime import datetime
 
 import zmq
 
+import Armazenamento
+import CargaEmMassa
+import Compressao
+import Configuracao
+import Indice
+import Perfilador
+import RegistroUsuarios
+import Relogio
 import ReturnCodes
 
-# Configuração global de logging: salva em arquivo e exibe no terminal
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("../banco.log"),
-        logging.StreamHandler()  # Agora os logs aparecem no terminal em tempo real!
-    ]
-)
-logging.info("Iniciando Banco de Dados...")
-
-# Inicialização do contexto ZeroMQ e criação do socket REP (resposta) na porta 6011
-context = zmq.Context()
-socket = context.socket(zmq.REP)
-socket.bind("tcp://*:6011")
-
-# Estrutura interna: banco de dados em memória simulando as tabelas necessárias
+# Contexto e sockets do banco, criados em start().
+# O ROUTER permite várias requisições em andamento por servidor (clientes DEALER com id de requisição)
+# e continua compatível com clientes REQ: o envelope recebido é devolvido intacto na resposta.
+context = None
+socket = None
+# Socket PUB de eventos de invalidação: avisa os caches dos servidores sobre cada alteração
+events_pub = None
+# Socket REP administrativo local (perfilamento sob demanda), acionado pelo canal de controle do proxy
+admin_socket = None
+perfilador = Perfilador.Perfilador("banco")
+
+# Armazenamento em camadas: só as janelas quentes de posts e de cada conversa ficam em memória;
+# o histórico mais antigo vai para segmentos somente-anexação em disco, lidos via mmap
+STORAGE_DIR = "../armazenamento"
+HOT_POSTS_LIMIT = 5000  # Posts mais recentes mantidos em memória
+POST_SPILL_BATCH = 1024  # Posts levados ao disco de uma vez quando a janela quente transborda
+HOT_MESSAGES_PER_CONVERSATION = 200  # Mensagens mais recentes de cada conversa mantidas em memória
+# Cadastros, seguidores e notificações não ficam nos segmentos: vão para um registro somente-anexação,
+# relido no início. No encerramento (shutdown), as janelas quentes e as mensagens não lidas também são gravadas
+journal = None  # Armazenamento.Diario, criado em open_storage()
+# Serializa o atendimento e o encerramento (as janelas quentes não podem mudar enquanto são gravadas)
+database_lock = threading.Lock()
+
+
+def post_order(post):
+    """
+    Chave de ordenação (e identificação interna) dos posts: HLC atribuído pelo servidor,
+    desempatado pelo id do servidor.
+    """
+    return post["hlc"], post["server_id"]
+
+
+# Estrutura interna: banco de dados simulando as tabelas necessárias
 database = {
-    "usernames": {},  # username -> id do usuário
+    "usernames": {},  # username (grafia do cadastro) -> id do usuário
+    # Usernames sem distinção de maiúsculas (chave normalizada -> grafia do cadastro) e filtro de Bloom para os servidores
+    "username_registry": RegistroUsuarios.RegistroUsuarios(),
     "user_followers": {},  # id do usuário -> lista de ids de seguidores
     "user_topics": {},  # id do usuário -> tópico de notificação (PUB/SUB)
-    "posts": [],  # lista de posts (dicionários)
-    "private_messages": {}  # remetente -> destinatário -> [[mensagem, timestamp, sender], ...]
+    # Posts ordenados pelo HLC atribuído pelo servidor (janela quente + segmentos frios)
+    "posts": None,  # Armazenamento.ArmazenamentoPosts, criado em start()
+    "user_posts": {},  # id do autor -> chaves dos posts dele, em ordem de HLC
+    "user_following": {},  # id do usuário -> conjunto de ids dos usuários que ele segue
+    "post_index": Indice.IndiceInvertido(),  # termo -> chaves dos posts (busca textual)
+    # Conversas privadas: [[mensagem, timestamp, sender], ...] em ordem de HLC (janela quente + segmentos frios)
+    "private_messages": None,  # Armazenamento.ArmazenamentoConversas, criado em start()
+    # Caixa de entrada: por username, as conversas em ordem da última atividade e o resumo de cada uma
+    "conversation_order": {},  # username -> [(hlc da última mensagem, interlocutor), ...] em ordem de HLC
+    "conversation_summary": {},  # username -> {interlocutor: {"peer", "last_message", "last_sender", "timestamp", "hlc", "unread"}}
+    "notifications": {},  # id do usuário -> caixa limitada de notificações [{"seq", "msg", "timestamp"}, ...]
+    "notification_seq": {}  # id do usuário -> último número de sequência atribuído
 }
 
 user_id_counter = 1  # Contador incremental para gerar novos IDs de usuário
+post_id_counter = 1  # Contador incremental para gerar novos IDs de post
+max_hlc = 0  # Maior HLC já gravado; devolvido aos servidores para manter seus relógios causais
 
+NOTIFICATION_INBOX_SIZE = 100  # Máximo de notificações guardadas por usuário (as mais antigas são descartadas)
+NOTIFICATION_PAGE_SIZE = 50  # Tamanho padrão da página de notificações
+NOTIFICATION_MAX_PAGE_SIZE = NOTIFICATION_INBOX_SIZE
+SEARCH_PAGE_SIZE = 20  # Tamanho padrão da página de resultados da busca de posts
+SEARCH_MAX_PAGE_SIZE = 100
+TIMELINE_PAGE_SIZE = 20  # Tamanho padrão das páginas de perfil e de timeline dos seguidos
+TIMELINE_MAX_PAGE_SIZE = 100
+CONVERSATION_PAGE_SIZE = 20  # Tamanho padrão da página da lista de conversas
 
-def handle_request():
+BULK_SERVER_ID = 0  # "Servidor" que carimba os posts da carga em massa (desempate da chave dos posts)
+
+# Ações cujas respostas podem ser grandes e são comprimidas quando o solicitante aceita ("accept_encoding")
+COMPRESSIBLE_ACTIONS = {"get_posts", "get_private_messages"}
+
+
+def publish_invalidation(kind, *keys):
     """
-    Função principal que executa o loop de atendimento das requisições recebidas no socket REP.
-    Processa todas as ações de CRUD do sistema, incluindo cadastro, postagens, seguidores e mensagens privadas.
+    Publica um evento de invalidação no formato "invalidate <tipo> <lista JSON de chaves>".
+    """
+    events_pub.send_string(f"invalidate {kind} {json.dumps(keys)}")
+
+
+def send_reply(envelope, resposta, encoding=None):
+    """
+    Envia a resposta JSON precedida do envelope da requisição (identidade e id/delimitador),
+    comprimida se uma codificação foi negociada e a resposta for grande.
+    O payload é entregue ao ZeroMQ sem cópia (copy=False); o pyzmq ainda copia frames pequenos,
+    em que isso é mais barato que o controle de referência.
+    """
+    payload = Compressao.encode(json.dumps(resposta).encode('utf-8'), encoding)
+    socket.send_multipart(envelope + [payload], copy=False)
+
+
+def create_user(username, user_id=None):
+    """
+    Cria as estruturas de um novo usuário e retorna o id atribuído
+    (ou o id informado, ao restaurar um usuário de uma execução anterior).
     """
     global user_id_counter
-    logging.info("Thread handle_request iniciada.")
-    while True:
-        # Recebe mensagem JSON do socket e identifica a ação solicitada
-        message = socket.recv_json()
-        logging.info(f"Mensagem recebida: {message}")
-        action = message["action"]
-
-        # Cadastro de novo usuário
-        if action == "add_user":
-            logging.info(f"Processando ação: {action}, dados: {message}")
-            username = message["username"]
-            if username in database["usernames"]:
-                # Username já está em uso
-                resposta = {"ret": ReturnCodes.ERROR_USERNAME_TAKEN}
-                logging.error(f"Resposta enviada: {resposta}")
-                socket.send_json(resposta)
-            else:
-                # Novo usuário: atribui id, cria estruturas e tópico
-                user_id = user_id_counter
-                user_id_counter += 1
-                database["usernames"][username] = user_id
-                database["user_followers"][user_id] = []
-                database["user_topics"][user_id] = f"notificacao_user_{user_id}"
-                resposta = {
-                    "ret": ReturnCodes.SUCCESS,
-                    "id": user_id,
-                    "topic": database["user_topics"][user_id]
-                }
-                logging.info(f"Resposta enviada: {resposta}")
-                socket.send_json(resposta)
-
-        # Consulta do id de usuário a partir do username
-        elif action == "get_user_id":
-            logging.info(f"Processando ação: {action}, dados: {message}")
-            username = message["username"]
-            user_id = database["usernames"].get(username, -1)
-            resposta = {"id": user_id}
-            logging.info(f"Resposta enviada: {resposta}")
-            socket.send_json(resposta)
-
-        # Adiciona novo post e ordena por timestamp, garantindo timeline correta
-        elif action == "add_post":
-            logging.info(f"Processando ação: {action}, dados: {message}")
-            database["posts"].append(message["post"])
-            database["posts"].sort(key=lambda x: x["tempoEnvioMensagem"])
-            resposta = {"ret": 0}
-            logging.info(f"Resposta enviada: {resposta}")
-            socket.send_json(resposta)
+    if user_id is None:
+        user_id = user_id_counter
+    user_id_counter = max(user_id_counter, user_id + 1)
+    database["usernames"][username] = user_id
+    database["username_registry"].add(username)
+    database["user_followers"][user_id] = []
+    database["user_following"][user_id] = set()
+    database["user_posts"][user_id] = []
+    database["user_topics"][user_id] = f"notificacao_user_{user_id}"
+    database["notifications"][user_id] = deque(maxlen=NOTIFICATION_INBOX_SIZE)
+    database["notification_seq"][user_id] = 0
+    return user_id
 
-        # Retorna todos os posts salvos no sistema
-        elif action == "get_posts":
-            logging.info(f"Processando ação: {action}, dados: {message}")
-            resposta = {"posts": database["posts"]}
-            logging.info(f"Resposta enviada: {resposta}")
-            socket.send_json(resposta)
-
-        # Consulta o tópico de notificação associado a um usuário
-        elif action == "get_user_topic":
-            logging.info(f"Processando ação: {action}, dados: {message}")
-            uid = message["id"]
-            topic = database["user_topics"].get(uid, "")
-            resposta = {"topic": topic}
-            logging.info(f"Resposta enviada: {resposta}")
-            socket.send_json(resposta)
-
-        # Adiciona um seguidor a outro usuário
-        elif action == "add_follower":
-            logging.info(f"Processando ação: {action}, dados: {message}")
-            uid = message["id"]
-            to_follow = message["to_follow"]
-            if uid == to_follow:
-                # Não é permitido seguir a si mesmo
-                resposta = {"ret": ReturnCodes.ERROR_INVALID_PARAMETER}
-                logging.error(f"Resposta enviada: {resposta}")
-                socket.send_json(resposta)
-            elif to_follow in database["usernames"]:
-                # Adiciona uid como seguidor do usuário solicitado
-                to_follow_id = database["usernames"][to_follow]
-                database["user_followers"][to_follow_id].append(uid)
-                resposta = {"ret": ReturnCodes.SUCCESS}
-                logging.info(f"Resposta enviada: {resposta}")
-                socket.send_json(resposta)
+
+def add_follow(uid, to_follow_id):
+    database["user_followers"][to_follow_id].append(uid)
+    database["user_following"].setdefault(uid, set()).add(to_follow_id)
+
+
+def store_notifications(users, msg, timestamp):
+    """
+    Guarda uma notificação na caixa de cada usuário existente, com o próximo número de sequência dele.
+    Retorna {id do usuário: sequência atribuída}.
+    """
+    seqs = {}
+    for uid in users:
+        uid = int(uid)
+        if uid not in database["notifications"]:
+            continue
+        database["notification_seq"][uid] += 1
+        seq = database["notification_seq"][uid]
+        database["notifications"][uid].append({"seq": seq, "msg": msg, "timestamp": timestamp})
+        seqs[uid] = seq
+    return seqs
+
+
+def next_write_hlc(hlc):
+    """
+    HLC com que uma escrita é gravada: o do servidor, ou logo após o maior já gravado se o servidor
+    estiver atrasado. Assim, uma escrita feita depois de o cliente ler um post ou mensagem (por qualquer
+    servidor) fica ordenada após ele, sem depender de HLCs enviados pelos clientes.
+    """
+    global max_hlc
+    max_hlc = max(int(hlc), max_hlc + 1)
+    return max_hlc
+
+
+def canonical_username(username):
+    """
+    Username na grafia do cadastro, pela qual o banco guarda tudo ("ALICE" -> "alice");
+    sem cadastro, o próprio valor recebido (as ações respondem usuário inexistente).
+    """
+    return database["username_registry"].canonical(username) or username
+
+
+def bulk_hlc(record, counters):
+    """
+    HLC de um post ou mensagem da carga em massa: o informado no registro ou, na falta dele,
+    o derivado do timestamp (com contador lógico para desempatar registros no mesmo milissegundo).
+    """
+    if "hlc" in record:
+        return int(record["hlc"])
+    physical_ms = int(float(record["timestamp"]) * 1000)
+    counter = counters.get(physical_ms, 0)
+    counters[physical_ms] = counter + 1
+    return Relogio.encode_hlc(physical_ms, counter)
+
+
+def bulk_load(records):
+    """
+    Carga em massa de usuários, seguidores, posts e mensagens privadas (registros de CargaEmMassa).
+    Os registros são lidos em uma única passada, sem log nem evento por registro; os índices
+    (posts por autor, índice invertido, janelas quentes e segmentos) são montados uma só vez no fim.
+    Registros inválidos (usuário inexistente, campo faltando) são contados e ignorados.
+    Retorna as contagens por tipo de registro.
+    """
+    global post_id_counter, max_hlc
+    started = time.perf_counter()
+    counts = {kind: 0 for kind in CargaEmMassa.RECORD_TYPES}
+    counts["skipped"] = 0
+    follows, posts, messages = [], [], {}
+    hlc_counters = {}
+    journal_records = []
+
+    # Usuários são criados já na leitura; as demais relações são resolvidas depois,
+    # então a ordem dos registros no arquivo não importa
+    for record in records:
+        kind = record.get("type")
+        try:
+            if kind == "user":
+                if database["username_registry"].canonical(record["username"]) is not None:
+                    counts["skipped"] += 1
+                    continue
+                user_id = create_user(record["username"])
+                journal_records.append({"type": "user", "username": record["username"], "id": user_id})
+            elif kind == "follow":
+                follows.append((record["username"], record["to_follow"]))
+            elif kind == "post":
+                timestamp = float(record.get("timestamp", time.time()))
+                posts.append({
+                    "action": "post_text",
+                    "username": record["username"],
+                    "texto": record["texto"],
+                    "tempoEnvioMensagem": datetime.fromtimestamp(timestamp).isoformat(),
+                    "hlc": bulk_hlc(dict(record, timestamp=timestamp), hlc_counters),
+                    "server_id": BULK_SERVER_ID
+                })
+            elif kind == "message":
+                sender, recipient = record["remetente"], record["destinatario"]
+                conversation = Armazenamento.ArmazenamentoConversas.conversation(sender, recipient)
+                messages.setdefault(conversation, []).append(
+                    (bulk_hlc(record, hlc_counters), [record["mensagem"], int(record["timestamp"]), sender]))
             else:
-                # Usuário alvo não existe
-                resposta = {"ret": ReturnCodes.ERROR_USER_NOT_FOUND}
-                logging.error(f"Resposta enviada: {resposta}")
-                socket.send_json(resposta)
-
-        # Retorna todos os seguidores de um usuário
-        elif action == "get_followers":
-            logging.info(f"Processando ação: {action}, dados: {message}")
-            uid = message["id"]
-            followers = database["user_followers"].get(uid, [])
-            resposta = {"followers": followers}
-            logging.info(f"Resposta enviada: {resposta}")
-            socket.send_json(resposta)
-
-        # Adiciona mensagem privada entre dois usuários e armazena dos dois lados para consulta bidirecional
-        elif action == "add_private_message":
-            logging.info(f"Processando ação: {action}, dados: {message}")
-            sender = message["remetente"]
-            recipient = message["destinatario"]
-            msg = message["mensagem"]
-            ts = message["timestamp"]
-
-            # Verificação de parâmetros válidos (usuários existentes e diferentes)
-            if sender == recipient or sender not in database["usernames"] or recipient not in database["usernames"]:
-                resposta = {"ret": ReturnCodes.ERROR_INVALID_PARAMETER}
-                logging.error(f"Resposta enviada: {resposta}")
-                socket.send_json(resposta)
+                counts["skipped"] += 1
                 continue
+        except (KeyError, TypeError, ValueError):
+            counts["skipped"] += 1
+            continue
+        counts[kind] += 1
 
-            # Armazena a mensagem nos dois sentidos para facilitar consulta
-            for a, b in [(sender, recipient), (recipient, sender)]:
-                database["private_messages"].setdefault(a, {}).setdefault(b, [])
-                database["private_messages"][a][b].append([msg, int(ts), sender])
-                database["private_messages"][a][b].sort(key=lambda x: x[1])
-            resposta = {"ret": ReturnCodes.SUCCESS}
-            logging.info(f"Resposta enviada: {resposta}")
-            socket.send_json(resposta)
+    usernames = database["usernames"]
+    for username, to_follow in follows:
+        uid, to_follow_id = usernames.get(username), usernames.get(to_follow)
+        if uid is None or to_follow_id is None or uid == to_follow_id \
+                or to_follow_id in database["user_following"][uid]:
+            counts["follow"] -= 1
+            counts["skipped"] += 1
+            continue
+        add_follow(uid, to_follow_id)
+        journal_records.append({"type": "follow", "id": uid, "to_follow": to_follow_id})
+    journal.append(*journal_records)
+
+    # Posts: ids atribuídos na ordem do HLC; índices por autor e textual montados de uma vez
+    valid_posts = []
+    for post in posts:
+        post["id"] = usernames.get(post["username"])
+        if post["id"] is None:
+            counts["post"] -= 1
+            counts["skipped"] += 1
+        else:
+            valid_posts.append(post)
+    valid_posts.sort(key=post_order)
+    authors = set()
+    for post in valid_posts:
+        post["post_id"] = post_id_counter
+        post_id_counter += 1
+        database["user_posts"][post["id"]].append(post_order(post))
+        authors.add(post["id"])
+    for author in authors:
+        database["user_posts"][author].sort()  # Já quase ordenada: posts anteriores + os da carga
+    database["posts"].extend(valid_posts)
+    database["post_index"].add_many((post_order(post), post["texto"]) for post in valid_posts)
+    if valid_posts:
+        max_hlc = max(max_hlc, valid_posts[-1]["hlc"])
+
+    for (a, b), items in messages.items():
+        if a == b or a not in usernames or b not in usernames:
+            counts["message"] -= len(items)
+            counts["skipped"] += len(items)
+            continue
+        database["private_messages"].extend(a, b, items)
+        last_hlc, last_entry = max(items, key=lambda item: item[0])
+        received_by_a = sum(1 for _, entry in items if entry[2] == b)
+        update_conversation(a, b, last_hlc, last_entry, unread=received_by_a)
+        update_conversation(b, a, last_hlc, last_entry, unread=len(items) - received_by_a)
+        max_hlc = max(max_hlc, last_hlc)
+
+    # Um único evento: os servidores descartam todos os caches
+    publish_invalidation("all")
+    logging.info(f"[CARGA] Carga em massa concluída em {time.perf_counter() - started:.2f}s: {counts}")
+    return counts
+
+
+def search_posts(message):
+    """
+    Busca posts pelo índice invertido. Todos os termos de "query" devem aparecer no texto
+    (termos terminados em * buscam por prefixo). Filtros opcionais: "author" (username) e
+    "since"/"until" (segundos desde a época, pelo tempo físico do HLC do post).
+    Resultados do mais recente para o mais antigo, paginados por "offset"/"limit".
+    """
+    candidates = database["post_index"].search(message.get("query") or "")
+    if candidates is None:
+        return {"ret": ReturnCodes.ERROR_INVALID_PARAMETER, "msg": "Consulta sem termos"}
+
+    author = message.get("author")
+    since = message.get("since")
+    until = message.get("until")
+    offset = max(0, int(message.get("offset", 0)))
+    limit = min(SEARCH_MAX_PAGE_SIZE, max(1, int(message.get("limit", SEARCH_PAGE_SIZE))))
 
-        # Recupera todas as mensagens privadas entre dois usuários
-        elif action == "get_private_messages":
-            logging.info(f"Processando ação: {action}, dados: {message}")
-            sender = message["remetente"]
-            recipient = message["destinatario"]
+    # Filtros aplicados sobre as chaves (autor pelo índice por autor, período pelo HLC),
+    # sem ler os posts, que podem estar nos segmentos frios
+    if author is not None:
+        author_id = database["usernames"].get(canonical_username(author))
+        candidates = candidates & set(database["user_posts"].get(author_id, []))
+    matches = []
+    for key in candidates:
+        if since is not None or until is not None:
+            posted_at = Relogio.decode_hlc(key[0])[0] / 1000
+            if (since is not None and posted_at < since) or (until is not None and posted_at > until):
+                continue
+        matches.append(key)
+
+    # Só os offset + limit mais recentes precisam ser ordenados e lidos
+    page = [database["posts"].get(key) for key in heapq.nlargest(offset + limit, matches)[offset:]]
+    return {
+        "ret": ReturnCodes.SUCCESS,
+        "posts": page,
+        "total": len(matches),
+        "has_more": offset + len(page) < len(matches),
+        "next_offset": offset + len(page)
+    }
+
+
+def page_limit(message):
+    return min(TIMELINE_MAX_PAGE_SIZE, max(1, int(message.get("limit", TIMELINE_PAGE_SIZE))))
+
+
+def older_than(keys, cursor):
+    """
+    Percorre, do mais recente para o mais antigo, as chaves de posts (em ordem de HLC) anteriores ao
+    cursor [hlc, id do servidor] do último post já entregue. Sem cursor, começa pelo mais recente.
+    """
+    end = len(keys) if cursor is None else bisect.bisect_left(keys, tuple(cursor))
+    for i in range(end - 1, -1, -1):
+        yield keys[i]
+
+
+def timeline_page(keys, limit):
+    """
+    Monta a resposta paginada, lendo só os posts da página; o cursor da próxima página
+    é a chave do último post entregue.
+    """
+    page = list(itertools.islice(keys, limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {
+        "ret": ReturnCodes.SUCCESS,
+        "posts": [database["posts"].get(key) for key in page],
+        "has_more": has_more,
+        "next_cursor": list(page[-1]) if page else None
+    }
+
+
+def get_user_posts(message):
+    """
+    Posts de um autor, do mais recente para o mais antigo, direto do índice por autor.
+    """
+    uid = int(message["id"])
+    if uid not in database["user_posts"]:
+        return {"ret": ReturnCodes.ERROR_USER_NOT_FOUND}
+    posts = older_than(database["user_posts"][uid], message.get("cursor"))
+    return timeline_page(posts, page_limit(message))
+
+
+def get_home_timeline(message):
+    """
+    Timeline dos usuários seguidos (e do próprio usuário): intercalação (k-way merge com heap)
+    dos índices por autor, sem percorrer a lista global de posts.
+    """
+    uid = int(message["id"])
+    if uid not in database["user_following"]:
+        return {"ret": ReturnCodes.ERROR_USER_NOT_FOUND}
+    cursor = message.get("cursor")
+    authors = database["user_following"][uid] | {uid}
+    streams = [older_than(database["user_posts"].get(author, []), cursor) for author in authors]
+    merged = heapq.merge(*streams, reverse=True)
+    return timeline_page(merged, page_limit(message))
 
-            msgs = database["private_messages"].get(sender, {}).get(recipient, [])
-            resposta = {"ret": 0, "mensagens": msgs}
+
+def update_conversation(owner, peer, hlc, entry, unread=0):
+    """
+    Atualiza o resumo da conversa de "owner" com "peer" após uma nova mensagem (entry no formato
+    [mensagem, timestamp, sender]) e a reposiciona na ordem de atividade, por busca binária.
+    Uma mensagem com HLC anterior ao da última conhecida (chegada fora de ordem) só soma às não lidas.
+    """
+    summaries = database["conversation_summary"].setdefault(owner, {})
+    order = database["conversation_order"].setdefault(owner, [])
+    summary = summaries.get(peer)
+    if summary is None:
+        summary = summaries[peer] = {"peer": peer, "unread": 0}
+    elif hlc > summary["hlc"]:
+        del order[bisect.bisect_left(order, (summary["hlc"], peer))]
+    else:
+        summary["unread"] += unread
+        return
+    summary.update(last_message=entry[0], timestamp=entry[1], last_sender=entry[2], hlc=hlc)
+    summary["unread"] += unread
+    bisect.insort(order, (hlc, peer))  # Em geral a mais recente: inserção no fim da lista
+
+
+def list_conversations(message):
+    """
+    Caixa de entrada de um usuário: conversas da atividade mais recente para a mais antiga, com a
+    prévia da última mensagem e o número de não lidas. Paginada pelo cursor [hlc, interlocutor]
+    da última conversa entregue; só as conversas da página são lidas.
+    """
+    username = canonical_username(message["username"])
+    if username not in database["usernames"]:
+        return {"ret": ReturnCodes.ERROR_USER_NOT_FOUND}
+    limit = min(TIMELINE_MAX_PAGE_SIZE, max(1, int(message.get("limit", CONVERSATION_PAGE_SIZE))))
+    keys = older_than(database["conversation_order"].get(username, []), message.get("cursor"))
+    page = list(itertools.islice(keys, limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+    summaries = database["conversation_summary"].get(username, {})
+    return {
+        "ret": ReturnCodes.SUCCESS,
+        "conversations": [summaries[peer] for _, peer in page],
+        "has_more": has_more,
+        "next_cursor": list(page[-1]) if page else None
+    }
+
+
+def process_request(message):
+    """
+    Executa uma ação recebida (cadastro, postagens, seguidores, mensagens privadas, notificações
+    ou um lote delas) e retorna a resposta a ser enviada.
+    """
+    global post_id_counter
+    action = message["action"]
+
+    # Cadastro de novo usuário
+    if action == "add_user":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        username = message["username"]
+        if database["username_registry"].canonical(username) is not None:
+            # Username já está em uso (em qualquer grafia de maiúsculas)
+            resposta = {"ret": ReturnCodes.ERROR_USERNAME_TAKEN}
+            logging.error(f"Resposta enviada: {resposta}")
+            return resposta
+        else:
+            # Novo usuário: atribui id, cria estruturas e tópico
+            user_id = create_user(username)
+            journal.append({"type": "user", "username": username, "id": user_id})
+            # O número de usuários segue no evento: um servidor que perder um cadastro baixa o filtro de novo
+            publish_invalidation("usernames", username, database["username_registry"].filter.count)
+            resposta = {
+                "ret": ReturnCodes.SUCCESS,
+                "id": user_id,
+                "topic": database["user_topics"][user_id]
+            }
             logging.info(f"Resposta enviada: {resposta}")
-            socket.send_json(resposta)
+            return resposta
+
+    # Consulta do id de usuário a partir do username
+    elif action == "get_user_id":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        username = canonical_username(message["username"])
+        user_id = database["usernames"].get(username, -1)
+        resposta = {"id": user_id}
+        logging.info(f"Resposta enviada: {resposta}")
+        return resposta
+
+    # Adiciona novo post na posição do seu HLC (normalmente no fim da lista), garantindo timeline correta
+    elif action == "add_post":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        post = message["post"]
+        post["hlc"] = next_write_hlc(post["hlc"])
+        post["post_id"] = post_id_counter
+        post_id_counter += 1
+        database["posts"].add(post)
+        bisect.insort(database["user_posts"].setdefault(int(post["id"]), []), post_order(post))
+        database["post_index"].add(post_order(post), post.get("texto", ""))
+        publish_invalidation("posts")
+        resposta = {"ret": 0, "hlc": max_hlc}
+        logging.info(f"Resposta enviada: {resposta}")
+        return resposta
 
-        # Ação não reconhecida
+    # Retorna todos os posts salvos no sistema
+    elif action == "get_posts":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        if "limit" in message:
+            # Só os "limit" posts mais recentes: os blocos frios mais antigos nem são lidos
+            posts = list(itertools.islice(database["posts"].descending(), max(1, int(message["limit"]))))
+            posts.reverse()
         else:
-            resposta = {"ret": -99, "msg": "Ação não reconhecida"}
+            posts = list(database["posts"].ascending())
+        # Com "format": "list", a resposta já é a lista de posts do get_timeline legado,
+        # que o servidor repassa ao cliente sem decodificar e recodificar
+        resposta = posts if message.get("format") == "list" else {"ret": ReturnCodes.SUCCESS, "posts": posts}
+        logging.info(f"Resposta enviada: {len(posts)} posts")
+        return resposta
+
+    # Busca textual de posts (termos e prefixos), com filtros de autor e período e paginação
+    elif action == "search_posts":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        resposta = search_posts(message)
+        logging.info(f"Resposta enviada: {len(resposta.get('posts', []))} posts")
+        return resposta
+
+    # Posts de um autor (perfil), paginados por cursor
+    elif action == "get_user_posts":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        resposta = get_user_posts(message)
+        logging.info(f"Resposta enviada: {len(resposta.get('posts', []))} posts")
+        return resposta
+
+    # Timeline com os posts dos usuários seguidos, paginada por cursor
+    elif action == "get_home_timeline":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        resposta = get_home_timeline(message)
+        logging.info(f"Resposta enviada: {len(resposta.get('posts', []))} posts")
+        return resposta
+
+    # Consulta o tópico de notificação associado a um usuário
+    elif action == "get_user_topic":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        uid = message["id"]
+        topic = database["user_topics"].get(uid, "")
+        resposta = {"topic": topic}
+        logging.info(f"Resposta enviada: {resposta}")
+        return resposta
+
+    # Adiciona um seguidor a outro usuário
+    elif action == "add_follower":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        uid = message["id"]
+        to_follow = canonical_username(message["to_follow"])
+        if uid == to_follow:
+            # Não é permitido seguir a si mesmo
+            resposta = {"ret": ReturnCodes.ERROR_INVALID_PARAMETER}
             logging.error(f"Resposta enviada: {resposta}")
-            socket.send_json(resposta)
+            return resposta
+        elif to_follow in database["usernames"]:
+            # Adiciona uid como seguidor do usuário solicitado
+            to_follow_id = database["usernames"][to_follow]
+            add_follow(uid, to_follow_id)
+            journal.append({"type": "follow", "id": uid, "to_follow": to_follow_id})
+            publish_invalidation("followers", to_follow_id)
+            resposta = {"ret": ReturnCodes.SUCCESS}
+            logging.info(f"Resposta enviada: {resposta}")
+            return resposta
+        else:
+            # Usuário alvo não existe
+            resposta = {"ret": ReturnCodes.ERROR_USER_NOT_FOUND}
+            logging.error(f"Resposta enviada: {resposta}")
+            return resposta
+
+    # Retorna todos os seguidores de um usuário
+    elif action == "get_followers":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        uid = message["id"]
+        followers = database["user_followers"].get(uid, [])
+        resposta = {"followers": followers}
+        logging.info(f"Resposta enviada: {resposta}")
+        return resposta
+
+    # Adiciona mensagem privada entre dois usuários; a conversa é a mesma nos dois sentidos
+    elif action == "add_private_message":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        sender = canonical_username(message["remetente"])
+        recipient = canonical_username(message["destinatario"])
+        msg = message["mensagem"]
+        ts = message["timestamp"]
+        hlc = message["hlc"]
+
+        # Verificação de parâmetros válidos (usuários existentes e diferentes)
+        if sender == recipient or sender not in database["usernames"] or recipient not in database["usernames"]:
+            resposta = {"ret": ReturnCodes.ERROR_INVALID_PARAMETER}
+            logging.error(f"Resposta enviada: {resposta}")
+            return resposta
+
+        # Armazena a mensagem uma única vez por conversa (consultada nos dois sentidos), na posição do seu HLC
+        # (o HLC fica em um índice paralelo para não alterar o formato [mensagem, timestamp, sender])
+        entry = [msg, int(ts), sender]
+        hlc = next_write_hlc(hlc)
+        database["private_messages"].insert(sender, recipient, hlc, entry)
+        update_conversation(sender, recipient, hlc, entry)
+        update_conversation(recipient, sender, hlc, entry, unread=1)
+        publish_invalidation("private_messages", sender, recipient)
+        resposta = {"ret": ReturnCodes.SUCCESS, "hlc": max_hlc}
+        logging.info(f"Resposta enviada: {resposta}")
+        return resposta
+
+    # Filtro de Bloom dos usernames cadastrados, baixado pelos servidores na inicialização
+    elif action == "get_username_filter":
+        logging.info(f"Processando ação: {action}")
+        resposta = {"ret": ReturnCodes.SUCCESS, "filter": database["username_registry"].filter.snapshot()}
+        logging.info(f"Resposta enviada: filtro com {resposta['filter']['count']} usernames")
+        return resposta
+
+    # Versão do filtro (número de usuários), conferida pelos servidores antes de confiar no filtro local
+    elif action == "get_username_count":
+        resposta = {"ret": ReturnCodes.SUCCESS, "count": database["username_registry"].filter.count}
+        logging.debug(f"Resposta enviada: {resposta}")
+        return resposta
+
+    # Recupera todas as mensagens privadas entre dois usuários
+    elif action == "get_private_messages":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        sender = canonical_username(message["remetente"])
+        recipient = canonical_username(message["destinatario"])
+
+        msgs = database["private_messages"].read(sender, recipient)
+        resposta = {"ret": 0, "mensagens": msgs, "hlc": max_hlc}
+        logging.info(f"Resposta enviada: {len(msgs)} mensagens")
+        return resposta
+
+    # Marca como lidas as mensagens recebidas de "peer" até o HLC da leitura feita pelo usuário.
+    # Separada de get_private_messages para que a leitura possa ser repetida ou duplicada (hedge, cache)
+    elif action == "mark_read":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        username = canonical_username(message["username"])
+        peer = canonical_username(message["peer"])
+        summary = database["conversation_summary"].get(username, {}).get(peer)
+        if summary is None:
+            resposta = {"ret": ReturnCodes.ERROR_USER_NOT_FOUND}
+            logging.error(f"Resposta enviada: {resposta}")
+            return resposta
+        # Mensagens posteriores à leitura continuam não lidas
+        if summary["hlc"] <= message.get("hlc", max_hlc):
+            summary["unread"] = 0
+        resposta = {"ret": ReturnCodes.SUCCESS, "unread": summary["unread"]}
+        logging.info(f"Resposta enviada: {resposta}")
+        return resposta
+
+    # Lista paginada das conversas de um usuário (caixa de entrada), da mais recente para a mais antiga
+    elif action == "list_conversations":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        resposta = list_conversations(message)
+        logging.info(f"Resposta enviada: {len(resposta.get('conversations', []))} conversas")
+        return resposta
+
+    # Guarda uma notificação na caixa de cada usuário informado, com número de sequência próprio
+    elif action == "add_notifications":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        seqs = store_notifications(message["users"], message["msg"], message.get("timestamp"))
+        journal.append({"type": "notifications", "users": message["users"], "msg": message["msg"],
+                        "timestamp": message.get("timestamp")})
+        resposta = {"ret": ReturnCodes.SUCCESS, "seqs": seqs}
+        logging.info(f"Resposta enviada: {resposta}")
+        return resposta
+
+    # Retorna uma página das notificações de um usuário posteriores à sequência informada
+    elif action == "get_notifications":
+        logging.info(f"Processando ação: {action}, dados: {message}")
+        uid = message["id"]
+        since = message.get("since", 0)
+        limit = min(NOTIFICATION_MAX_PAGE_SIZE, max(1, int(message.get("limit", NOTIFICATION_PAGE_SIZE))))
+        inbox = database["notifications"].get(uid)
+        if inbox is None:
+            resposta = {"ret": ReturnCodes.ERROR_USER_NOT_FOUND}
+            logging.error(f"Resposta enviada: {resposta}")
+            return resposta
+
+        pending = [n for n in inbox if n["seq"] > since]
+        page = pending[:limit]
+        resposta = {
+            "ret": ReturnCodes.SUCCESS,
+            "notifications": page,
+            "last_seq": page[-1]["seq"] if page else since,
+            "has_more": len(pending) > limit,
+            # Indica que notificações antigas já saíram da caixa antes de serem lidas
+            "truncated": bool(inbox) and inbox[0]["seq"] > since + 1
+        }
+        logging.info(f"Resposta enviada: {resposta}")
+        return resposta
+
+    # Executa várias ações em uma única ida ao banco, com resultados na mesma ordem dos pedidos
+    elif action == "batch":
+        items = message.get("requests")
+        if not isinstance(items, list):
+            resposta = {"ret": ReturnCodes.ERROR_INVALID_PARAMETER, "msg": "O lote deve ser uma lista de ações"}
+            logging.error(f"Resposta enviada: {resposta}")
+            return resposta
+        logging.info(f"Processando ação: {action} com {len(items)} itens")
+        results = [process_batch_item(item) for item in items]
+        resposta = {"ret": ReturnCodes.SUCCESS, "results": results}
+        logging.info(f"Resposta enviada: lote com {len(results)} resultados")
+        return resposta
+
+    # Carga em massa: registros no próprio pedido ("records") ou em um arquivo NDJSON local ao banco ("path")
+    elif action == "bulk_load":
+        logging.info(f"Processando ação: {action}")
+        records = message["records"] if "records" in message else CargaEmMassa.read_records(message["path"])
+        resposta = {"ret": ReturnCodes.SUCCESS, "counts": bulk_load(records), "hlc": max_hlc}
+        logging.info(f"Resposta enviada: {resposta}")
+        return resposta
+
+    # Ação não reconhecida
+    else:
+        resposta = {"ret": ReturnCodes.ERROR_UNKNOWN_ACTION, "msg": "Ação não reconhecida"}
+        logging.error(f"Resposta enviada: {resposta}")
+        return resposta
+
+
+def process_batch_item(item):
+    """
+    Executa um item de lote isoladamente: um item inválido ou que falhe só afeta o próprio resultado.
+    """
+    if not isinstance(item, dict) or item.get("action") == "batch":
+        # Cada item deve ser uma ação (objeto JSON); lotes aninhados não são permitidos
+        return {"ret": ReturnCodes.ERROR_INVALID_PARAMETER}
+    try:
+        result = process_request(item)
+    except Exception as e:
+        logging.error(f"Erro no item do lote {item}: {e}", exc_info=True)
+        return {"ret": ReturnCodes.ERROR_GENERAL, "msg": str(e)}
+    if not isinstance(result, dict):
+        # get_posts com "format": "list" responde a lista pura: embrulhada para carregar o código de retorno
+        return {"ret": ReturnCodes.SUCCESS, "posts": result}
+    result.setdefault("ret", ReturnCodes.SUCCESS)
+    return result
+
+
+def open_storage(storage_dir):
+    """
+    Abre o armazenamento em disco (segmentos e registro) e reconstrói o estado de execuções anteriores.
+    """
+    global journal
+    database["posts"] = Armazenamento.ArmazenamentoPosts(storage_dir, HOT_POSTS_LIMIT, POST_SPILL_BATCH, post_order)
+    database["private_messages"] = Armazenamento.ArmazenamentoConversas(storage_dir, HOT_MESSAGES_PER_CONVERSATION)
+    journal = Armazenamento.Diario(storage_dir)
+    restore_indexes()
+
+
+def restore_indexes():
+    """
+    Reconstrói o estado em memória de execuções anteriores: cadastros (com os ids originais),
+    seguidores e notificações pelo registro; posts por autor, índice de busca e caixas de entrada
+    pelos segmentos. Depois de um encerramento normal tudo é recuperado; depois de uma queda,
+    perdem-se as janelas quentes (posts e mensagens ainda não gravados nos segmentos) e as mensagens
+    não lidas voltam aos números do último encerramento normal.
+    """
+    global post_id_counter, max_hlc
+    unread = {}
+    for record in journal.records():
+        kind = record["type"]
+        if kind == "user":
+            create_user(record["username"], record["id"])
+        elif kind == "follow":
+            add_follow(record["id"], record["to_follow"])
+        elif kind == "notifications":
+            store_notifications(record["users"], record["msg"], record["timestamp"])
+        elif kind == "unread":
+            unread = record["counts"]  # Vale o do último encerramento
+
+    restored = 0
+    for post in database["posts"].ascending():
+        database["user_posts"].setdefault(int(post["id"]), []).append(post_order(post))
+        database["post_index"].add(post_order(post), post.get("texto", ""))
+        post_id_counter = max(post_id_counter, post.get("post_id", 0) + 1)
+        max_hlc = max(max_hlc, post["hlc"])
+        restored += 1
+
+    conversations = database["private_messages"].conversations()
+    for a, b in conversations:
+        hlc, entry = database["private_messages"].last(a, b)
+        update_conversation(a, b, hlc, entry, unread=unread.get(a, {}).get(b, 0))
+        update_conversation(b, a, hlc, entry, unread=unread.get(b, {}).get(a, 0))
+        max_hlc = max(max_hlc, hlc)
+    if database["usernames"] or restored or conversations:
+        logging.info(f"Estado restaurado: {len(database['usernames'])} usuários, {restored} posts, "
+                     f"{len(conversations)} conversas")
+
+
+def shutdown():
+    """
+    Encerramento normal: grava as janelas quentes nos segmentos e as mensagens não lidas no registro,
+    para que o próximo início recupere todo o estado.
+    """
+    with database_lock:
+        database["posts"].flush()
+        database["private_messages"].flush()
+        counts = {}
+        for owner, summaries in database["conversation_summary"].items():
+            for peer, summary in summaries.items():
+                if summary["unread"]:
+                    counts.setdefault(owner, {})[peer] = summary["unread"]
+        journal.append({"type": "unread", "counts": counts})
+        journal.close()
+    logging.info("Banco de dados encerrado: janelas quentes gravadas em disco")
+
+
+def handle_request():
+    """
+    Função principal que executa o loop de atendimento das requisições recebidas no socket ROUTER.
+    Processa todas as ações de CRUD do sistema, incluindo cadastro, postagens, seguidores e mensagens privadas.
+    """
+    logging.info("Thread handle_request iniciada.")
+    while True:
+        # Recebe mensagem JSON do socket e identifica a ação solicitada
+        frames = socket.recv_multipart()
+        envelope = frames[:-1]
+        encoding = None
+        try:
+            message = json.loads(frames[-1])
+            logging.info(f"Mensagem recebida: {message}")
+            with database_lock:
+                resposta = perfilador.profile(message.get("action"), process_request, message)
+            if message.get("action") in COMPRESSIBLE_ACTIONS:
+                encoding = Compressao.negotiate(message.get("accept_encoding"))
+        except Exception as e:
+            resposta = {"ret": ReturnCodes.ERROR_GENERAL, "msg": f"Erro: {e}"}
+            logging.error(f"Erro ao processar requisição: {e}", exc_info=True)
+        send_reply(envelope, resposta, encoding)
     logging.info("Thread handle_request finalizada.")
 
 
-# Inicia a thread principal do banco de dados em modo daemon (encerra junto com o processo principal)
-threading.Thread(target=handle_request, daemon=True).start()
-input("Pressione Enter para sair.\n")
+def start(shared_context=None, addresses=None, storage_dir=STORAGE_DIR, load_path=None):
+    """
+    Cria os sockets e o armazenamento em disco e inicia a thread de atendimento.
+    Com um contexto compartilhado e endereços inproc, o banco pode rodar no mesmo processo
+    que o proxy e os servidores (ver Lancador.py). Com load_path, faz a carga em massa do
+    arquivo NDJSON antes de começar a atender.
+    """
+    global context, socket, events_pub, admin_socket
+    logging.info("Iniciando Banco de Dados...")
+    context = shared_context or zmq.Context()
+    socket = context.socket(zmq.ROUTER)
+    socket.bind(Configuracao.bind_address("database", addresses))
+
+    events_pub = context.socket(zmq.PUB)
+    events_pub.setsockopt(zmq.SNDHWM, Configuracao.PUB_HIGH_WATER_MARK)
+    events_pub.bind(Configuracao.bind_address("db_events", addresses))
+
+    admin_socket = context.socket(zmq.REP)
+    admin_socket.bind(Configuracao.bind_address("db_admin", addresses))
+
+    open_storage(storage_dir)
+    if load_path:
+        bulk_load(CargaEmMassa.read_records(load_path))
+
+    # Inicia a thread principal do banco de dados em modo daemon (encerra junto com o processo principal)
+    threading.Thread(target=handle_request, daemon=True).start()
+    threading.Thread(target=Perfilador.admin_loop, args=(admin_socket, perfilador), daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banco de dados central")
+    parser.add_argument("--load", metavar="ARQUIVO", help="carrega um arquivo NDJSON (CargaEmMassa) antes de atender")
+    args = parser.parse_args()
+
+    # Configuração global de logging: salva em arquivo e exibe no terminal
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("../banco.log"),
+            logging.StreamHandler()  # Agora os logs aparecem no terminal em tempo real!
+        ]
+    )
+    start(load_path=args.load)
+    input("Pressione Enter para sair.\n")
+    shutdown()
@@ -0,0 +1,54 @@
+# Filtro de Bloom: teste de pertinência compacto, com falsos positivos mas nunca falsos negativos
+import base64
+import hashlib
+import math
+
+
+class FiltroBloom:
+    """
+    Vetor de bits com "hashes" posições por chave (hashing duplo sobre um único BLAKE2b, estável
+    entre processos, ao contrário de hash()). Uma chave ausente do filtro certamente não foi
+    adicionada; uma presente foi adicionada com probabilidade 1 - error_rate, enquanto o número de
+    chaves não passar da capacidade. O filtro pode ser exportado (snapshot) e reconstruído em outro processo.
+    """
+
+    def __init__(self, capacity, error_rate=0.01, size=None, hashes=None):
+        self.capacity = capacity
+        # Dimensionamento ótimo: m = -n ln(p) / ln(2)^2 bits e k = (m / n) ln(2) funções de hash
+        self.size = size or max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = hashes or max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0  # Chaves adicionadas
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def snapshot(self):
+        """
+        Estado serializável em JSON (bits em base64), para outro processo reconstruir o filtro.
+        """
+        return {
+            "capacity": self.capacity,
+            "size": self.size,
+            "hashes": self.hashes,
+            "count": self.count,
+            "bits": base64.b64encode(self.bits).decode('ascii')
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        bloom = cls(snapshot["capacity"], size=snapshot["size"], hashes=snapshot["hashes"])
+        bloom.bits = bytearray(base64.b64decode(snapshot["bits"]))
+        bloom.count = snapshot["count"]
+        return bloom
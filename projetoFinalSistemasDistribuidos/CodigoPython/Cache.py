@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Cache em memória com despejo LRU e expiração por TTL, seguro para uso entre threads.
+    As invalidações explícitas incrementam uma geração: valores carregados antes de uma
+    invalidação não são gravados, evitando que uma leitura atrasada reintroduza dado antigo.
+    """
+
+    def __init__(self, name, capacity, ttl):
+        self.name = name
+        self.capacity = capacity
+        self.ttl = ttl  # Segundos até um item expirar (rede de segurança para eventos perdidos)
+        self.items = OrderedDict()  # chave -> (valor, instante de expiração)
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key, loader):
+        """
+        Retorna o valor em cache para a chave ou, na falta dele, chama loader() e armazena o resultado.
+        """
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.items.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self.generation
+
+        value = loader()
+
+        with self.lock:
+            if generation == self.generation:
+                self._store_locked(key, value)
+        return value
+
+    def get_many_or_load(self, keys, loader):
+        """
+        Como get_or_load para várias chaves: as que faltarem no cache são carregadas juntas por
+        loader(lista de chaves faltantes), que retorna os valores na mesma ordem. Retorna {chave: valor}.
+        """
+        values = {}
+        missing = []
+        with self.lock:
+            now = time.monotonic()
+            for key in dict.fromkeys(keys):
+                entry = self.items.get(key)
+                if entry is not None and entry[1] > now:
+                    self.items.move_to_end(key)
+                    self.hits += 1
+                    values[key] = entry[0]
+                else:
+                    self.misses += 1
+                    missing.append(key)
+            generation = self.generation
+        if not missing:
+            return values
+
+        loaded = dict(zip(missing, loader(missing)))
+
+        with self.lock:
+            if generation == self.generation:
+                for key, value in loaded.items():
+                    self._store_locked(key, value)
+        values.update(loaded)
+        return values
+
+    def put(self, key, value):
+        """
+        Armazena diretamente um valor conhecido (ex.: resultado de uma escrita deste servidor).
+        """
+        with self.lock:
+            self._store_locked(key, value)
+
+    def _store_locked(self, key, value):
+        self.items[key] = (value, time.monotonic() + self.ttl)
+        self.items.move_to_end(key)
+        while len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        """
+        Remove uma chave do cache.
+        """
+        with self.lock:
+            self.generation += 1
+            self.items.pop(key, None)
+
+    def clear(self):
+        """
+        Remove todas as chaves do cache.
+        """
+        with self.lock:
+            self.generation += 1
+            self.items.clear()
+
+    def stats(self):
+        """
+        Métricas de uso do cache.
+        """
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "cache": self.name,
+                "size": len(self.items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else 0.0
+            }
@@ -0,0 +1,87 @@
+# Captura de tráfego do proxy em arquivo binário compacto (para replay e testes de regressão de desempenho)
+import itertools
+import logging
+import struct
+import threading
+import time
+
+import zmq
+
+TRACE_MAGIC = b"SDTRACE1"  # Cabeçalho do arquivo de captura (formato versão 1)
+RECORD_HEADER = struct.Struct("<dI")  # Instante de chegada (segundos desde a época) e tamanho do payload
+CAPTURE_QUEUE_LIMIT = 100000  # Registros aguardando gravação; acima disso são descartados (não bloqueia o proxy)
+FLUSH_INTERVAL = 1.0  # Intervalo máximo (segundos) entre gravações em disco
+
+_capture_ids = itertools.count(1)
+
+
+class GravadorCaptura:
+    """
+    Grava as requisições dos clientes em um arquivo de captura.
+    A thread do proxy só entrega o registro a um socket inproc (sem bloquear nem tocar o disco);
+    uma thread própria grava os registros: [cabeçalho (instante, tamanho)][payload], após TRACE_MAGIC.
+    """
+
+    def __init__(self, context, path):
+        self.path = path
+        self.dropped = 0
+        self.recorded = 0
+        endpoint = f"inproc://captura-{next(_capture_ids)}"
+
+        self.receiver = context.socket(zmq.PULL)
+        self.receiver.bind(endpoint)
+        self.sender = context.socket(zmq.PUSH)
+        self.sender.setsockopt(zmq.SNDHWM, CAPTURE_QUEUE_LIMIT)
+        self.sender.connect(endpoint)
+        threading.Thread(target=self._write_loop, daemon=True).start()
+        logging.info(f"[CAPTURA] Gravando requisições em {path}")
+
+    def record(self, arrival, payload):
+        """
+        Registra uma requisição (chamado pela thread de roteamento do proxy).
+        """
+        try:
+            self.sender.send_multipart([RECORD_HEADER.pack(arrival, len(payload)), payload], zmq.NOBLOCK)
+            self.recorded += 1
+        except zmq.Again:
+            self.dropped += 1
+
+    def _write_loop(self):
+        with open(self.path, "wb") as trace:
+            trace.write(TRACE_MAGIC)
+            last_flush = time.monotonic()
+            while True:
+                try:
+                    if self.receiver.poll(int(FLUSH_INTERVAL * 1000)):
+                        while True:
+                            try:
+                                header, payload = self.receiver.recv_multipart(zmq.NOBLOCK)
+                            except zmq.Again:
+                                break
+                            trace.write(header)
+                            trace.write(payload)
+                    if time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                        trace.flush()
+                        last_flush = time.monotonic()
+                except Exception as e:
+                    logging.error(f"[CAPTURA] Erro ao gravar captura: {e}", exc_info=True)
+
+
+def read_trace(path):
+    """
+    Lê um arquivo de captura, retornando a lista de (instante de chegada, payload).
+    """
+    records = []
+    with open(path, "rb") as trace:
+        data = trace.read()
+    if not data.startswith(TRACE_MAGIC):
+        raise ValueError(f"{path} não é um arquivo de captura")
+    position = len(TRACE_MAGIC)
+    while position + RECORD_HEADER.size <= len(data):
+        arrival, length = RECORD_HEADER.unpack_from(data, position)
+        position += RECORD_HEADER.size
+        if position + length > len(data):
+            break  # Registro incompleto no fim do arquivo (captura interrompida)
+        records.append((arrival, data[position:position + length]))
+        position += length
+    return records
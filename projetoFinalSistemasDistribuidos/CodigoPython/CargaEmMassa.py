@@ -0,0 +1,72 @@
+# Arquivos NDJSON de carga em massa do banco (um registro JSON por linha) e gerador de dados sintéticos
+#
+# Registros aceitos (campo "type"):
+#   {"type": "user", "username": "alice"}
+#   {"type": "follow", "username": "bob", "to_follow": "alice"}
+#   {"type": "post", "username": "alice", "texto": "...", "timestamp": 1700000000.0}
+#   {"type": "message", "remetente": "alice", "destinatario": "bob", "mensagem": "...", "timestamp": 1700000000}
+# Posts e mensagens podem trazer o próprio "hlc"; sem ele, o HLC é derivado do timestamp.
+import argparse
+import json
+import random
+import time
+
+RECORD_TYPES = ("user", "follow", "post", "message")
+
+WORDS = ["sistemas", "distribuidos", "relogio", "lider", "mensagem", "servidor", "proxy", "cache",
+         "notificacao", "replica", "latencia", "fila", "banco", "postagem", "timeline", "busca"]
+
+
+def read_records(path):
+    """
+    Lê um arquivo NDJSON sob demanda (sem carregar o arquivo inteiro), ignorando linhas vazias.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def generate(path, users, follows, posts, messages, seed=0):
+    """
+    Gera um conjunto de dados sintético para ambientes de teste e benchmark: "follows" seguidos por
+    usuário, "posts" posts e "messages" mensagens privadas no total, espalhados pelos últimos 30 dias.
+    """
+    rng = random.Random(seed)
+    now = time.time()
+    names = [f"user{i}" for i in range(users)]
+    with open(path, "w", encoding="utf-8") as f:
+        def write(record):
+            f.write(json.dumps(record) + "\n")
+
+        for name in names:
+            write({"type": "user", "username": name})
+        for name in names:
+            for followed in rng.sample(names, min(follows, users)):
+                if followed != name:
+                    write({"type": "follow", "username": name, "to_follow": followed})
+        for _ in range(posts):
+            write({"type": "post", "username": rng.choice(names),
+                   "texto": " ".join(rng.choices(WORDS, k=rng.randint(3, 12))),
+                   "timestamp": now - rng.uniform(0, 30 * 86400)})
+        for _ in range(messages):
+            sender, recipient = rng.sample(names, 2)
+            write({"type": "message", "remetente": sender, "destinatario": recipient,
+                   "mensagem": " ".join(rng.choices(WORDS, k=rng.randint(2, 8))),
+                   "timestamp": int(now - rng.uniform(0, 30 * 86400))})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um arquivo NDJSON sintético para BancoDeDados.py --load")
+    parser.add_argument("path", help="arquivo de saída")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--follows", type=int, default=20, help="usuários seguidos por usuário")
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    generate(args.path, args.users, args.follows, args.posts, args.messages, args.seed)
+    print(f"{args.path} gerado em {time.perf_counter() - started:.1f}s")
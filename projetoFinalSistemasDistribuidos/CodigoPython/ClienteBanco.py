@@ -0,0 +1,176 @@
+import itertools
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+import zmq
+
+DEFAULT_TIMEOUT = 5.0  # Tempo máximo (segundos) de espera por uma resposta do banco
+RECOVERY_THRESHOLD = 3  # Timeouts seguidos em um endpoint antes de recriar o seu socket
+POLL_INTERVAL = 100  # Intervalo (ms) de verificação de prazos na thread de I/O
+
+_client_ids = itertools.count(1)
+
+
+class BancoTimeoutError(Exception):
+    """
+    O banco de dados não respondeu dentro do prazo da chamada.
+    """
+
+
+class ClienteBanco:
+    """
+    Cliente do banco de dados com múltiplas requisições em andamento.
+    Cada requisição recebe um id (primeiro frame da mensagem) que o banco devolve na resposta,
+    permitindo correlacionar respostas fora de ordem. Um socket DEALER por endpoint forma o pool;
+    cada chamada vai para o endpoint com menos requisições pendentes.
+    Toda a comunicação com os DEALERs acontece em uma única thread de I/O (sockets ZeroMQ não são
+    thread-safe); as threads chamadoras entregam pedidos por um socket inproc e esperam em Futures.
+    """
+
+    def __init__(self, context, endpoints, timeout=DEFAULT_TIMEOUT):
+        self.context = context
+        self.endpoints = list(endpoints)
+        self.timeout = timeout
+        self.request_ids = itertools.count(1)
+        self.pending = {}  # id da requisição -> (Future, prazo, índice do endpoint, resposta em bytes?)
+        self.in_flight = [0] * len(self.endpoints)
+        self.consecutive_timeouts = [0] * len(self.endpoints)
+        self.lock = threading.Lock()
+        self.local = threading.local()  # Socket PUSH próprio de cada thread chamadora
+        self.wakeup_endpoint = f"inproc://cliente-banco-{next(_client_ids)}"
+
+        self.wakeup = self.context.socket(zmq.PULL)
+        self.wakeup.bind(self.wakeup_endpoint)
+        self.dealers = [self._connect(endpoint) for endpoint in self.endpoints]
+        threading.Thread(target=self._io_loop, daemon=True).start()
+
+    def _connect(self, endpoint):
+        dealer = self.context.socket(zmq.DEALER)
+        dealer.setsockopt(zmq.LINGER, 0)
+        dealer.connect(endpoint)
+        return dealer
+
+    def submit(self, request, timeout=None, raw=False):
+        """
+        Envia uma requisição sem bloquear. Retorna um Future com a resposta (dict) do banco
+        ou, com raw=True, com o payload recebido sem decodificar (ex.: resposta comprimida repassada ao cliente),
+        como memoryview sobre o frame do ZeroMQ: repassado ao cliente sem cópia.
+        """
+        future = Future()
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        with self.lock:
+            request_id = next(self.request_ids)
+            index = min(range(len(self.endpoints)), key=lambda i: self.in_flight[i])
+            self.in_flight[index] += 1
+            self.pending[request_id] = (future, deadline, index, raw)
+
+        sender = getattr(self.local, "sender", None)
+        if sender is None:
+            sender = self.context.socket(zmq.PUSH)
+            sender.connect(self.wakeup_endpoint)
+            self.local.sender = sender
+        sender.send_multipart([str(index).encode(), str(request_id).encode(), json.dumps(request).encode('utf-8')])
+        return future
+
+    def call(self, request, timeout=None, raw=False):
+        """
+        Envia uma requisição e aguarda a resposta (equivalente ao antigo send_json/recv_json).
+        """
+        return self.submit(request, timeout, raw).result()
+
+    def call_many(self, requests, timeout=None):
+        """
+        Envia várias requisições independentes em paralelo e retorna as respostas na mesma ordem.
+        """
+        futures = [self.submit(request, timeout) for request in requests]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        """
+        Requisições pendentes no total e por endpoint.
+        """
+        with self.lock:
+            return {"pending": len(self.pending), "in_flight": dict(zip(self.endpoints, self.in_flight))}
+
+    def _finish(self, request_id):
+        with self.lock:
+            entry = self.pending.pop(request_id, None)
+            if entry is not None:
+                self.in_flight[entry[2]] -= 1
+        return entry
+
+    def _io_loop(self):
+        poller = zmq.Poller()
+        poller.register(self.wakeup, zmq.POLLIN)
+        for dealer in self.dealers:
+            poller.register(dealer, zmq.POLLIN)
+
+        while True:
+            try:
+                events = dict(poller.poll(POLL_INTERVAL))
+
+                # Pedidos das threads chamadoras
+                if self.wakeup in events:
+                    while True:
+                        try:
+                            index, request_id, payload = self.wakeup.recv_multipart(zmq.NOBLOCK)
+                        except zmq.Again:
+                            break
+                        self.dealers[int(index)].send_multipart([request_id, payload])
+
+                # Respostas do banco (em qualquer ordem)
+                for index, dealer in enumerate(self.dealers):
+                    if dealer not in events:
+                        continue
+                    while True:
+                        try:
+                            request_id, payload = dealer.recv_multipart(zmq.NOBLOCK, copy=False)
+                        except zmq.Again:
+                            break
+                        entry = self._finish(int(request_id.bytes))
+                        if entry is None:
+                            # Resposta de uma requisição que já expirou: descartada
+                            logging.warning(f"[BANCO] Resposta tardia descartada (requisição {int(request_id.bytes)})")
+                            continue
+                        self.consecutive_timeouts[index] = 0
+                        entry[0].set_result(payload.buffer if entry[3] else json.loads(payload.bytes))
+
+                self._expire(poller)
+            except Exception as e:
+                logging.error(f"[BANCO] Erro na thread de I/O do cliente do banco: {e}", exc_info=True)
+
+    def _expire(self, poller):
+        """
+        Falha as requisições com prazo vencido. Um endpoint com timeouts seguidos tem o socket
+        recriado e as demais requisições pendentes nele também falham.
+        """
+        now = time.monotonic()
+        with self.lock:
+            expired = [request_id for request_id, (_, deadline, _, _) in self.pending.items() if deadline <= now]
+        for request_id in expired:
+            entry = self._finish(request_id)
+            if entry is None:
+                continue
+            future, _, index, _ = entry
+            future.set_exception(BancoTimeoutError(f"Banco não respondeu à requisição {request_id}"))
+            self.consecutive_timeouts[index] += 1
+            if self.consecutive_timeouts[index] >= RECOVERY_THRESHOLD:
+                self._recover(poller, index)
+
+    def _recover(self, poller, index):
+        endpoint = self.endpoints[index]
+        logging.warning(f"[BANCO] Recriando conexão com {endpoint} após {self.consecutive_timeouts[index]} timeouts")
+        poller.unregister(self.dealers[index])
+        self.dealers[index].close()
+        self.dealers[index] = self._connect(endpoint)
+        poller.register(self.dealers[index], zmq.POLLIN)
+        self.consecutive_timeouts[index] = 0
+        with self.lock:
+            stranded = [request_id for request_id, entry in self.pending.items() if entry[2] == index]
+        for request_id in stranded:
+            entry = self._finish(request_id)
+            if entry is not None:
+                entry[0].set_exception(BancoTimeoutError(f"Conexão com {endpoint} reiniciada"))
@@ -0,0 +1,44 @@
+# Compressão negociada das respostas grandes (timeline e conversas privadas)
+import zlib
+
+SUPPORTED_ENCODINGS = ("zlib",)  # Em ordem de preferência
+COMPRESSION_THRESHOLD = 1024  # Respostas menores que isso (bytes) não compensam ser comprimidas
+COMPRESSION_LEVEL = 6
+COMPRESSED_MARKER = b"\x00zlib\x00"  # Prefixo impossível em JSON: identifica o payload comprimido
+
+
+def negotiate(accepted):
+    """
+    Escolhe a codificação a usar a partir da lista "accept_encoding" enviada pelo cliente.
+    Retorna None se nenhuma for suportada (resposta em JSON puro).
+    """
+    if not isinstance(accepted, list):
+        return None
+    for encoding in SUPPORTED_ENCODINGS:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def encode(payload, encoding):
+    """
+    Comprime o payload (bytes) se a codificação foi negociada e ele passa do limite de tamanho.
+    """
+    if encoding != "zlib" or len(payload) < COMPRESSION_THRESHOLD:
+        return payload
+    compressed = COMPRESSED_MARKER + zlib.compress(payload, COMPRESSION_LEVEL)
+    return compressed if len(compressed) < len(payload) else payload
+
+
+def decode(payload):
+    """
+    Devolve o JSON (bytes) original de um payload possivelmente comprimido
+    (bytes ou memoryview de um frame recebido sem cópia).
+    """
+    if is_compressed(payload):
+        return zlib.decompress(memoryview(payload)[len(COMPRESSED_MARKER):])
+    return payload if isinstance(payload, bytes) else bytes(payload)
+
+
+def is_compressed(payload):
+    return payload[:len(COMPRESSED_MARKER)] == COMPRESSED_MARKER
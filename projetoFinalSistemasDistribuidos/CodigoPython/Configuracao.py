@@ -0,0 +1,130 @@
+# Configurações compartilhadas entre Proxy, Servidores, Encaminhadores e Usuários
+import zlib
+from collections import namedtuple
+
+# Portas TCP fixas dos canais principais
+FRONTEND_PORT = 5555  # Clientes -> proxy
+BACKEND_PORT = 6000  # Proxy -> servidores
+CONTROL_PORT = 6001  # Registro e coordenação dos servidores
+NOTIFICATION_PORT = 6010  # PUB legado de notificações (clientes anteriores aos shards), só com --legacy-notifications
+DATABASE_PORT = 6011  # Banco de dados central
+HEARTBEAT_PORT = 6015  # Heartbeats dos servidores
+
+# Canal PUB exclusivo dos servidores (membros e liderança), separado das notificações de usuários
+SERVER_PUB_PORT = 6016
+
+# Eventos de invalidação publicados pelo banco de dados a cada alteração (caches dos servidores)
+DB_EVENTS_PORT = 6012
+
+# Portas próprias de cada servidor, intercaladas por id (SERVER_PORT_STRIDE portas por servidor):
+# consultas de hora (algoritmo de Cristian) em TIME_BASE_PORT + SERVER_PORT_STRIDE * id e o socket
+# administrativo local (perfilamento sob demanda) em SERVER_ADMIN_BASE_PORT + SERVER_PORT_STRIDE * id.
+# Os ids não são reutilizados (o supervisor substitui servidores o tempo todo): com faixas separadas,
+# a porta de hora de um id alto cairia sobre a porta administrativa de um servidor vivo.
+# O socket administrativo do banco fica em DB_ADMIN_PORT. O proxy repassa a eles os comandos do canal de controle.
+SERVER_PORT_STRIDE = 2
+TIME_BASE_PORT = 6100
+SERVER_ADMIN_BASE_PORT = 6101
+DB_ADMIN_PORT = 6013
+MAX_TCP_PORT = 65535
+
+# Camada de distribuição de notificações: tópicos são divididos em shards pelo hash do tópico.
+# O proxy publica cada shard em uma porta interna; cada encaminhador (XSUB/XPUB) republica
+# o seu shard em uma porta pública, onde os usuários se conectam.
+NOTIFICATION_SHARDS = 4
+SHARD_INTERNAL_BASE_PORT = 6020
+SHARD_PUBLIC_BASE_PORT = 6030
+
+# Limite da fila de envio dos sockets PUB (mensagens acima disso são descartadas pelo ZeroMQ)
+PUB_HIGH_WATER_MARK = 10000
+
+# Ações somente de leitura: podem ser repetidas ou duplicadas (hedge) sem efeito colateral
+IDEMPOTENT_ACTIONS = {"get_timeline", "get_private_messages", "get_home_timeline", "get_user_posts",
+                      "search_posts", "get_notifications", "list_conversations"}
+
+
+# Canal de comunicação: transporte ("tcp" ou "inproc"), porta TCP (base, para canais por shard/servidor),
+# parâmetro que seleciona a instância ("shard", "server_id" ou None), host usado nas conexões TCP
+# e distância entre as portas de instâncias consecutivas
+Canal = namedtuple("Canal", ["transport", "port", "param", "host", "stride"], defaults=(1,))
+
+
+def endpoints(internal="tcp", external="tcp", host="localhost"):
+    """
+    Endereços de todos os canais do sistema: nome do canal -> Canal.
+    "internal" define o transporte dos canais entre componentes e "external" o dos canais usados
+    pelos clientes; com "inproc", os componentes precisam compartilhar o mesmo zmq.Context.
+    """
+    return {
+        "frontend": Canal(external, FRONTEND_PORT, None, host),
+        "notifications": Canal(external, NOTIFICATION_PORT, None, host),
+        "shard_public": Canal(external, SHARD_PUBLIC_BASE_PORT, "shard", host),
+        "backend": Canal(internal, BACKEND_PORT, None, host),
+        "control": Canal(internal, CONTROL_PORT, None, host),
+        "database": Canal(internal, DATABASE_PORT, None, host),
+        "db_events": Canal(internal, DB_EVENTS_PORT, None, host),
+        "heartbeats": Canal(internal, HEARTBEAT_PORT, None, host),
+        "server_pub": Canal(internal, SERVER_PUB_PORT, None, host),
+        "shard_internal": Canal(internal, SHARD_INTERNAL_BASE_PORT, "shard", host),
+        "time": Canal(internal, TIME_BASE_PORT, "server_id", host, SERVER_PORT_STRIDE),
+        "db_admin": Canal(internal, DB_ADMIN_PORT, None, host),
+        "server_admin": Canal(internal, SERVER_ADMIN_BASE_PORT, "server_id", host, SERVER_PORT_STRIDE),
+    }
+
+
+def _address(channel, addresses, tcp_host, params):
+    canal = (addresses or DEFAULT_ENDPOINTS)[channel]
+    index = int(params[canal.param]) if canal.param else None
+    if canal.transport == "inproc":
+        return f"inproc://{channel}" + (f"-{index}" if index is not None else "")
+    port = canal.port + (index or 0) * canal.stride
+    if port > MAX_TCP_PORT:
+        raise ValueError(f"Porta {port} do canal {channel} fora do intervalo TCP")
+    return f"tcp://{tcp_host or canal.host}:{port}"
+
+
+def bind_address(channel, addresses=None, **params):
+    """
+    Endereço em que o dono de um canal faz bind (ex.: bind_address("time", server_id=2)).
+    """
+    return _address(channel, addresses, "*", params)
+
+
+def connect_address(channel, addresses=None, **params):
+    """
+    Endereço ao qual os demais componentes se conectam para usar um canal.
+    """
+    return _address(channel, addresses, None, params)
+
+
+# Endereços padrão: todos os componentes em processos separados, comunicando por TCP local
+DEFAULT_ENDPOINTS = endpoints()
+
+
+def notification_shard(topic):
+    """
+    Retorna o shard responsável por um tópico de notificação.
+    Usa CRC32 (estável entre processos, ao contrário de hash()).
+    """
+    return zlib.crc32(topic.encode('utf-8')) % NOTIFICATION_SHARDS
+
+
+def notification_endpoint(topic, addresses=None):
+    """
+    Endereço público do encaminhador que distribui as notificações de um tópico.
+    """
+    return connect_address("shard_public", addresses, shard=notification_shard(topic))
+
+
+def time_bind_endpoint(server_id, addresses=None):
+    """
+    Endereço em que um servidor atende as consultas de hora.
+    """
+    return bind_address("time", addresses, server_id=server_id)
+
+
+def time_endpoint(server_id, addresses=None):
+    """
+    Endereço para consultar a hora de um servidor (usado para sincronizar com o líder).
+    """
+    return connect_address("time", addresses, server_id=server_id)
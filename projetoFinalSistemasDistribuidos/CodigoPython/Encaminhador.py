@@ -0,0 +1,75 @@
+import logging
+import sys
+import threading
+
+import zmq
+
+import Configuracao
+
+# Contexto para sockets ZeroMQ, definido em start()
+context = None
+
+
+def run_shard(shard, addresses=None):
+    """
+    Encaminhador XSUB/XPUB de um shard de notificações.
+    O XSUB assina tudo no PUB interno do proxy (uma única assinatura por shard),
+    enquanto as assinaturas dos usuários ficam apenas no XPUB local. Assim o custo
+    de filtragem no proxy não cresce com o número de usuários.
+    """
+    upstream = context.socket(zmq.XSUB)
+    upstream.connect(Configuracao.connect_address("shard_internal", addresses, shard=shard))
+    upstream.send(b"\x01")  # Assina todos os tópicos do shard
+
+    downstream = context.socket(zmq.XPUB)
+    downstream.setsockopt(zmq.SNDHWM, Configuracao.PUB_HIGH_WATER_MARK)
+    downstream.bind(Configuracao.bind_address("shard_public", addresses, shard=shard))
+    logging.info(f"[SHARD {shard}] Encaminhador iniciado "
+                 f"({Configuracao.connect_address('shard_internal', addresses, shard=shard)} -> "
+                 f"{Configuracao.bind_address('shard_public', addresses, shard=shard)})")
+
+    poller = zmq.Poller()
+    poller.register(upstream, zmq.POLLIN)
+    poller.register(downstream, zmq.POLLIN)
+    subscriptions = 0
+    while True:
+        try:
+            events = dict(poller.poll())
+            if upstream in events:
+                downstream.send_multipart(upstream.recv_multipart())
+            if downstream in events:
+                # Mensagens de (des)assinatura dos usuários: não são repassadas ao proxy
+                event = downstream.recv()
+                subscriptions += 1 if event[:1] == b"\x01" else -1
+                logging.info(f"[SHARD {shard}] Assinaturas ativas: {subscriptions}")
+        except Exception as e:
+            logging.error(f"[SHARD {shard}] Erro no encaminhamento: {e}", exc_info=True)
+
+
+def start(shards=None, shared_context=None, addresses=None):
+    """
+    Inicia uma thread de encaminhamento para cada shard informado (todos, por padrão).
+    """
+    global context
+    context = shared_context or zmq.Context()
+    shards = list(range(Configuracao.NOTIFICATION_SHARDS)) if shards is None else shards
+    for shard_index in shards:
+        threading.Thread(target=run_shard, args=(shard_index, addresses), daemon=True).start()
+    return shards
+
+
+if __name__ == "__main__":
+    # Configuração global de logging: grava em arquivo e mostra no terminal
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("../encaminhador.log"),
+            logging.StreamHandler()
+        ]
+    )
+    # Sem argumentos, sobe todos os shards neste processo; com argumentos, apenas os shards informados
+    # (permite distribuir os encaminhadores em vários processos locais).
+    started = start([int(arg) for arg in sys.argv[1:]] or None)
+    print(f"Encaminhadores iniciados para os shards: {started}")
+    input("Pressione Enter para sair.\n")
@@ -0,0 +1,95 @@
+# Índice invertido incremental para a busca textual de postagens
+import bisect
+import re
+import unicodedata
+
+TOKEN_PATTERN = re.compile(r"\w+")
+QUERY_PATTERN = re.compile(r"\w+\*?")
+PREFIX_WILDCARD = "*"  # Termo da consulta terminado em * busca por prefixo (ex.: "notific*")
+
+
+def normalize(text):
+    """
+    Normaliza um texto para indexação: minúsculas e sem acentos ("Notificação" -> "notificacao").
+    """
+    if text.isascii():
+        return text.lower()  # Sem acentos a remover: evita a decomposição caractere a caractere
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    """
+    Quebra um texto em termos normalizados (sem repetição).
+    """
+    return set(TOKEN_PATTERN.findall(normalize(text)))
+
+
+class IndiceInvertido:
+    """
+    Índice invertido mantido a cada postagem: termo -> conjunto de ids de posts.
+    Uma lista ordenada dos termos permite consultas por prefixo com busca binária,
+    sem percorrer o vocabulário inteiro.
+    """
+
+    def __init__(self):
+        self.postings = {}  # termo -> set(ids de posts)
+        self.terms = []  # vocabulário em ordem alfabética
+
+    def add(self, post_id, text):
+        """
+        Indexa o texto de um post.
+        """
+        for term in tokenize(text):
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = set()
+                bisect.insort(self.terms, term)
+            posting.add(post_id)
+
+    def add_many(self, items):
+        """
+        Indexa vários posts de uma vez (carga em massa): (id, texto) para cada post.
+        O vocabulário é reordenado uma única vez no fim, em vez de uma inserção ordenada por termo novo.
+        """
+        for post_id, text in items:
+            for term in tokenize(text):
+                self.postings.setdefault(term, set()).add(post_id)
+        self.terms = sorted(self.postings)
+
+    def prefix_terms(self, prefix):
+        """
+        Termos do vocabulário que começam com o prefixo informado.
+        """
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + "\U0010ffff")
+        return self.terms[start:end]
+
+    def lookup(self, query_term):
+        """
+        Ids dos posts que contêm o termo (ou algum termo com o prefixo, se terminar em *).
+        """
+        if query_term.endswith(PREFIX_WILDCARD):
+            prefix = normalize(query_term.rstrip(PREFIX_WILDCARD))
+            matches = set()
+            for term in self.prefix_terms(prefix):
+                matches |= self.postings[term]
+            return matches
+        return self.postings.get(normalize(query_term), set())
+
+    def search(self, query):
+        """
+        Ids dos posts que contêm todos os termos da consulta (E lógico).
+        Retorna None para uma consulta sem termos.
+        """
+        query_terms = QUERY_PATTERN.findall(normalize(query))
+        if not query_terms:
+            return None
+        # A interseção começa pelo menor conjunto, para descartar candidatos o quanto antes
+        postings = sorted((self.lookup(term) for term in query_terms), key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result &= posting
+        return result
@@ -0,0 +1,125 @@
+# Lançador: executa banco, proxy, encaminhadores e vários servidores em um único processo
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import threading
+import time
+
+import zmq
+
+import BancoDeDados
+import Configuracao
+import Encaminhador
+import Proxy
+
+SERVER_START_INTERVAL = 0.2  # Intervalo (segundos) entre o registro de um servidor e o do próximo
+
+
+def load_server_module(index):
+    """
+    Carrega uma cópia independente do módulo Servidor: cada servidor guarda seu estado
+    (id, caches, relógios, sockets) em variáveis globais do módulo, então cada instância
+    no mesmo processo precisa do seu próprio módulo.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Servidor.py")
+    spec = importlib.util.spec_from_file_location(f"Servidor_{index}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start(servers=2, internal="inproc", external="tcp", context=None, capture_path=None, hedge=False,
+          legacy_notifications=False):
+    """
+    Sobe o sistema inteiro em threads deste processo, com um zmq.Context compartilhado.
+    Com internal="inproc", os canais entre componentes (backend, controle, banco, eventos,
+    heartbeats, shards, hora) não passam pela pilha TCP; com external="tcp", os clientes
+    (Python, C e Java) continuam se conectando às portas de sempre.
+    Retorna (contexto, endereços, módulos dos servidores).
+    """
+    context = context or zmq.Context.instance()
+    addresses = Configuracao.endpoints(internal=internal, external=external)
+
+    BancoDeDados.start(context, addresses)
+    Proxy.start(context, addresses, capture_path, hedge, legacy_notifications)
+    threading.Thread(target=Proxy.serve, daemon=True).start()
+    Encaminhador.start(shared_context=context, addresses=addresses)
+
+    server_modules = []
+    for index in range(servers):
+        server = load_server_module(index)
+        server.start(context, addresses, per_server_log=False)
+        threading.Thread(target=server.serve, daemon=True).start()
+        server_modules.append(server)
+        time.sleep(SERVER_START_INTERVAL)
+
+    logging.info(f"[LANÇADOR] Sistema iniciado em um processo: {servers} servidores, "
+                 f"transporte interno {internal}, externo {external}")
+    return context, addresses, server_modules
+
+
+def benchmark(context, addresses, requests):
+    """
+    Mede a latência de ida e volta de uma requisição leve (timeline vazia, servida do cache
+    do servidor) pelo frontend, para comparar o custo do transporte (tcp x inproc) entre as configurações.
+    Cada requisição usa um username distinto para não esbarrar no rate limit por usuário do proxy.
+    """
+    client = context.socket(zmq.REQ)
+    client.connect(Configuracao.connect_address("frontend", addresses))
+    latencies = []
+    started = time.perf_counter()
+    for i in range(requests):
+        payload = json.dumps({"action": "get_timeline", "username": f"benchmark-{i}"}).encode('utf-8')
+        t0 = time.perf_counter()
+        client.send(payload)
+        client.recv()
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    client.close()
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "throughput": requests / elapsed,
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p99_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa o sistema completo em um único processo")
+    parser.add_argument("--servers", type=int, default=2, help="número de servidores")
+    parser.add_argument("--internal", choices=["inproc", "tcp"], default="inproc",
+                        help="transporte entre os componentes")
+    parser.add_argument("--external", choices=["inproc", "tcp"], default="tcp",
+                        help="transporte dos clientes (inproc só serve para clientes no mesmo processo)")
+    parser.add_argument("--benchmark", type=int, default=0, metavar="N",
+                        help="mede a latência de N requisições e encerra")
+    parser.add_argument("--capture", metavar="ARQUIVO", help="grava as requisições dos clientes para replay")
+    parser.add_argument("--hedge", action="store_true", help="liga o hedge de leituras no proxy")
+    parser.add_argument("--legacy-notifications", action="store_true",
+                        help="publica as notificações também na porta legada 6010 (clientes anteriores aos shards)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.WARNING if args.benchmark else logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("../lancador.log"),
+            logging.StreamHandler()
+        ]
+    )
+    shared_context, endpoints, _ = start(args.servers, args.internal, args.external,
+                                       capture_path=args.capture, hedge=args.hedge,
+                                       legacy_notifications=args.legacy_notifications)
+
+    if args.benchmark:
+        # Rodada de aquecimento (conexões e caches) antes da medição
+        benchmark(shared_context, endpoints, min(100, args.benchmark))
+        print(json.dumps(benchmark(shared_context, endpoints, args.benchmark)))
+    else:
+        print(f"Sistema iniciado com {args.servers} servidores (interno: {args.internal}, externo: {args.external})")
+        input("Pressione Enter para sair.\n")
+    BancoDeDados.shutdown()
@@ -0,0 +1,251 @@
+# Perfilamento sob demanda de um processo em execução (servidores e banco), acionado pelo canal de controle
+import argparse
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+
+import zmq
+
+import Configuracao
+
+DEFAULT_DURATION = 10  # Duração padrão (segundos) de uma janela de perfilamento
+MAX_DURATION = 300  # Janelas mais longas são recusadas (o perfilamento determinístico custa caro)
+TRACEMALLOC_FRAMES = 10  # Profundidade das pilhas guardadas pelo tracemalloc
+REPORT_TOP_FUNCTIONS = 25  # Funções listadas por ação no relatório (ordenadas por tempo acumulado)
+REPORT_TOP_ALLOCATIONS = 25  # Linhas de código listadas na comparação de alocações
+ADMIN_TIMEOUT = 2000  # Tempo máximo (ms) de espera pela resposta de um socket administrativo
+
+# O tracemalloc é global ao processo, e o Lançador roda vários servidores (cada um com o seu
+# Perfilador) no mesmo processo: o rastreamento só é ligado se ninguém o ligou antes e só é
+# desligado quando termina a última janela aberta por este módulo.
+tracemalloc_lock = threading.Lock()
+tracemalloc_users = 0  # Janelas abertas que usam o tracemalloc
+tracemalloc_owned = False  # True se foi este módulo que ligou o tracemalloc
+
+
+def acquire_tracemalloc():
+    """
+    Registra uma janela que usa o tracemalloc, ligando-o se ainda não estiver ativo.
+    """
+    global tracemalloc_users, tracemalloc_owned
+    with tracemalloc_lock:
+        if tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            tracemalloc_owned = True
+        tracemalloc_users += 1
+
+
+def release_tracemalloc():
+    """
+    Encerra o uso do tracemalloc por uma janela. Desliga-o apenas se foi ligado por este módulo
+    e não há outra janela aberta (um rastreamento iniciado por terceiros é mantido).
+    """
+    global tracemalloc_users, tracemalloc_owned
+    with tracemalloc_lock:
+        tracemalloc_users -= 1
+        if tracemalloc_users == 0 and tracemalloc_owned:
+            tracemalloc_owned = False
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+
+class Perfilador:
+    """
+    Perfilador determinístico (cProfile) por ação, ligado por uma janela de tempo.
+    Fora da janela, profile() apenas chama a função. Durante a janela, cada ação tem o seu
+    próprio cProfile.Profile (o caminho quente de cada ação aparece separado no relatório)
+    e o tracemalloc compara a memória alocada entre o início e o fim da janela.
+    Ao fim da janela, o relatório é gravado em um arquivo texto.
+    """
+
+    def __init__(self, component):
+        self.component = component
+        self.lock = threading.Lock()
+        self.state = "idle"  # idle -> active (janela aberta) -> closing (aguarda chamadas) -> writing -> idle
+        self.path = None
+        self.until = 0.0
+        self.profiles = {}  # ação -> cProfile.Profile
+        self.stats = {}  # ação -> [chamadas, segundos, bytes alocados (saldo)]
+        self.running = 0  # Chamadas perfiladas em andamento
+        self.start_snapshot = None
+        self.skipped = 0  # Chamadas não perfiladas porque outro perfilador estava ativo na thread
+
+    def start(self, duration=DEFAULT_DURATION, path=None):
+        """
+        Abre uma janela de perfilamento de "duration" segundos. Retorna a resposta do comando administrativo.
+        """
+        duration = float(duration)
+        if not 0 < duration <= MAX_DURATION:
+            return {"status": "error", "msg": f"Duração deve estar entre 0 e {MAX_DURATION} segundos"}
+        with self.lock:
+            if self.state != "idle":
+                return {"status": "busy", "path": self.path, "until": self.until}
+            self.path = path or f"../perfil_{self.component}_{time.strftime('%Y%m%d_%H%M%S')}.txt"
+            self.until = time.time() + duration
+            self.profiles = {}
+            self.stats = {}
+            self.skipped = 0
+            acquire_tracemalloc()
+            self.start_snapshot = tracemalloc.take_snapshot()
+            self.state = "active"
+        threading.Timer(duration, self._finish).start()
+        logging.info(f"[PERFIL] Perfilamento de {self.component} por {duration:.0f}s, relatório em {self.path}")
+        return {"status": "ok", "path": self.path, "until": self.until}
+
+    def profile(self, action, function, *args):
+        """
+        Executa function(*args), perfilando a chamada sob a ação informada se houver janela aberta.
+        """
+        with self.lock:
+            if self.state != "active":
+                profiler = None
+            else:
+                profiler = self.profiles.setdefault(action, cProfile.Profile())
+                self.running += 1
+        if profiler is None:
+            return function(*args)
+
+        allocated = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Outro perfilador já ativo (ex.: outro servidor do Lançador no Python 3.12+): só mede
+            profiler = None
+        try:
+            return function(*args)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            elapsed = time.perf_counter() - started
+            allocated = tracemalloc.get_traced_memory()[0] - allocated
+            with self.lock:
+                calls = self.stats.setdefault(action, [0, 0.0, 0])
+                calls[0] += 1
+                calls[1] += elapsed
+                calls[2] += allocated
+                if profiler is None:
+                    self.skipped += 1
+                self.running -= 1
+                dump = self.state == "closing" and self.running == 0
+                if dump:
+                    self.state = "writing"
+            if dump:
+                self._write_report()
+
+    def _finish(self):
+        """
+        Fecha a janela. O relatório é gravado aqui ou, se ainda houver chamadas perfiladas
+        em andamento, pela última delas (um Profile não pode ser lido enquanto está ativo).
+        """
+        with self.lock:
+            dump = self.running == 0
+            self.state = "writing" if dump else "closing"
+        if dump:
+            self._write_report()
+
+    def _write_report(self):
+        try:
+            end_snapshot = tracemalloc.take_snapshot()
+            report = io.StringIO()
+            report.write(f"Perfil de {self.component} até {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.until))}\n")
+            if self.skipped:
+                report.write(f"{self.skipped} chamadas medidas sem cProfile (outro perfilador ativo)\n")
+            report.write("\n== Resumo por ação (chamadas, tempo total, tempo médio, saldo de alocação) ==\n")
+            for action, (calls, elapsed, allocated) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+                report.write(f"{action:<24} {calls:>7} {elapsed * 1000:>11.1f}ms "
+                             f"{elapsed / calls * 1000:>9.3f}ms {allocated / 1024:>11.1f}KiB\n")
+            for action, profiler in self.profiles.items():
+                if action not in self.stats:
+                    continue
+                report.write(f"\n== Ação {action} ==\n")
+                stats = pstats.Stats(profiler, stream=report)
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(REPORT_TOP_FUNCTIONS)
+            report.write("\n== Alocações durante a janela (tracemalloc, por linha) ==\n")
+            for difference in end_snapshot.compare_to(self.start_snapshot, "lineno")[:REPORT_TOP_ALLOCATIONS]:
+                report.write(f"{difference}\n")
+            with open(self.path, "w") as f:
+                f.write(report.getvalue())
+            logging.info(f"[PERFIL] Relatório de {self.component} gravado em {self.path}")
+        except Exception as e:
+            logging.error(f"[PERFIL] Erro ao gravar o relatório de {self.component}: {e}", exc_info=True)
+        finally:
+            release_tracemalloc()
+            with self.lock:
+                self.profiles = {}
+                self.start_snapshot = None
+                self.state = "idle"
+
+    def handle_admin(self, command):
+        """
+        Trata um comando recebido no socket administrativo do componente.
+        """
+        if command.get("action") == "profile":
+            return self.start(command.get("duration", DEFAULT_DURATION), command.get("path"))
+        if command.get("action") == "profile_status":
+            with self.lock:
+                return {"status": self.state, "path": self.path, "until": self.until}
+        return {"status": "error", "msg": "Ação desconhecida"}
+
+
+def admin_loop(admin_socket, perfilador):
+    """
+    Atende o socket REP administrativo local de um componente (servidor ou banco).
+    Cada pedido recebido tem exatamente uma resposta: erros no tratamento viram uma resposta
+    de erro, e uma falha no envio é apenas registrada (um REP não aceita um segundo envio).
+    """
+    while True:
+        try:
+            message = admin_socket.recv()
+        except zmq.ZMQError as e:
+            logging.error(f"[PERFIL] Erro ao receber no socket administrativo: {e}")
+            continue
+        try:
+            command = json.loads(message)
+            logging.info(f"[PERFIL] Comando administrativo recebido: {command}")
+            reply = json.dumps(perfilador.handle_admin(command))
+        except Exception as e:
+            logging.error(f"[PERFIL] Erro ao tratar comando administrativo: {e}", exc_info=True)
+            reply = json.dumps({"status": "error", "msg": f"Erro: {e}"})
+        try:
+            admin_socket.send_string(reply)
+        except zmq.ZMQError as e:
+            logging.error(f"[PERFIL] Erro ao responder no socket administrativo: {e}")
+
+
+def send_admin(context, address, command):
+    """
+    Envia um comando a um socket administrativo e retorna a resposta (ou um erro, após ADMIN_TIMEOUT).
+    """
+    admin = context.socket(zmq.REQ)
+    admin.setsockopt(zmq.LINGER, 0)
+    admin.setsockopt(zmq.RCVTIMEO, ADMIN_TIMEOUT)
+    admin.connect(address)
+    try:
+        admin.send_json(command)
+        return admin.recv_json()
+    except zmq.Again:
+        return {"status": "error", "msg": f"Sem resposta de {address}"}
+    finally:
+        admin.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Liga o perfilador de um servidor ou do banco via canal de controle do proxy")
+    parser.add_argument("target", choices=["server", "database"], help="componente a perfilar")
+    parser.add_argument("--server-id", type=int, help="id do servidor (target=server)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="duração da janela (segundos)")
+    parser.add_argument("--path", help="arquivo do relatório, no diretório do componente perfilado")
+    args = parser.parse_args()
+
+    request = {"action": "profile", "target": args.target, "duration": args.duration}
+    if args.server_id is not None:
+        request["server_id"] = args.server_id
+    if args.path:
+        request["path"] = args.path
+    print(json.dumps(send_admin(zmq.Context.instance(), Configuracao.connect_address("control"), request)))
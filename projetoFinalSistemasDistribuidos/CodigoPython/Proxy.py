@@ -1,48 +1,122 @@
+import argparse
+import heapq
+import itertools
+import json
 import logging
 import threading
 import time
+from collections import deque
 
 import zmq
 
-# Configuração global de logging: grava em arquivo e mostra no terminal
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("../proxy.log"),
-        logging.StreamHandler()
-    ]
-)
+import Captura
+import Configuracao
+import Perfilador
+import ReturnCodes
 
-logging.info("Iniciando o proxy ZeroMQ")
+# Limites de fila (high-water marks): filas cheias resultam em rejeição imediata, não em espera
+FRONTEND_HIGH_WATER_MARK = 1000
+SERVER_QUEUE_LIMIT = 8  # Máximo de requisições enfileiradas/em atendimento por servidor
 
-# Contexto global para sockets ZeroMQ
-context = zmq.Context()
+# Contexto e sockets do proxy, criados em start()
+context = None
+addresses = None  # Endereços dos canais (Configuracao.endpoints); None = TCP local padrão
+frontend = None  # ROUTER: entrada dos clientes
+backend = None  # ROUTER: servidores (identidade = id do servidor)
+control = None  # REP: comandos de registro, eleição etc
+notification_pub = None  # PUB legado de notificações (clientes anteriores aos shards), só com --legacy-notifications
+server_pub = None  # PUB exclusivo dos servidores (membros e liderança)
+shard_pubs = []  # Um PUB interno por shard de notificações; cada um tem como assinante apenas o seu encaminhador
+heartbeat_pull = None  # PULL: heartbeats dos servidores
+capture = None  # Captura.GravadorCaptura opcional: grava todas as requisições dos clientes
 
-# Sockets principais do proxy
+# Variáveis globais do proxy
+server_id_counter = 1
+server_registry = {}  # Mapeia ID do servidor para suas informações ({"id", "pid", "draining"})
+last_heartbeat = {}  # Marca o timestamp do último heartbeat recebido de cada servidor
+lock = threading.Lock()  # Garante sincronização entre as threads (e o uso do server_pub)
+# Estatísticas do roteamento no último segundo (fila, envios por servidor, rejeições, latência),
+# publicadas por route_requests e consultadas pela ação "stats" do canal de controle (ver Supervisor.py)
+routing_stats = {}
 
-frontend = context.socket(zmq.ROUTER)
-frontend.bind("tcp://*:5555")  # Porta de entrada dos clientes
+HEARTBEAT_TIMEOUT = 4  # Tempo máximo (segundos) sem heartbeat para considerar servidor offline
 
-backend = context.socket(zmq.DEALER)
-backend.bind("tcp://*:6000")  # Porta de entrada dos servidores
+# Controle de admissão no frontend
+USER_RATE_LIMIT = 20  # Requisições por segundo permitidas por usuário (reposição do token bucket)
+USER_BURST = 40  # Capacidade do token bucket de cada usuário
+BUCKET_IDLE_TIMEOUT = 60  # Buckets sem uso há mais que isso (segundos) são descartados
+OVERLOAD_RESPONSE = json.dumps({"ret": ReturnCodes.ERROR_OVERLOADED, "msg": "Sistema sobrecarregado"}).encode('utf-8')
 
-control = context.socket(zmq.REP)
-control.bind("tcp://*:6001")  # Canal de controle para comandos de registro, eleição etc
+# Requisições sem resposta: servidor morto ou lento
+IN_FLIGHT_TIMEOUT = 5.0  # Segundos de espera pela resposta de um servidor antes de reenviar ou desistir
+READ_RETRIES = 1  # Reenvios de uma leitura idempotente (Configuracao.IDEMPOTENT_ACTIONS) sem resposta
+TIMEOUT_RESPONSE = json.dumps({"ret": ReturnCodes.ERROR_TIMEOUT, "msg": "O servidor não respondeu a tempo"}).encode('utf-8')
 
-notification_pub = context.socket(zmq.PUB)
-notification_pub.bind("tcp://*:6010")  # Canal de publicação para notificações e sync clock
+# Hedge de leituras (opcional, --hedge): leitura sem resposta após o percentil 95 da latência
+# das leituras recentes é enviada também a outro servidor; vale a primeira resposta
+hedged_reads = False
+HEDGE_PERCENTILE = 0.95
+HEDGE_SAMPLE_SIZE = 1000  # Latências de leitura recentes usadas para calcular o atraso do hedge
+HEDGE_MIN_SAMPLES = 50  # Sem amostras suficientes, não há hedge
+HEDGE_MIN_DELAY = 0.005  # Atraso mínimo (segundos): evita duplicar leituras que já são rápidas
+HEDGE_MAX_COPIES = 2  # Cópias extras por leitura: o round-robin do DEALER pode levar a cópia ao mesmo servidor lento
+LEADER_LEASE = 6  # Duração (segundos) da concessão de liderança, renovada a cada heartbeat do líder
+MEMBERSHIP_REFRESH = 3  # Intervalo (segundos) de republicação da visão de membros para novos assinantes
 
-heartbeat_pull = context.socket(zmq.PULL)
-heartbeat_pull.bind("tcp://*:6015")  # Recebe heartbeats dos servidores
+# Estado da liderança: o líder mantém o cargo enquanto a concessão (lease) for renovada
+leader_id = None
+lease_until = 0.0
+membership_version = 0
+last_membership_publish = 0.0
 
-# Variáveis globais do proxy
-server_id_counter = 1
-server_registry = {}  # Mapeia ID do servidor para suas informações
-last_heartbeat = {}  # Marca o timestamp do último heartbeat recebido de cada servidor
-lock = threading.Lock()  # Garante sincronização entre as threads
 
-HEARTBEAT_TIMEOUT = 4  # Tempo máximo (segundos) sem heartbeat para considerar servidor offline
+def refresh_leadership(now):
+    """
+    Atualiza a concessão de liderança (deve ser chamada com o lock adquirido).
+    Um novo líder (maior ID ativo) só é eleito quando a concessão atual expira,
+    garantindo que nunca existam dois líderes com concessão válida ao mesmo tempo.
+    Retorna True se o líder mudou.
+    """
+    global leader_id, lease_until
+    if leader_id is not None and now < lease_until:
+        return False
+    new_leader = max(map(int, server_registry.keys())) if server_registry else None
+    changed = new_leader != leader_id
+    leader_id = new_leader
+    lease_until = now + LEADER_LEASE if new_leader is not None else 0.0
+    if changed:
+        logging.info(f"[LEASE] Novo líder eleito: {leader_id} (concessão de {LEADER_LEASE}s)")
+    return changed
+
+
+def membership_snapshot(now):
+    """
+    Visão atual de membros e liderança (deve ser chamada com o lock adquirido).
+    A concessão é enviada como duração restante, pois os relógios dos servidores não são confiáveis.
+    """
+    return {
+        "version": membership_version,
+        "servers": list(server_registry.keys()),
+        "leader_id": leader_id,
+        "lease_remaining": max(0.0, lease_until - now) if leader_id is not None else 0.0
+    }
+
+
+def publish_membership(now, changed):
+    """
+    Publica a visão de membros no tópico 'membership' (deve ser chamada com o lock adquirido).
+    Publica imediatamente quando há mudança; caso contrário, apenas a cada MEMBERSHIP_REFRESH segundos.
+    """
+    global membership_version, last_membership_publish
+    if changed:
+        membership_version += 1
+    elif now - last_membership_publish < MEMBERSHIP_REFRESH:
+        return
+    snapshot = membership_snapshot(now)
+    server_pub.send_string(f"membership {json.dumps(snapshot)}")
+    last_membership_publish = now
+    if changed:
+        logging.info(f"[MEMBERSHIP] Mudança publicada: {snapshot}")
 
 
 def verify_active_servers():
@@ -50,25 +124,30 @@ def verify_active_servers():
     Thread que monitora heartbeats recebidos dos servidores.
     Se um servidor não enviar heartbeat dentro do intervalo HEARTBEAT_TIMEOUT,
     ele é removido do registro e considerado offline.
+    Heartbeats do líder renovam sua concessão; mudanças de membros são publicadas aos servidores.
     """
-    global server_registry
+    global server_registry, lease_until
     while True:
-        try:
-            # Recebe heartbeat sem bloquear o loop (non-blocking)
-            msg = heartbeat_pull.recv_string(flags=zmq.NOBLOCK)
-            _, server_id = msg.split()
-            with lock:
-                last_heartbeat[server_id] = time.time()
-            logging.info(f"[PROXY] Heartbeat recebido do servidor {server_id} às {last_heartbeat[server_id]:.2f}")
-        except zmq.Again:
-            # Nenhum heartbeat no momento, segue para checar timeout
-            pass
-        except Exception as e:
-            logging.error(f"[PROXY] Erro ao receber heartbeat: {e}", exc_info=True)
+        # Consome todos os heartbeats pendentes sem bloquear o loop (non-blocking)
+        while True:
+            try:
+                msg = heartbeat_pull.recv_string(flags=zmq.NOBLOCK)
+                _, server_id = msg.split()
+                with lock:
+                    last_heartbeat[server_id] = time.time()
+                    if server_id == str(leader_id) and server_id in server_registry:
+                        lease_until = last_heartbeat[server_id] + LEADER_LEASE
+                logging.info(f"[PROXY] Heartbeat recebido do servidor {server_id} às {last_heartbeat[server_id]:.2f}")
+            except zmq.Again:
+                # Nenhum heartbeat no momento, segue para checar timeout
+                break
+            except Exception as e:
+                logging.error(f"[PROXY] Erro ao receber heartbeat: {e}", exc_info=True)
 
         # Checagem de servidores "mortos"
         now = time.time()
         with lock:
+            changed = False
             for sid in list(last_heartbeat.keys()):
                 elapsed = now - last_heartbeat[sid]
                 if elapsed > HEARTBEAT_TIMEOUT:
@@ -77,18 +156,21 @@ def verify_active_servers():
                     # Remove também do registry
                     removed = server_registry.pop(sid, None)
                     if removed is not None:
+                        changed = True
                         logging.info(f"[PROXY] Servidor {sid} removido do registry")
                     else:
                         logging.info(f"[PROXY] Servidor {sid} já não estava no registry")
+            changed = refresh_leadership(now) or changed
+            publish_membership(now, changed)
         time.sleep(1)  # Evita busy waiting
 
 
 def control_thread():
     """
     Thread responsável por processar comandos administrativos vindos do canal de controle (porta 6001).
-    Implementa: registro de servidores, listagem, eleição de líder, sincronização de clock e envio de notificações.
+    Implementa: registro de servidores, listagem, eleição de líder e envio de notificações.
     """
-    global server_id_counter
+    global server_id_counter, lease_until
     logging.info("Thread de controle de registro de servidores iniciada (porta 6001)")
     while True:
         try:
@@ -99,9 +181,15 @@ def control_thread():
             if msg.get("action") == "get_server_id":
                 with lock:
                     new_id = server_id_counter
-                    server_registry[str(new_id)] = {"id": new_id}
+                    server_registry[str(new_id)] = {"id": new_id, "pid": msg.get("pid"), "draining": False}
+                    last_heartbeat[str(new_id)] = time.time()
                     server_id_counter += 1
-                control.send_json({"server_id": new_id})
+                    now = time.time()
+                    refresh_leadership(now)
+                    publish_membership(now, True)
+                    # A visão atual segue na resposta: o SUB do servidor ainda não recebe o que já foi publicado
+                    membership = membership_snapshot(now)
+                control.send_json({"server_id": new_id, "membership": membership})
                 logging.info(f"Novo servidor registrado com ID: {new_id}")
 
             # Listagem dos servidores atualmente registrados
@@ -111,23 +199,15 @@ def control_thread():
                 control.send_json({"servers": active_servers})
                 logging.info(f"Lista de servidores retornada: {active_servers}")
 
-            # Descobre qual é o líder atual (usando maior ID ativo)
+            # Descobre qual é o líder atual (detentor da concessão de liderança)
             elif msg.get("action") == "who_is_leader":
                 with lock:
-                    if server_registry:
-                        leader_id = max(map(int, server_registry.keys()))
-                    else:
-                        leader_id = None
-                control.send_json({"leader_id": leader_id})
-                logging.info(f"[SYNC] Pedido de eleição: líder atual é {leader_id}")
-
-            # Broadcast para sincronização de relógio (clock sync)
-            elif msg.get("action") == "sync_clock":
-                timestamp = msg.get("timestamp")
-                # Envia para todos os servidores via PUB/SUB, tópico 'clock_sync'
-                notification_pub.send_string(f"clock_sync {timestamp}")
-                logging.info(f"[SYNC] Broadcast de clock_sync enviado: {timestamp}")
-                control.send_json({"status": "clock_sync_broadcasted", "timestamp": timestamp})
+                    now = time.time()
+                    if refresh_leadership(now):
+                        publish_membership(now, True)
+                    current_leader = leader_id
+                control.send_json({"leader_id": current_leader})
+                logging.info(f"[SYNC] Pedido de eleição: líder atual é {current_leader}")
 
             # Broadcast de notificação para seguidores de um usuário após novo post
             elif msg.get("action") == "notify_users":
@@ -139,13 +219,48 @@ def control_thread():
                     try:
                         # Mensagem no formato "<topic> <mensagem>"
                         full_message = f"{topic} {notification_msg}"
-                        notification_pub.send_string(full_message)
+                        shard_pubs[Configuracao.notification_shard(topic)].send_string(full_message)
+                        if notification_pub is not None:
+                            notification_pub.send_string(full_message)
                         logging.info(f"Notificação enviada no tópico {topic}: {notification_msg}")
                     except Exception as e:
                         logging.error(f"Erro ao enviar notificação para {topic}: {e}")
                 # Confirmação para o servidor solicitante
                 control.send_json({"status": "ok", "notified_users": list(users_to_notify.keys())})
 
+            # Estatísticas de carga (fila, envios por servidor, heartbeats), usadas pelo supervisor
+            elif msg.get("action") == "stats":
+                control.send_json(backend_stats())
+
+            # Drenagem: o servidor deixa de receber requisições novas e termina as que já recebeu
+            elif msg.get("action") == "drain_server":
+                server_id = str(msg.get("server_id"))
+                draining = msg.get("draining", True)
+                with lock:
+                    found = server_id in server_registry
+                    if found:
+                        server_registry[server_id]["draining"] = draining
+                control.send_json({"status": "ok" if found else "error"})
+                logging.info(f"[PROXY] Drenagem do servidor {server_id}: {draining} (registrado: {found})")
+
+            # Saída planejada de um servidor (já drenado): removido sem esperar o timeout de heartbeat
+            elif msg.get("action") == "remove_server":
+                server_id = str(msg.get("server_id"))
+                with lock:
+                    removed = server_registry.pop(server_id, None)
+                    last_heartbeat.pop(server_id, None)
+                    if server_id == str(leader_id):
+                        lease_until = 0.0  # O líder já parou: nova eleição imediata, sem esperar a concessão
+                    now = time.time()
+                    changed = refresh_leadership(now) or removed is not None
+                    publish_membership(now, changed)
+                control.send_json({"status": "ok" if removed is not None else "error"})
+                logging.info(f"[PROXY] Servidor {server_id} removido a pedido do controle")
+
+            # Perfilamento sob demanda: repassado ao socket administrativo do servidor ou do banco
+            elif msg.get("action") in ("profile", "profile_status"):
+                control.send_json(forward_admin_command(msg))
+
             # Qualquer comando desconhecido é reportado como erro
             else:
                 control.send_json({"error": "Ação desconhecida"})
@@ -154,19 +269,388 @@ def control_thread():
             logging.error(f"Erro no canal de controle: {e}", exc_info=True)
 
 
-# Inicia as threads auxiliares para controle e heartbeat
-threading.Thread(target=control_thread, daemon=True).start()
-threading.Thread(target=verify_active_servers, daemon=True).start()
+def backend_stats():
+    """
+    Estatísticas do último segundo do roteamento e estado de cada servidor registrado.
+    """
+    now = time.time()
+    with lock:
+        stats = dict(routing_stats)
+        in_flight = stats.get("in_flight", {})
+        stats["servers"] = {
+            sid: {
+                "pid": info.get("pid"),
+                "draining": info.get("draining", False),
+                "in_flight": in_flight.get(sid, 0),
+                "heartbeat_age": now - last_heartbeat[sid] if sid in last_heartbeat else None
+            }
+            for sid, info in server_registry.items()
+        }
+        stats["leader_id"] = leader_id
+    return stats
+
+
+def forward_admin_command(msg):
+    """
+    Repassa um comando administrativo ao componente indicado em "target" ("server", com "server_id", ou "database").
+    """
+    target = msg.get("target")
+    if target == "database":
+        address = Configuracao.connect_address("db_admin", addresses)
+    elif target == "server":
+        with lock:
+            registered = str(msg.get("server_id")) in server_registry
+        if not registered:
+            return {"status": "error", "msg": f"Servidor {msg.get('server_id')} não registrado"}
+        address = Configuracao.connect_address("server_admin", addresses, server_id=msg["server_id"])
+    else:
+        return {"status": "error", "msg": "Alvo deve ser 'server' ou 'database'"}
+    command = {key: value for key, value in msg.items() if key not in ("target", "server_id")}
+    response = Perfilador.send_admin(context, address, command)
+    logging.info(f"[PERFIL] Comando {command} repassado a {address}: {response}")
+    return response
+
+
+def inspect_request(frames):
+    """
+    Extrai da requisição o usuário (para o rate limit: id, username ou remetente informado no pacote;
+    na falta deles, a identidade da conexão), a ação solicitada e o custo em tokens
+    (um por ação: um lote custa o número de itens).
+    """
+    key, action, cost = frames[0], None, 1
+    try:
+        package = json.loads(frames[-1])
+        action = package.get("action")
+        for field in ("id", "username", "remetente"):
+            if package.get(field) is not None:
+                key = f"{field}:{package[field]}"
+                break
+        if action == "batch" and isinstance(package.get("requests"), list):
+            cost = max(1, len(package["requests"]))
+    except (ValueError, AttributeError):
+        pass
+    return key, action, cost
+
+
+def take_token(buckets, key, now, cost=1):
+    """
+    Token bucket por usuário: retorna True se a requisição pode ser admitida.
+    Basta um token para admitir; o custo inteiro é debitado e o saldo pode ficar negativo,
+    de modo que um lote maior que USER_BURST é admitido, mas o usuário espera a reposição
+    de todas as suas ações antes da próxima requisição.
+    """
+    tokens, last = buckets.get(key, (USER_BURST, now))
+    tokens = min(USER_BURST, tokens + (now - last) * USER_RATE_LIMIT)
+    if tokens < 1:
+        buckets[key] = (tokens, now)
+        return False
+    buckets[key] = (tokens - cost, now)
+    return True
+
+
+def refund_token(buckets, key, cost=1):
+    """
+    Devolve os tokens cobrados de uma requisição que acabou não sendo atendida.
+    """
+    tokens, last = buckets[key]
+    buckets[key] = (min(USER_BURST, tokens + cost), last)
+
+
+def admission(buckets, key, now, cost, outstanding, max_pending):
+    """
+    Decide a admissão de uma requisição: None se admitida (tokens cobrados), "saturated" se o sistema
+    está sem capacidade ou "rate_limited" se o usuário esgotou os seus tokens.
+    A saturação é verificada antes: uma rejeição por falta de capacidade não consome tokens do usuário.
+    """
+    if outstanding >= max_pending:
+        return "saturated"
+    if not take_token(buckets, key, now, cost):
+        return "rate_limited"
+    return None
+
+
+def route_requests():
+    """
+    Encaminha requisições dos clientes (frontend) aos servidores (backend) com controle de admissão:
+    rate limit por usuário, limite de requisições pendentes proporcional ao número de servidores ativos
+    e filas limitadas por servidor. Requisições que não podem ser admitidas recebem imediatamente
+    ERROR_OVERLOADED, mantendo limitada a latência das que foram aceitas.
+    O backend é um ROUTER: cada envio vai ao servidor com menos envios em andamento (pela identidade,
+    o id do servidor), fora os que estão em drenagem, e reenvios e hedges evitam os servidores que
+    já receberam a requisição. Cada envio leva um identificador próprio (devolvido pelo servidor na
+    resposta) e o instante do envio (frame extra, para o servidor descartar as que esperaram demais
+    na fila). Pelo identificador, só a primeira resposta de cada requisição chega ao cliente:
+    respostas atrasadas (após timeout) ou duplicadas (hedge) são descartadas.
+    Sem resposta em IN_FLIGHT_TIMEOUT, leituras idempotentes são reenviadas a outro servidor e as
+    demais recebem ERROR_TIMEOUT, de modo que um servidor morto nunca deixa o cliente esperando para sempre.
+    """
+    poller = zmq.Poller()
+    poller.register(frontend, zmq.POLLIN)
+    poller.register(backend, zmq.POLLIN)
+    in_flight = {}  # identificador do envio -> (requisição, id do servidor); a requisição é compartilhada entre reenvios e hedges
+    server_load = {}  # id do servidor -> envios em andamento nele
+    routable = []  # Servidores registrados fora de drenagem
+    outstanding = 0  # Requisições admitidas ainda sem resposta ao cliente (base do limite de admissão)
+    timers = []  # heap de (instante, identificador do envio, "hedge" ou "timeout")
+    tags = itertools.count(1)
+    read_latencies = deque(maxlen=HEDGE_SAMPLE_SIZE)
+    window_latencies = []  # Latências das respostas desde a última limpeza periódica (estatísticas)
+    hedge_delay = None  # Atraso do hedge (percentil HEDGE_PERCENTILE das leituras), None até haver amostras
+    buckets = {}  # usuário -> (tokens, instante da última atualização)
+    admitted = rejected = saturated = retried = hedged = late = timed_out = 0
+    last_housekeeping = time.time()
+
+    def dispatch_to_server(request, now):
+        # Servidores ainda não usados por esta requisição primeiro; entre eles, o menos ocupado
+        candidates = sorted((sid for sid in routable if server_load.get(sid, 0) < SERVER_QUEUE_LIMIT),
+                            key=lambda sid: (sid in request["servers"], server_load.get(sid, 0)))
+        for sid in candidates:
+            tag = next(tags).to_bytes(8, "big")
+            try:
+                # O instante enviado é o deste envio: um reenvio não deve chegar ao servidor já "expirado"
+                backend.send_multipart([sid.encode(), tag] + request["envelope"] + [request["payload"], repr(now).encode()],
+                                       zmq.NOBLOCK)
+            except zmq.ZMQError as e:
+                # Servidor registrado mas ainda não conectado (ou já desconectado), ou fila cheia
+                if e.errno in (zmq.EHOSTUNREACH, zmq.EAGAIN):
+                    continue
+                raise
+            in_flight[tag] = (request, sid)
+            server_load[sid] = server_load.get(sid, 0) + 1
+            request["servers"].add(sid)
+            heapq.heappush(timers, (now + IN_FLIGHT_TIMEOUT, tag, "timeout"))
+            if hedged_reads and request["read"] and hedge_delay is not None and request["hedges"] < HEDGE_MAX_COPIES:
+                heapq.heappush(timers, (now + hedge_delay, tag, "hedge"))
+            return
+        raise zmq.Again()
+
+    def release(tag):
+        request, sid = in_flight.pop(tag)
+        server_load[sid] -= 1
+        return request
+
+    while True:
+        timeout = 1000 if not timers else max(0, min(1000, int((timers[0][0] - time.time()) * 1000) + 1))
+        events = dict(poller.poll(timeout))
+        now = time.time()
+        with lock:
+            routable = [sid for sid, info in server_registry.items() if not info.get("draining")]
+
+        if frontend in events:
+            while True:
+                try:
+                    frames = frontend.recv_multipart(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                if capture is not None:
+                    capture.record(now, frames[-1])
+                key, action, cost = inspect_request(frames)
+                max_pending = SERVER_QUEUE_LIMIT * max(1, len(routable))
+                refusal = admission(buckets, key, now, cost, outstanding, max_pending)
+                if refusal is not None:
+                    frontend.send_multipart(frames[:-1] + [OVERLOAD_RESPONSE])
+                    rejected += 1
+                    if refusal == "saturated":
+                        saturated += 1
+                    continue
+                request = {"envelope": frames[:-1], "payload": frames[-1], "admitted": now, "servers": set(),
+                           "read": action in Configuracao.IDEMPOTENT_ACTIONS, "attempts": 1, "hedges": 0, "done": False}
+                try:
+                    dispatch_to_server(request, now)
+                except zmq.Again:
+                    # Filas de todos os servidores cheias: os tokens cobrados são devolvidos
+                    refund_token(buckets, key, cost)
+                    frontend.send_multipart(frames[:-1] + [OVERLOAD_RESPONSE])
+                    rejected += 1
+                    saturated += 1
+                    continue
+                outstanding += 1
+                admitted += 1
+
+        if backend in events:
+            while True:
+                try:
+                    # Frames sem cópia: a resposta (às vezes a timeline inteira) segue ao cliente
+                    # pelo mesmo buffer do ZeroMQ, sem passar por bytes do Python
+                    frames = backend.recv_multipart(zmq.NOBLOCK, copy=False)
+                except zmq.Again:
+                    break
+                # frames[0] é a identidade do servidor e frames[1] o identificador do envio
+                tag = frames[1].bytes
+                request = release(tag) if tag in in_flight else None
+                if request is None or request["done"]:
+                    late += 1  # Já respondida (por outro envio) ou já expirada
+                    continue
+                request["done"] = True
+                outstanding -= 1
+                window_latencies.append(now - request["admitted"])
+                if request["read"]:
+                    read_latencies.append(now - request["admitted"])
+                frontend.send_multipart(frames[2:], copy=False)
+
+        # Temporizadores vencidos: hedges a disparar e envios sem resposta
+        while timers and timers[0][0] <= now:
+            _, tag, kind = heapq.heappop(timers)
+            sent = in_flight.get(tag)
+            if sent is None or sent[0]["done"]:
+                if kind == "timeout" and sent is not None:
+                    release(tag)
+                continue
+            request = sent[0]
+            try:
+                if kind == "hedge":
+                    # Fora do limite de admissão (um servidor travado ocupa as vagas justamente quando
+                    # o hedge é útil); só o limite por servidor pode recusá-lo
+                    request["hedges"] += 1
+                    dispatch_to_server(request, now)
+                    hedged += 1
+                    continue
+                release(tag)
+                if request["read"] and request["attempts"] <= READ_RETRIES:
+                    request["attempts"] += 1
+                    dispatch_to_server(request, now)
+                    retried += 1
+                    continue
+            except zmq.Again:
+                if kind == "hedge":
+                    continue
+            if not any(other is request for other, _ in in_flight.values()):
+                request["done"] = True
+                outstanding -= 1
+                frontend.send_multipart(request["envelope"] + [TIMEOUT_RESPONSE])
+                timed_out += 1
+
+        # Limpeza periódica: buckets ociosos, atraso do hedge e estatísticas para o supervisor
+        if now - last_housekeeping >= 1:
+            for key, (_, last) in list(buckets.items()):
+                if now - last > BUCKET_IDLE_TIMEOUT:
+                    del buckets[key]
+            for sid in [sid for sid, load in server_load.items() if load == 0 and sid not in routable]:
+                del server_load[sid]
+            if len(read_latencies) >= HEDGE_MIN_SAMPLES:
+                ordered = sorted(read_latencies)
+                hedge_delay = max(HEDGE_MIN_DELAY, ordered[int(len(ordered) * HEDGE_PERCENTILE)])
+            window_latencies.sort()
+            with lock:
+                routing_stats.update({
+                    "outstanding": outstanding,
+                    "capacity": SERVER_QUEUE_LIMIT * len(routable),
+                    "in_flight": dict(server_load),
+                    "admitted": admitted,
+                    "rejected": rejected,
+                    "saturated": saturated,
+                    "retried": retried,
+                    "timed_out": timed_out,
+                    "p95": window_latencies[int(len(window_latencies) * 0.95)] if window_latencies else None,
+                    "updated": now,
+                })
+            if rejected or retried or timed_out:
+                logging.warning(f"[ADMISSÃO] {admitted} admitidas, {rejected} rejeitadas por sobrecarga "
+                                f"({saturated} por falta de capacidade); {outstanding} pendentes; "
+                                f"{retried} reenviadas, {timed_out} expiradas")
+            if hedged or late:
+                logging.info(f"[HEDGE] {hedged} envios duplicados (atraso {hedge_delay}), "
+                             f"{late} respostas atrasadas descartadas")
+            admitted = rejected = saturated = retried = hedged = late = timed_out = 0
+            window_latencies = []
+            last_housekeeping = now
+
+
+def start(shared_context=None, endpoints=None, capture_path=None, hedge=False, legacy_notifications=False):
+    """
+    Cria e liga os sockets do proxy e inicia as threads auxiliares de controle e heartbeat.
+    Com um contexto compartilhado e endereços inproc, o proxy pode rodar no mesmo processo
+    que os servidores e o banco (ver Lancador.py). Com capture_path, grava as requisições
+    dos clientes para replay (ver Replay.py). Com hedge, liga o hedge de leituras.
+    Com legacy_notifications, as notificações também saem pelo PUB legado (porta 6010), para clientes
+    anteriores aos shards; sem ele, só pelos shards (todos os clientes atuais, inclusive C e Java).
+    """
+    global context, addresses, frontend, backend, control, notification_pub, server_pub, heartbeat_pull, capture
+    global hedged_reads
+    hedged_reads = hedge
+    logging.info("Iniciando o proxy ZeroMQ")
+    context = shared_context or zmq.Context()
+    addresses = endpoints
+
+    frontend = context.socket(zmq.ROUTER)
+    frontend.setsockopt(zmq.RCVHWM, FRONTEND_HIGH_WATER_MARK)
+    frontend.setsockopt(zmq.SNDHWM, FRONTEND_HIGH_WATER_MARK)
+    frontend.bind(Configuracao.bind_address("frontend", addresses))
+
+    backend = context.socket(zmq.ROUTER)
+    backend.setsockopt(zmq.SNDHWM, SERVER_QUEUE_LIMIT)  # Fila limitada por servidor conectado
+    backend.setsockopt(zmq.ROUTER_MANDATORY, 1)  # Servidor desconectado: erro no envio, não descarte silencioso
+    backend.bind(Configuracao.bind_address("backend", addresses))
+
+    control = context.socket(zmq.REP)
+    control.bind(Configuracao.bind_address("control", addresses))
+
+    if legacy_notifications:
+        notification_pub = context.socket(zmq.PUB)
+        notification_pub.setsockopt(zmq.SNDHWM, Configuracao.PUB_HIGH_WATER_MARK)
+        notification_pub.bind(Configuracao.bind_address("notifications", addresses))
+
+    server_pub = context.socket(zmq.PUB)
+    server_pub.setsockopt(zmq.SNDHWM, Configuracao.PUB_HIGH_WATER_MARK)
+    server_pub.bind(Configuracao.bind_address("server_pub", addresses))
+
+    for shard in range(Configuracao.NOTIFICATION_SHARDS):
+        shard_pub = context.socket(zmq.PUB)
+        shard_pub.setsockopt(zmq.SNDHWM, Configuracao.PUB_HIGH_WATER_MARK)
+        shard_pub.bind(Configuracao.bind_address("shard_internal", addresses, shard=shard))
+        shard_pubs.append(shard_pub)
+
+    heartbeat_pull = context.socket(zmq.PULL)
+    heartbeat_pull.bind(Configuracao.bind_address("heartbeats", addresses))
+
+    if capture_path:
+        capture = Captura.GravadorCaptura(context, capture_path)
+
+    # Inicia as threads auxiliares para controle e heartbeat
+    threading.Thread(target=control_thread, daemon=True).start()
+    threading.Thread(target=verify_active_servers, daemon=True).start()
+
+    channels = ["frontend", "backend", "control", "server_pub", "heartbeats"]
+    if legacy_notifications:
+        channels.append("notifications")
+    logging.info("Sockets ligados: " + ", ".join(f"{name} em {Configuracao.bind_address(name, addresses)}"
+                                                  for name in channels))
+
+
+def serve():
+    """
+    Loop principal do proxy (bloqueante).
+    """
+    logging.info("Iniciando o proxy principal")
+    try:
+        # Ponte entre frontend (clientes) e backend (servidores), com controle de admissão
+        route_requests()
+    except Exception:
+        logging.error("Erro no proxy", exc_info=True)
+
+    logging.info("Proxy finalizado")
 
-logging.info(
-    "Sockets ligados: frontend na porta 5555, backend na porta 6000, controle na porta 6001, PUB na 6010, heartbeats na 6015")
-print("Proxy iniciado: clientes -> 5555, servidores -> 6000, controle -> 6001, pub -> 6010, heartbeats -> 6015")
 
-logging.info("Iniciando o proxy principal")
-try:
-    # Função de proxy principal do ZeroMQ: faz a ponte entre frontend (clientes) e backend (servidores)
-    zmq.proxy(frontend, backend)
-except Exception:
-    logging.error("Erro no proxy", exc_info=True)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Proxy principal")
+    parser.add_argument("--capture", metavar="ARQUIVO", help="grava as requisições dos clientes para replay")
+    parser.add_argument("--hedge", action="store_true",
+                        help="duplica em outro servidor as leituras lentas (percentil 95); vale a primeira resposta")
+    parser.add_argument("--legacy-notifications", action="store_true",
+                        help="publica as notificações também na porta legada 6010 (clientes anteriores aos shards)")
+    args = parser.parse_args()
 
-logging.info("Proxy finalizado")
+    # Configuração global de logging: grava em arquivo e mostra no terminal
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("../proxy.log"),
+            logging.StreamHandler()
+        ]
+    )
+    start(capture_path=args.capture, hedge=args.hedge, legacy_notifications=args.legacy_notifications)
+    print("Proxy iniciado: clientes -> 5555, servidores -> 6000, controle -> 6001, "
+          f"{'pub -> 6010, ' if args.legacy_notifications else ''}"
+          f"pub servidores -> {Configuracao.SERVER_PUB_PORT}, heartbeats -> 6015")
+    serve()
@@ -0,0 +1,49 @@
+# Registro de usernames do banco: chaves normalizadas (sem distinção de maiúsculas) e filtro de Bloom
+import unicodedata
+
+import Bloom
+
+FILTER_INITIAL_CAPACITY = 100000  # Usernames previstos no filtro inicial; ao passar disso, ele dobra
+FILTER_ERROR_RATE = 0.01  # Taxa de falsos positivos do filtro dentro da capacidade
+
+
+def normalize(username):
+    """
+    Chave de um username: "Alice", "ALICE" e "alice" são o mesmo usuário.
+    NFKC unifica formas Unicode equivalentes (ex.: caracteres compostos e decompostos).
+    """
+    return unicodedata.normalize("NFKC", username).casefold()
+
+
+class RegistroUsuarios:
+    """
+    Índice (hash) username normalizado -> username como foi cadastrado, mais um filtro de Bloom
+    das chaves normalizadas, que os servidores baixam para recusar usernames inexistentes sem
+    consultar o banco. A contagem do filtro é o número de usuários cadastrados: serve como número
+    de sequência dos eventos de cadastro, para um servidor detectar um evento perdido.
+    """
+
+    def __init__(self, capacity=FILTER_INITIAL_CAPACITY, error_rate=FILTER_ERROR_RATE):
+        self.keys = {}  # username normalizado -> username cadastrado
+        self.error_rate = error_rate
+        self.filter = Bloom.FiltroBloom(capacity, error_rate)
+
+    def canonical(self, username):
+        """
+        Username como foi cadastrado (qualquer grafia de maiúsculas), ou None se não existir.
+        """
+        return self.keys.get(normalize(username))
+
+    def add(self, username):
+        """
+        Registra um username novo (o chamador já verificou que a chave está livre).
+        O filtro é reconstruído com o dobro da capacidade quando ela é ultrapassada,
+        mantendo a taxa de falsos positivos.
+        """
+        key = normalize(username)
+        self.keys[key] = username
+        self.filter.add(key)
+        if self.filter.count > self.filter.capacity:
+            self.filter = Bloom.FiltroBloom(self.filter.capacity * 2, self.error_rate)
+            for existing in self.keys:
+                self.filter.add(existing)
@@ -0,0 +1,160 @@
+import threading
+import time
+
+MAX_SLEW_RATE = 0.1  # Velocidade máxima de correção: no máximo 0,1s ajustado por segundo real
+MIN_CLOCK_RATE = 0.5  # O relógio nunca anda a menos da metade da velocidade real (nunca volta no tempo)
+
+
+class RelogioLocal:
+    """
+    Relógio local simulado de um servidor.
+    Avança continuamente com o tempo real, porém com uma taxa de drift ajustável,
+    e aplica correções de sincronização por slewing (acelerando ou desacelerando
+    gradualmente), de forma que a leitura nunca salte para trás.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.base_real = time.time()  # Instante real da última mudança de taxa
+        self.base_local = self.base_real  # Leitura local nesse mesmo instante
+        self.drift_rate = 0.0  # Erro de frequência simulado (segundos por segundo)
+        self.slew_rate = 0.0  # Taxa de correção em andamento (segundos por segundo)
+        self.slew_until = 0.0  # Instante real em que a correção termina
+
+    def _read_locked(self, now):
+        """
+        Leitura do relógio com o lock adquirido: integra as taxas desde a última mudança.
+        A parte de slewing só conta até slew_until.
+        """
+        elapsed = now - self.base_real
+        slewed = max(0.0, min(now, self.slew_until) - self.base_real)
+        return self.base_local + elapsed * (1 + self.drift_rate) + slewed * self.slew_rate
+
+    def _rebase_locked(self, now):
+        """
+        Fixa a leitura atual como nova base antes de alterar qualquer taxa.
+        """
+        self.base_local = self._read_locked(now)
+        self.base_real = now
+        if now >= self.slew_until:
+            self.slew_rate = 0.0
+
+    def read(self):
+        """
+        Retorna o valor atual do relógio local (segundos, como time.time()).
+        """
+        with self.lock:
+            return self._read_locked(time.time())
+
+    def set_drift_rate(self, rate):
+        """
+        Altera a taxa de drift simulada.
+        """
+        with self.lock:
+            self._rebase_locked(time.time())
+            # Reserva margem para a desaceleração máxima do slewing
+            self.drift_rate = max(rate, MIN_CLOCK_RATE - 1 + MAX_SLEW_RATE)
+
+    def adjust(self, offset):
+        """
+        Agenda a correção de 'offset' segundos por slewing, limitada a MAX_SLEW_RATE.
+        Substitui qualquer correção anterior ainda em andamento.
+        Retorna a duração (segundos reais) da correção.
+        """
+        with self.lock:
+            now = time.time()
+            self._rebase_locked(now)
+            if offset == 0:
+                self.slew_rate = 0.0
+                self.slew_until = now
+                return 0.0
+            rate = max(-MAX_SLEW_RATE, min(MAX_SLEW_RATE, offset))
+            duration = offset / rate
+            self.slew_rate = rate
+            self.slew_until = now + duration
+            return duration
+
+
+HLC_COUNTER_BITS = 16  # Bits reservados ao contador lógico no valor codificado do HLC
+HLC_MAX_COUNTER = (1 << HLC_COUNTER_BITS) - 1
+# Maior avanço (ms) de um HLC recebido sobre o relógio físico local. Os relógios dos servidores são
+# sincronizados com o líder; um valor muito à frente indica relógio defeituoso ou dado forjado
+# e, se incorporado, levaria todos os HLCs seguintes para o futuro.
+MAX_HLC_OFFSET_MS = 5000
+
+
+class HLCForaDoLimite(ValueError):
+    """
+    HLC recebido adiante do relógio local além de MAX_HLC_OFFSET_MS (não é incorporado).
+    """
+
+
+def encode_hlc(physical_ms, counter):
+    """
+    Codifica (tempo físico em ms, contador lógico) em um único inteiro ordenável.
+    """
+    if not 0 <= counter <= HLC_MAX_COUNTER:
+        raise ValueError(f"Contador de HLC fora do intervalo: {counter}")
+    return (physical_ms << HLC_COUNTER_BITS) | counter
+
+
+def decode_hlc(value):
+    """
+    Decodifica um valor de HLC em (tempo físico em ms, contador lógico).
+    """
+    return value >> HLC_COUNTER_BITS, value & ((1 << HLC_COUNTER_BITS) - 1)
+
+
+class RelogioHibrido:
+    """
+    Relógio lógico híbrido (HLC): combina o relógio local sincronizado com um
+    contador lógico. Os valores gerados são estritamente crescentes e respeitam
+    a causalidade entre servidores, mesmo com relógios físicos levemente defasados.
+    Quando o contador se esgota no mesmo milissegundo, o tempo físico avança 1ms.
+    """
+
+    def __init__(self, relogio, max_offset_ms=MAX_HLC_OFFSET_MS):
+        self.relogio = relogio
+        self.max_offset_ms = max_offset_ms
+        self.lock = threading.Lock()
+        self.physical = 0  # Maior tempo físico (ms) já observado
+        self.counter = 0
+
+    def _set_locked(self, physical, counter):
+        if counter > HLC_MAX_COUNTER:
+            physical, counter = physical + 1, 0
+        self.physical, self.counter = physical, counter
+        return encode_hlc(physical, counter)
+
+    def now(self):
+        """
+        Gera um novo valor de HLC para um evento local (ex.: carimbar um post).
+        """
+        with self.lock:
+            wall = int(self.relogio.read() * 1000)
+            if wall > self.physical:
+                return self._set_locked(wall, 0)
+            return self._set_locked(self.physical, self.counter + 1)
+
+    def update(self, remote):
+        """
+        Incorpora um valor de HLC recebido de outro nó (ex.: o maior valor gravado no banco),
+        garantindo que os próximos valores locais sejam posteriores a ele.
+        Lança HLCForaDoLimite, sem alterar o relógio, se o valor estiver adiante do relógio
+        local além de max_offset_ms.
+        """
+        remote_physical, remote_counter = decode_hlc(remote)
+        with self.lock:
+            wall = int(self.relogio.read() * 1000)
+            if remote_physical > wall + self.max_offset_ms:
+                raise HLCForaDoLimite(f"HLC recebido {remote_physical - wall}ms adiante do relógio local")
+            physical = max(self.physical, remote_physical, wall)
+            if physical == self.physical == remote_physical:
+                counter = max(self.counter, remote_counter) + 1
+            elif physical == self.physical:
+                counter = self.counter + 1
+            elif physical == remote_physical:
+                counter = remote_counter + 1
+            else:
+                counter = 0
+            return self._set_locked(physical, counter)
@@ -0,0 +1,113 @@
+# Replay de uma captura do proxy (Captura.py) contra o frontend, para testes de regressão de desempenho
+import argparse
+import json
+import time
+
+import zmq
+
+import Captura
+import Configuracao
+import ReturnCodes
+
+DEFAULT_MAX_OUTSTANDING = 1000  # Requisições sem resposta admitidas antes de pausar o envio
+REPLY_TIMEOUT = 10.0  # Segundos de espera pelas últimas respostas antes de encerrar
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def classify(reply):
+    """
+    Classifica uma resposta: "ok", "overloaded" (ERROR_OVERLOADED do proxy) ou "error".
+    Respostas comprimidas (Compressao) não são decodificadas: só são contadas como ok.
+    """
+    try:
+        code = json.loads(reply).get("ret", 0)
+    except (ValueError, UnicodeDecodeError, AttributeError):
+        return "ok"
+    if code == ReturnCodes.ERROR_OVERLOADED:
+        return "overloaded"
+    return "ok" if code == 0 else "error"
+
+
+def replay(records, endpoint, speed=1.0, max_outstanding=DEFAULT_MAX_OUTSTANDING):
+    """
+    Reenvia as requisições capturadas em malha aberta: cada uma sai no instante original
+    (relativo à primeira) dividido por speed; com speed=0, todas saem o mais rápido possível.
+    Usa um DEALER com um quadro de correlação, então várias requisições ficam em voo ao mesmo
+    tempo, como na captura. Retorna o resumo (latências em ms, vazão e contagem por resultado).
+    """
+    context = zmq.Context.instance()
+    client = context.socket(zmq.DEALER)
+    client.setsockopt(zmq.LINGER, 0)
+    client.connect(endpoint)
+
+    sent_at = {}
+    latencies = []
+    outcomes = {"ok": 0, "overloaded": 0, "error": 0}
+
+    def receive(timeout_ms):
+        if not client.poll(timeout_ms):
+            return False
+        while True:
+            try:
+                request_id, _, reply = client.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return True
+            started = sent_at.pop(request_id, None)
+            if started is not None:
+                latencies.append((time.perf_counter() - started) * 1000)
+                outcomes[classify(reply)] += 1
+
+    base = records[0][0] if records else 0.0
+    started = time.perf_counter()
+    for index, (arrival, payload) in enumerate(records):
+        if speed > 0:
+            due = started + (arrival - base) / speed
+            while time.perf_counter() < due:
+                receive(max(0, int((due - time.perf_counter()) * 1000)))
+        while len(sent_at) >= max_outstanding:
+            receive(100)
+        request_id = index.to_bytes(4, "big")
+        sent_at[request_id] = time.perf_counter()
+        client.send_multipart([request_id, b"", payload])
+        receive(0)
+
+    deadline = time.perf_counter() + REPLY_TIMEOUT
+    while sent_at and time.perf_counter() < deadline:
+        receive(100)
+    elapsed = time.perf_counter() - started
+    client.close()
+
+    latencies.sort()
+    return {
+        "requests": len(records),
+        "answered": len(latencies),
+        "lost": len(sent_at),
+        "elapsed_s": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p90_ms": round(percentile(latencies, 0.90), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+        **outcomes,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproduz uma captura do proxy e mede latência e vazão")
+    parser.add_argument("trace", help="arquivo gravado com Proxy.py --capture")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="fator de velocidade (1 = ritmo original, 2 = duas vezes mais rápido, 0 = máximo)")
+    parser.add_argument("--endpoint", default=Configuracao.connect_address("frontend"),
+                        help="frontend do proxy")
+    parser.add_argument("--max-outstanding", type=int, default=DEFAULT_MAX_OUTSTANDING,
+                        help="máximo de requisições em voo")
+    args = parser.parse_args()
+
+    trace = Captura.read_trace(args.trace)
+    print(f"{len(trace)} requisições carregadas de {args.trace}")
+    print(json.dumps(replay(trace, args.endpoint, args.speed, args.max_outstanding), indent=2))
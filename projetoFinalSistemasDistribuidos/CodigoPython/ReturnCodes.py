@@ -4,6 +4,7 @@
 SUCCESS = 0
 ERROR_GENERAL = -1
 PROCESSING = -2
+ERROR_UNKNOWN_ACTION = -99
 
 # User-related codes
 ERROR_USER_NOT_FOUND = -10
@@ -21,3 +22,7 @@ ERROR_MESSAGE_FORMAT_INVALID = -31
 # Follow/Unfollow codes
 ERROR_ALREADY_FOLLOWING = -40
 ERROR_NOT_FOLLOWING = -41
+
+# Admission control codes
+ERROR_OVERLOADED = -50
+ERROR_TIMEOUT = -51
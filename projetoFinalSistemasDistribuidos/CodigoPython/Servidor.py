@@ -1,5 +1,6 @@
 import json
 import logging
+import os
 import random
 import threading
 import time
@@ -7,84 +8,198 @@ import traceback
 
 import zmq
 
+import Bloom
+import Cache
+import ClienteBanco
+import Compressao
+import Configuracao
+import Perfilador
+import RegistroUsuarios
+import Relogio
 import ReturnCodes
 
-# Configuração inicial do sistema de logging para saída no terminal
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()  # Provisório: terminal
-    ]
-)
-
-# Contexto global do ZeroMQ para criação dos sockets
-context = zmq.Context()
-
-# Sockets principais utilizados para comunicação entre os componentes do sistema distribuído
-mainSocket = context.socket(zmq.REP)
-mainSocket.connect("tcp://localhost:6000")  # Comunicação com o proxy principal
-
-dataBaseSocket = context.socket(zmq.REQ)
-dataBaseSocket.connect("tcp://localhost:6011")  # Comunicação com o banco de dados central
-
-control_socket = context.socket(zmq.REQ)
-control_socket.connect("tcp://localhost:6001")  # Canal de controle e coordenação
-
-heartbeat_push = context.socket(zmq.PUSH)
-heartbeat_push.connect("tcp://localhost:6015")  # Canal para envio de heartbeats ao proxy
+# Contexto global do ZeroMQ e sockets principais utilizados para comunicação entre os componentes
+# do sistema distribuído, criados em start()
+context = None
+addresses = None  # Endereços dos canais (Configuracao.endpoints); None = TCP local padrão
+mainSocket = None  # DEALER: comunicação com o proxy principal (atendido como um REP, ver serve())
+database_client = None  # Cliente do banco de dados central: várias requisições em andamento, com timeout por chamada
+control_socket = None  # REQ: canal de controle e coordenação
+heartbeat_push = None  # PUSH: envio de heartbeats ao proxy
+membership_sub = None  # SUB: eventos de membros e liderança
+db_events_sub = None  # SUB: invalidações publicadas pelo banco
+admin_socket = None  # REP: comandos administrativos locais (perfilamento), repassados pelo proxy
+perfilador = None  # Perfilador.Perfilador deste servidor, criado após o registro
+server_id = None
+
+# Caches de leitura (read-through) dos dados consultados com frequência no banco
+user_id_cache = Cache.CacheLRU("user_ids", capacity=10000, ttl=300)  # username normalizado -> id (ou -1)
+followers_cache = Cache.CacheLRU("followers", capacity=10000, ttl=60)  # id -> lista de seguidores
+timeline_cache = Cache.CacheLRU("timeline", capacity=16, ttl=30)  # (codificação, limite) -> timeline serializada (bytes)
+conversation_cache = Cache.CacheLRU("conversations", capacity=1000, ttl=60)  # (remetente, destinatário normalizados, codificação) -> bytes
+caches = [user_id_cache, followers_cache, timeline_cache, conversation_cache]
+
+MAX_BATCH_SIZE = 100  # Máximo de ações em um lote enviado por cliente
+MAX_QUEUE_WAIT = 2.0  # Tempo máximo (segundos) que uma requisição admitida pelo proxy pode esperar na fila
+
+# Filtro de Bloom dos usernames cadastrados, baixado do banco e mantido pelos eventos de cadastro.
+# Um username fora dele só é recusado sem consultar o banco se a versão do filtro (número de usuários)
+# foi conferida com o banco há menos de USERNAME_FILTER_CHECK_INTERVAL: um evento de cadastro perdido
+# é percebido na próxima recusa, não só no próximo cadastro. None = desativado (toda consulta vai ao banco)
+USERNAME_FILTER_CHECK_INTERVAL = 1.0
+username_filter_lock = threading.Lock()
+username_filter = None
+username_filter_checked = 0.0  # Instante (time.monotonic()) da última conferência da versão do filtro
+username_filter_rejections = 0  # Consultas recusadas pelo filtro desde a última métrica
+
+# Protege o socket REQ de controle, compartilhado entre a thread principal e as threads auxiliares
+control_lock = threading.Lock()
+
+# Visão local (em cache) dos membros e da liderança, atualizada pelos eventos publicados pelo proxy
+membership_lock = threading.Lock()
+membership_version = -1
+server_ids = []
+leader_id = None
+leader_lease_until = 0.0  # Instante local (time.time()) em que a concessão de liderança expira
+
+# Relógio local deste servidor (simulado com drift, corrigido por slewing)
+local_clock = Relogio.RelogioLocal()
+
+# Relógio lógico híbrido usado para carimbar posts e mensagens privadas
+hlc_clock = Relogio.RelogioHibrido(local_clock)
+
+CLOCK_SYNC_INTERVAL = 5  # Intervalo (segundos) entre rodadas de sincronização com o líder
+CLOCK_SYNC_SAMPLES = 4  # Amostras por rodada; usa-se a de menor RTT (algoritmo de Cristian)
+CLOCK_SYNC_TIMEOUT = 1000  # Tempo máximo (ms) de espera pela resposta do líder
+
+# Métricas da sincronização de relógio deste servidor
+clock_metrics = {
+    "offset": 0.0,  # Último offset medido em relação ao líder (segundos)
+    "rtt": 0.0,  # RTT da amostra usada (segundos)
+    "drift": 0.0,  # Drift estimado (segundos por segundo)
+    "syncs": 0,
+    "last_sync": None
+}
+
+
+def apply_membership(snapshot):
+    """
+    Atualiza a visão local de membros e liderança a partir de um snapshot do proxy.
+    Snapshots de versão anterior à já conhecida são ignorados; a concessão é sempre renovada.
+    """
+    global membership_version, server_ids, leader_id, leader_lease_until
+    with membership_lock:
+        if snapshot["version"] < membership_version:
+            return
+        if snapshot["version"] > membership_version:
+            logging.info(f"[MEMBERSHIP] Servidores: {snapshot['servers']}, líder: {snapshot['leader_id']}")
+        membership_version = snapshot["version"]
+        server_ids = snapshot["servers"]
+        leader_id = snapshot["leader_id"]
+        leader_lease_until = time.time() + snapshot["lease_remaining"]
+
+
+def membership_listener():
+    """
+    Thread que recebe os eventos de membros/liderança publicados pelo proxy,
+    substituindo a consulta periódica ao canal de controle.
+    """
+    while True:
+        try:
+            msg = membership_sub.recv_string()
+            _, payload = msg.split(" ", 1)
+            apply_membership(json.loads(payload))
+        except Exception as e:
+            logging.error(f"[MEMBERSHIP] Erro ao processar evento: {e}")
 
-clock_sync_sub = context.socket(zmq.SUB)
-clock_sync_sub.connect("tcp://localhost:6010")  # Canal de sincronização de clock
-clock_sync_sub.setsockopt_string(zmq.SUBSCRIBE, "clock_sync")
 
-# Variável global que representa o relógio lógico local deste servidor
-local_clock = time.time()
+def is_leader():
+    """
+    Consulta local (sem ida ao proxy): este servidor é o líder e a concessão ainda é válida?
+    """
+    with membership_lock:
+        return str(server_id) == str(leader_id) and time.time() < leader_lease_until
 
 
-def clock_sync_listener():
+def time_server():
     """
-    Thread responsável por ouvir mensagens de sincronização de clock
-    e ajustar o relógio local conforme o timestamp recebido do líder.
+    Thread que responde às consultas de hora dos demais servidores.
+    Todo servidor atende (qualquer um pode virar líder), em socket próprio,
+    fora do caminho das requisições dos clientes.
     """
-    global local_clock
+    time_socket = context.socket(zmq.REP)
+    time_socket.bind(Configuracao.time_bind_endpoint(server_id, addresses))
     while True:
         try:
-            msg = clock_sync_sub.recv_string()
-            _, timestamp = msg.split()
-            timestamp = float(timestamp)
-            logging.info(
-                f"[SYNC] Sincronização recebida. Ajustando relógio local de {local_clock:.2f} para {timestamp:.2f}")
-            local_clock = timestamp
+            time_socket.recv()
+            time_socket.send_json({"time": local_clock.read()})
         except Exception as e:
-            logging.error(f"[SYNC] Erro ao ajustar relógio: {e}")
+            logging.error(f"[SYNC] Erro ao responder consulta de hora: {e}")
 
 
-def election_and_clock_sync():
+def sample_leader_clock(time_socket):
     """
-    Thread que periodicamente consulta quem é o líder do sistema.
-    Se este servidor for o líder, faz o broadcast da sincronização do clock para os demais.
+    Uma amostra do algoritmo de Cristian: mede o RTT da consulta e estima
+    o offset como (hora do líder + RTT/2) - hora local na chegada da resposta.
+    Retorna (offset, rtt) ou None em caso de timeout.
     """
-    global server_id, local_clock
-    while True:
-        time.sleep(12)  # Sincroniza a cada 12 segundos
+    t0 = time.perf_counter()
+    time_socket.send(b"time")
+    if not time_socket.poll(CLOCK_SYNC_TIMEOUT):
+        return None
+    leader_time = time_socket.recv_json()["time"]
+    rtt = time.perf_counter() - t0
+    return leader_time + rtt / 2 - local_clock.read(), rtt
+
 
+def clock_sync_client():
+    """
+    Thread que sincroniza periodicamente o relógio local com o do líder.
+    Usa a amostra de menor RTT de cada rodada e corrige o offset por slewing
+    (o relógio acelera ou desacelera, sem saltos para trás).
+    """
+    time_socket = None
+    synced_leader = None
+    while True:
+        time.sleep(CLOCK_SYNC_INTERVAL)
         try:
-            # Descobre o líder atual pelo proxy de controle
-            control_socket.send_json({"action": "who_is_leader"})
-            response = control_socket.recv_json()
-            leader_id = response["leader_id"]
-            logging.info(f"[SYNC] Checagem de líder: líder atual é {leader_id}")
-
-            # Apenas o líder faz o broadcast da hora
-            if str(server_id) == str(leader_id):
-                now = time.time()
-                logging.info(f"[SYNC] Sou o líder ({server_id}). Enviando sincronização de relógio ({now:.2f})")
-                control_socket.send_json({"action": "sync_clock", "timestamp": now})
-                reply = control_socket.recv_json()
-                logging.info(f"[SYNC] Resposta do proxy para sync_clock: {reply}")
+            with membership_lock:
+                current_leader = leader_id
+            if current_leader is None or is_leader():
+                continue
+
+            # (Re)conecta ao servidor de hora do líder quando ele muda
+            if time_socket is None or current_leader != synced_leader:
+                if time_socket is not None:
+                    time_socket.close(linger=0)
+                time_socket = context.socket(zmq.REQ)
+                time_socket.connect(Configuracao.time_endpoint(current_leader, addresses))
+                synced_leader = current_leader
+
+            samples = []
+            for _ in range(CLOCK_SYNC_SAMPLES):
+                sample = sample_leader_clock(time_socket)
+                if sample is None:
+                    # Sem resposta: descarta o socket REQ (que ficaria travado) e tenta na próxima rodada
+                    logging.warning(f"[SYNC] Líder {current_leader} não respondeu à consulta de hora")
+                    time_socket.close(linger=0)
+                    time_socket = None
+                    break
+                samples.append(sample)
+            if not samples:
+                continue
+
+            offset, rtt = min(samples, key=lambda sample: sample[1])
+            now = time.time()
+            if clock_metrics["last_sync"] is not None:
+                # O offset acumulado desde a última correção estima o drift do relógio local
+                clock_metrics["drift"] = -offset / (now - clock_metrics["last_sync"])
+            duration = local_clock.adjust(offset)
+            clock_metrics.update(offset=offset, rtt=rtt, last_sync=now, syncs=clock_metrics["syncs"] + 1)
+            logging.info(f"[SYNC] Líder {current_leader}: offset {offset * 1000:+.1f}ms, RTT {rtt * 1000:.2f}ms, "
+                         f"drift {clock_metrics['drift'] * 1e6:+.0f}ppm. Corrigindo em {duration:.1f}s")
         except Exception as e:
-            logging.error(f"[SYNC] Erro na eleição/sincronização: {e}")
+            logging.error(f"[SYNC] Erro na sincronização de relógio: {e}")
 
 
 def print_local_clock():
@@ -92,26 +207,239 @@ def print_local_clock():
     Thread periódica para logar o valor do relógio local.
     Útil para monitoramento e debugging da sincronização.
     """
-    global local_clock
     while True:
-        logging.info(f"[SYNC] Relógio local: {local_clock:.2f}")
+        logging.info(f"[SYNC] Relógio local: {local_clock.read():.2f} (offset {clock_metrics['offset'] * 1000:+.1f}ms, "
+                     f"drift {clock_metrics['drift'] * 1e6:+.0f}ppm)")
         time.sleep(10)
 
 
 def drift_local_clock():
     """
     Thread para simular o drift natural de relógios em sistemas distribuídos.
-    Periodicamente incrementa ou decrementa o relógio local.
+    Periodicamente sorteia uma nova taxa de drift para o relógio local.
     """
-    global local_clock
     while True:
-        # Drift entre -1s e +1s a cada 5 segundos (simulação de imprecisão)
-        drift = random.uniform(-1, 1)
-        local_clock += drift
-        logging.info(f"[DRIFT] Drift aplicado ao relógio local: {drift:+.2f}s. Novo valor: {local_clock:.2f}")
+        # Drift entre -5% e +5% da velocidade real, sorteado a cada 5 segundos (simulação de imprecisão)
+        drift = random.uniform(-0.05, 0.05)
+        local_clock.set_drift_rate(drift)
+        logging.info(f"[DRIFT] Taxa de drift do relógio local: {drift * 1e6:+.0f}ppm. Valor: {local_clock.read():.2f}")
         time.sleep(5)
 
 
+def cache_invalidation_listener():
+    """
+    Thread que aplica aos caches locais os eventos de invalidação publicados pelo banco.
+    """
+    while True:
+        try:
+            msg = db_events_sub.recv_string()
+            _, kind, payload = msg.split(" ", 2)
+            keys = json.loads(payload)
+            if kind == "usernames":
+                user_id_cache.invalidate(RegistroUsuarios.normalize(keys[0]))
+                if len(keys) > 1:
+                    apply_username_event(keys[0], keys[1])
+            elif kind == "followers":
+                followers_cache.invalidate(keys[0])
+            elif kind == "posts":
+                timeline_cache.clear()
+            elif kind == "all":
+                # Carga em massa no banco: qualquer valor em cache pode estar desatualizado
+                for cache in caches:
+                    cache.clear()
+                load_username_filter()
+            elif kind == "private_messages":
+                invalidate_conversation(keys[0], keys[1])
+            logging.debug(f"[CACHE] Invalidação recebida: {kind} {keys}")
+        except Exception as e:
+            logging.error(f"[CACHE] Erro ao processar invalidação: {e}")
+
+
+def invalidate_conversation(user_a, user_b):
+    """
+    Remove do cache a conversa entre dois usuários, nos dois sentidos e em todas as codificações.
+    """
+    user_a, user_b = RegistroUsuarios.normalize(user_a), RegistroUsuarios.normalize(user_b)
+    for encoding in (None,) + Compressao.SUPPORTED_ENCODINGS:
+        conversation_cache.invalidate((user_a, user_b, encoding))
+        conversation_cache.invalidate((user_b, user_a, encoding))
+
+
+def load_username_filter():
+    """
+    Baixa do banco o filtro de Bloom dos usernames. Em caso de falha o filtro fica desativado
+    e as consultas voltam a ir ao banco, até o próximo download.
+    """
+    global username_filter, username_filter_checked
+    try:
+        response = database_client.call({"action": "get_username_filter"})
+        bloom = Bloom.FiltroBloom.from_snapshot(response["filter"])
+    except Exception as e:
+        logging.error(f"[USUARIOS] Não foi possível baixar o filtro de usernames: {e}")
+        bloom = None
+    else:
+        logging.info(f"[USUARIOS] Filtro de usernames baixado: {bloom.count} usernames, "
+                     f"{len(bloom.bits)} bytes, {bloom.hashes} hashes")
+    with username_filter_lock:
+        username_filter = bloom
+        username_filter_checked = time.monotonic()
+
+
+def apply_username_event(username, count):
+    """
+    Acrescenta ao filtro local um username cadastrado. "count" é o total de usuários após o
+    cadastro: um salto indica evento perdido (o filtro deixaria de conter um usuário existente)
+    e força um novo download, assim como o crescimento além da capacidade do filtro.
+    """
+    with username_filter_lock:
+        bloom = username_filter
+        if bloom is None or count <= bloom.count:
+            return  # Desativado, ou o cadastro já estava no filtro baixado
+        if count == bloom.count + 1 and count <= bloom.capacity:
+            bloom.add(RegistroUsuarios.normalize(username))
+            return
+    reload_username_filter(bloom.count, count)
+
+
+def reload_username_filter(local_count, remote_count):
+    """
+    Baixa de novo um filtro defasado. Os ids em cache também são descartados: a invalidação do
+    cadastro perdido (o -1 guardado para o username) se perdeu junto com o evento.
+    """
+    logging.warning(f"[USUARIOS] Filtro de usernames defasado (local {local_count}, banco {remote_count}); "
+                    f"baixando de novo")
+    user_id_cache.clear()
+    load_username_filter()
+
+
+def username_filter_current():
+    """
+    True se o filtro local está em dia com o banco. A versão (número de usuários) é conferida no banco
+    no máximo a cada USERNAME_FILTER_CHECK_INTERVAL; se estiver defasada (evento de cadastro perdido),
+    o filtro é baixado de novo (ver reload_username_filter).
+    Se o banco não responder, o filtro não é usado para recusar.
+    """
+    global username_filter_checked
+    with username_filter_lock:
+        bloom = username_filter
+        if bloom is None:
+            return False
+        if time.monotonic() - username_filter_checked < USERNAME_FILTER_CHECK_INTERVAL:
+            return True
+    try:
+        count = database_client.call({"action": "get_username_count"})["count"]
+    except Exception as e:
+        logging.error(f"[USUARIOS] Não foi possível conferir a versão do filtro de usernames: {e}")
+        return False
+    with username_filter_lock:
+        if username_filter is not bloom:
+            return username_filter is not None  # Substituído por um download durante a consulta
+        if count <= bloom.count:
+            username_filter_checked = time.monotonic()
+            return True
+    reload_username_filter(bloom.count, count)
+    with username_filter_lock:
+        return username_filter is not None
+
+
+def username_may_exist(username):
+    """
+    False se o username certamente não está cadastrado (fora de um filtro em dia com o banco); True se pode estar.
+    """
+    global username_filter_rejections
+    key = RegistroUsuarios.normalize(username)
+    with username_filter_lock:
+        if username_filter is None or key in username_filter:
+            return True
+    if not username_filter_current():
+        return True
+    with username_filter_lock:
+        if username_filter is None or key in username_filter:
+            return True  # Presente no filtro baixado de novo
+        username_filter_rejections += 1
+        return False
+
+
+def report_cache_metrics():
+    """
+    Thread periódica que loga as métricas de acerto/falha dos caches.
+    """
+    global username_filter_rejections
+    while True:
+        time.sleep(30)
+        for cache in caches:
+            stats = cache.stats()
+            logging.info(f"[CACHE] {stats['cache']}: {stats['hits']} acertos, {stats['misses']} falhas "
+                         f"({stats['hit_ratio']:.0%}), {stats['size']} itens, {stats['evictions']} despejos")
+        with username_filter_lock:
+            rejections, username_filter_rejections = username_filter_rejections, 0
+        logging.info(f"[CACHE] filtro de usernames: {rejections} consultas a usernames inexistentes recusadas")
+
+
+def merge_hlc(value):
+    """
+    Incorpora ao HLC local um valor gravado no banco (None é ignorado). Valores adiante do relógio
+    local além de Relogio.MAX_HLC_OFFSET_MS não são incorporados, para não arrastar o relógio ao futuro.
+    """
+    if value is None:
+        return
+    try:
+        hlc_clock.update(value)
+    except Relogio.HLCForaDoLimite as e:
+        logging.warning(f"[HLC] Valor do banco ignorado: {e}")
+
+
+def user_topic(user_id):
+    """
+    Tópico de notificação de um usuário. É determinístico, dispensando consulta ao banco.
+    """
+    return f"notificacao_user_{user_id}"
+
+
+def lookup_user_ids(usernames):
+    """
+    Consulta (com cache) os ids de vários usuários a partir dos usernames: {username: id, ou -1 se não existir}.
+    As consultas que faltarem no cache vão ao banco em paralelo (uma ida e volta para todas).
+    Usernames fora do filtro de Bloom (em dia com o banco) são recusados sem consultar o banco nem ocupar o cache.
+    """
+    ids = {username: -1 for username in usernames if not username_may_exist(username)}
+    names = {RegistroUsuarios.normalize(username): username for username in usernames if username not in ids}
+
+    def load(keys):
+        requests = [{"action": "get_user_id", "username": names[key]} for key in keys]
+        logging.info(f"Enviando requisições ao banco: {requests}")
+        responses = database_client.call_many(requests)
+        logging.info(f"Respostas do banco recebidas: {responses}")
+        return [response["id"] for response in responses]
+
+    cached = user_id_cache.get_many_or_load(list(names), load) if names else {}
+    for username in usernames:
+        if username not in ids:
+            ids[username] = cached[RegistroUsuarios.normalize(username)]
+    return ids
+
+
+def lookup_user_id(username):
+    """
+    Consulta (com cache) o id de um usuário a partir do username; -1 se não existir.
+    """
+    return lookup_user_ids([username])[username]
+
+
+def lookup_followers(user_id):
+    """
+    Consulta (com cache) a lista de seguidores de um usuário.
+    """
+    def load():
+        request = {"action": "get_followers", "id": user_id}
+        logging.info(f"Enviando requisição ao banco: {request}")
+        response = database_client.call(request)
+        logging.info(f"Resposta do banco recebida: {response}")
+        return response["followers"]
+
+    return followers_cache.get_or_load(user_id, load)
+
+
 def handle_sign_up(package):
     """
     Processa o cadastro de novo usuário.
@@ -127,17 +455,17 @@ def handle_sign_up(package):
         "username": username
     }
     logging.info(f"Enviando requisição ao banco: {request}")
-    dataBaseSocket.send_json(request)
 
     # Recebe e trata resposta do banco
-    response = dataBaseSocket.recv_json()
+    response = database_client.call(request)
     logging.info(f"Resposta do banco recebida: {response}")
     ret = response["ret"]
-    userId = response["id"]
-    userTopic = response["topic"]
+    userId = response.get("id")  # Ausentes quando o username já está em uso
+    userTopic = response.get("topic")
 
     if ret == ReturnCodes.SUCCESS:
         logging.info(f"Usuário '{username}' cadastrado com ID {userId}, tópico: {userTopic}")
+        user_id_cache.put(RegistroUsuarios.normalize(username), userId)
     else:
         logging.warning(f"Tentativa de cadastro com username já existente: '{username}'")
 
@@ -162,6 +490,10 @@ def handle_follow(package):
     primaryUserId = followRequestJson["id"]
     userToFollow = followRequestJson["to_follow"]
 
+    if not username_may_exist(userToFollow):
+        logging.warning(f"Usuário para seguir não encontrado: '{userToFollow}' (filtro local)")
+        return json.dumps({"ret": ReturnCodes.ERROR_USER_NOT_FOUND})
+
     # Solicita ao banco de dados para adicionar o seguidor
     request = {
         "action": "add_follower",
@@ -169,8 +501,7 @@ def handle_follow(package):
         "to_follow": userToFollow
     }
     logging.info(f"Enviando requisição ao banco: {request}")
-    dataBaseSocket.send_json(request)
-    response = dataBaseSocket.recv_json()
+    response = database_client.call(request)
     logging.info(f"Resposta do banco recebida: {response}")
     ret = response["ret"]
 
@@ -186,52 +517,33 @@ def handle_follow(package):
     return response_json
 
 
-def notify_followers(userId, username):
+def notify_followers(userId, username, followers, notification_msg):
     """
-    Notifica todos os seguidores de um usuário sobre uma nova postagem.
-    Para cada seguidor, recupera o tópico de notificação e repassa para o proxy.
+    Notifica em tempo real os seguidores de um usuário sobre uma nova postagem
+    (a notificação já foi gravada na caixa de cada um).
+    Para cada seguidor, calcula o tópico de notificação e repassa para o proxy.
     """
     logging.info(f"Entrando em notify_followers para usuário {username} (ID {userId})")
-    # 1. Busca os seguidores do usuário no banco
-    request = {
-        "action": "get_followers",
-        "id": userId
-    }
-    logging.info(f"Enviando requisição ao banco: {request}")
-    dataBaseSocket.send_json(request)
-    response = dataBaseSocket.recv_json()
-    logging.info(f"Resposta do banco recebida: {response}")
-    followers = response["followers"]
-
     users_to_notify = dict()
 
     logging.info(f"Notificando seguidores de '{username}' (ID {userId})")
     for followerId in followers:
-        # 2. Busca o tópico de cada seguidor
-        request_topic = {
-            "action": "get_user_topic",
-            "id": followerId
-        }
-        logging.info(f"Enviando requisição ao banco: {request_topic}")
-        dataBaseSocket.send_json(request_topic)
-        topicResponse = dataBaseSocket.recv_json()
-        logging.info(f"Resposta do banco recebida: {topicResponse}")
-        topic = topicResponse["topic"]
-
-        users_to_notify[followerId] = topic  # Associa cada seguidor ao seu tópico
+        # O tópico de cada seguidor é determinístico
+        users_to_notify[followerId] = user_topic(followerId)
 
     # Monta o pacote para notificação via proxy
     notify_action_request = {
         "action": "notify_users",
         "post_owner": username,
         "users_to_notify": users_to_notify,
-        "msg": f"Novo post do {username} disponível!"
+        "msg": notification_msg
     }
     logging.info(f"Enviando pacote de notificação ao proxy: {notify_action_request}")
 
     # Envia para o proxy pelo canal de controle
-    control_socket.send_json(notify_action_request)
-    proxy_response = control_socket.recv_json()  # Aguarda resposta do proxy
+    with control_lock:
+        control_socket.send_json(notify_action_request)
+        proxy_response = control_socket.recv_json()  # Aguarda resposta do proxy
     logging.info(f"Resposta do proxy após notificação: {proxy_response}")
 
 
@@ -242,43 +554,84 @@ def handle_receive_posts(package):
     """
     logging.info("Entrando em handle_receive_posts")
     logging.debug(f"Pacote recebido em handle_receive_posts: {package}")
-    # Envia post para o banco central
+    # Carimba o post com o HLC deste servidor; um "hlc" enviado pelo cliente é descartado
+    # (a ordem não depende de valores do cliente, e o banco ordena a escrita após as já gravadas)
+    package["hlc"] = hlc_clock.now()
+    package["server_id"] = server_id
+
+    # Requisição de gravação do post no banco central
     request = {
         "action": "add_post",
         "post": package
     }
-    logging.info(f"Enviando requisição ao banco: {request}")
-    dataBaseSocket.send_json(request)
-
-    db_response = dataBaseSocket.recv_json()
-    logging.info(f"Resposta do banco recebida: {db_response}")
-
     userId = package["id"]
     username = package["username"]
-    notify_followers(userId, username)
+    followers = lookup_followers(userId)
+    notification_msg = f"Novo post do {username} disponível!"
+
+    # Grava o post e a notificação na caixa de cada seguidor em uma única ida ao banco
+    batch_request = {
+        "action": "batch",
+        "requests": [
+            request,
+            {
+                "action": "add_notifications",
+                "users": followers,
+                "msg": notification_msg,
+                "timestamp": local_clock.read()
+            }
+        ]
+    }
+    logging.info(f"Enviando requisição ao banco: {batch_request}")
+    db_response = database_client.call(batch_request)
+    logging.info(f"Resposta do banco recebida: {db_response}")
+    post_result, inbox_result = db_response["results"]
+    if post_result["ret"] != ReturnCodes.SUCCESS:
+        raise RuntimeError(f"Falha ao gravar post de '{username}': {post_result}")
+    merge_hlc(post_result["hlc"])
+    timeline_cache.clear()  # Leitura das próprias escritas sem esperar o evento do banco
+    if inbox_result["ret"] != ReturnCodes.SUCCESS:
+        logging.error(f"Falha ao gravar notificações dos seguidores de '{username}': {inbox_result}")
+
+    notify_followers(userId, username, followers, notification_msg)
 
     logging.info(f"Post recebido de '{username}' (ID {userId}): '{package['texto']}'")
 
     logging.info("Saindo de handle_receive_posts com resposta: Postagem recebida!")
-    return "Postagem recebida!"
+    return "Postagem recebida!", post_result["hlc"]
 
 
 def handle_send_posts(package):
     """
     Responde à requisição de timeline.
-    Busca todos os posts no banco central e retorna para o cliente.
+    Busca no banco central todos os posts ou, se o cliente informa "limit", só os "limit" mais recentes
+    (a timeline completa do formato legado nunca é truncada em silêncio).
+    A resposta do banco é repassada sem ser decodificada: a lista de posts do formato legado
+    ou, se o cliente aceita compressão, a resposta já comprimida no formato {"ret", "posts"}.
     """
     logging.info("Entrando em handle_send_posts")
     logging.debug(f"Pacote recebido em handle_send_posts: {package}")
     logging.info("Requisição de timeline recebida")
-    request = {"action": "get_posts"}
-    logging.info(f"Enviando requisição ao banco: {request}")
-    dataBaseSocket.send_json(request)
-    response = dataBaseSocket.recv_json()
-    logging.info(f"Resposta do banco recebida: {response}")
-    posts = response["posts"]
-    response_encoded = json.dumps(posts).encode('utf-8')
-    logging.info(f"Saindo de handle_send_posts com resposta (bytes): {response_encoded}")
+    encoding = Compressao.negotiate(package.get("accept_encoding"))
+    limit = package.get("limit")
+    if limit is not None:
+        limit = max(1, int(limit))
+
+    def load():
+        request = {"action": "get_posts"}
+        if limit is not None:
+            request["limit"] = limit
+        if encoding is not None:
+            request["accept_encoding"] = [encoding]
+        else:
+            request["format"] = "list"
+        logging.info(f"Enviando requisição ao banco: {request}")
+        response = database_client.call(request, raw=True)
+        logging.info(f"Resposta do banco recebida ({encoding or 'json'}): {len(response)} bytes")
+        return response
+
+    response_encoded = timeline_cache.get_or_load((encoding, limit), load)
+    logging.info(f"Saindo de handle_send_posts com resposta de {len(response_encoded)} bytes")
     return response_encoded
 
 
@@ -289,19 +642,28 @@ def add_private_message(privateMessageJson):
     """
     logging.info("Entrando em add_private_message")
     logging.debug(f"Pacote recebido em add_private_message: {privateMessageJson}")
+    # Valida remetente e destinatário pelo cache local antes de gravar (as consultas que faltarem, em paralelo)
+    ids = lookup_user_ids([privateMessageJson["remetente"], privateMessageJson["destinatario"]])
+    missing = [username for username, user_id in ids.items() if user_id == -1]
+    if missing:
+        logging.warning(f"Remetente ou destinatário inexistente: {missing}")
+        return ReturnCodes.ERROR_USER_NOT_FOUND, None
+
     # Monta o request para o banco central
     request = {
         "action": "add_private_message",
         "remetente": privateMessageJson["remetente"],
         "destinatario": privateMessageJson["destinatario"],
         "mensagem": privateMessageJson["mensagem"],
-        "timestamp": privateMessageJson["timestamp"]
+        "timestamp": privateMessageJson["timestamp"],
+        "hlc": hlc_clock.now()  # Ordem da conversa definida pelo HLC do servidor
     }
     logging.info(f"Enviando requisição ao banco: {request}")
-    dataBaseSocket.send_json(request)
-    response = dataBaseSocket.recv_json()
+    response = database_client.call(request)
     logging.info(f"Resposta do banco recebida: {response}")
     ret = response["ret"]
+    hlc = response.get("hlc")
+    merge_hlc(hlc)
 
     sender = privateMessageJson["remetente"]
     recipient = privateMessageJson["destinatario"]
@@ -309,6 +671,7 @@ def add_private_message(privateMessageJson):
 
     if ret == ReturnCodes.SUCCESS:
         logging.info(f"Mensagem registrada: '{sender}' → '{recipient}': '{message}'")
+        invalidate_conversation(sender, recipient)
     elif ret == ReturnCodes.ERROR_INVALID_PARAMETER:
         logging.warning(f"Usuário '{sender}' tentou enviar mensagem para si mesmo.")
     elif ret == ReturnCodes.ERROR_USER_NOT_FOUND:
@@ -317,7 +680,7 @@ def add_private_message(privateMessageJson):
         logging.error(f"Falha ao registrar mensagem de '{sender}' para '{recipient}'")
 
     logging.info(f"Saindo de add_private_message com retorno: {ret}")
-    return ret
+    return ret, hlc
 
 
 def handle_private_chat(package):
@@ -327,8 +690,8 @@ def handle_private_chat(package):
     """
     logging.info("Entrando em handle_private_chat")
     logging.debug(f"Pacote recebido em handle_private_chat: {package}")
-    ret = add_private_message(package)
-    response = {"ret": ret}
+    ret, hlc = add_private_message(package)
+    response = {"ret": ret, "hlc": hlc}
     response_json = json.dumps(response)
     logging.info(f"Saindo de handle_private_chat com resposta: {response_json}")
     return response_json
@@ -337,42 +700,248 @@ def handle_private_chat(package):
 def handle_show_private_message(requestJson):
     """
     Retorna todas as mensagens privadas entre dois usuários, consultando o banco central.
+    Com compressão negociada, a resposta comprimida pelo banco é repassada como está.
     """
     logging.info("Entrando em handle_show_private_message")
     logging.debug(f"Pacote recebido em handle_show_private_message: {requestJson}")
     sender = requestJson["remetente"]
     recipient = requestJson["destinatario"]
+    encoding = Compressao.negotiate(requestJson.get("accept_encoding"))
+
+    # Solicita ao banco central (ou ao cache local) as mensagens privadas dessa conversa
+    def load():
+        request = {
+            "action": "get_private_messages",
+            "remetente": sender,
+            "destinatario": recipient
+        }
+        if encoding is not None:
+            request["accept_encoding"] = [encoding]
+        logging.info(f"Enviando requisição ao banco: {request}")
+        response = database_client.call(request, raw=True)
+        logging.info(f"Resposta do banco recebida: {len(response)} bytes")
+        return response
+
+    key = (RegistroUsuarios.normalize(sender), RegistroUsuarios.normalize(recipient), encoding)
+    response_encoded = conversation_cache.get_or_load(key, load)
+    logging.info(f"Saindo de handle_show_private_message com resposta de {len(response_encoded)} bytes")
+    return response_encoded
+
+
+def handle_mark_read(package):
+    """
+    Marca como lidas, no banco central, as mensagens da conversa que o cliente acabou de ler
+    (até o HLC recebido com elas).
+    """
+    logging.info("Entrando em handle_mark_read")
+    logging.debug(f"Pacote recebido em handle_mark_read: {package}")
+    request = {"action": "mark_read", "username": package["username"], "peer": package["peer"]}
+    if "hlc" in package:
+        request["hlc"] = package["hlc"]
+    logging.info(f"Enviando requisição ao banco: {request}")
+    response = database_client.call(request)
 
-    # Solicita ao banco central as mensagens privadas dessa conversa
+    response_json = json.dumps(response)
+    logging.info(f"Saindo de handle_mark_read com resposta: {response_json}")
+    return response_json
+
+
+def handle_get_notifications(package):
+    """
+    Retorna ao cliente, em uma única chamada paginada, as notificações
+    posteriores à última sequência que ele já leu.
+    """
+    logging.info("Entrando em handle_get_notifications")
+    logging.debug(f"Pacote recebido em handle_get_notifications: {package}")
     request = {
-        "action": "get_private_messages",
-        "remetente": sender,
-        "destinatario": recipient
+        "action": "get_notifications",
+        "id": package["id"],
+        "since": package.get("since", 0)
     }
+    if "limit" in package:
+        request["limit"] = package["limit"]
     logging.info(f"Enviando requisição ao banco: {request}")
-    dataBaseSocket.send_json(request)
-    response = dataBaseSocket.recv_json()
+    response = database_client.call(request)
     logging.info(f"Resposta do banco recebida: {response}")
 
     response_json = json.dumps(response)
-    logging.info(f"Saindo de handle_show_private_message com resposta: {response_json}")
+    logging.info(f"Saindo de handle_get_notifications com resposta: {response_json}")
     return response_json
 
 
-def update_list_of_active_servers():
+def forward_timeline_page(action, user_id, package):
     """
-    Atualiza periodicamente a lista de servidores ativos no sistema, consultando o proxy.
+    Consulta uma página (por cursor) de posts no banco central e incorpora os HLCs recebidos.
     """
-    global server_ids
-    while True:
-        time.sleep(10)
-        try:
-            control_socket.send_json({"action": "list_servers"})
-            active_servers_json = control_socket.recv_json()
-            server_ids = active_servers_json["servers"]
-            logging.info(f"[Atualização] Servidores conectados: {server_ids}")
-        except Exception as e:
-            logging.error(f"Erro ao atualizar lista de servidores: {e}")
+    request = {"action": action, "id": user_id}
+    for field in ("cursor", "limit"):
+        if field in package:
+            request[field] = package[field]
+    logging.info(f"Enviando requisição ao banco: {request}")
+    response = database_client.call(request)
+    logging.info(f"Resposta do banco recebida: {len(response.get('posts', []))} posts")
+    merge_hlc(max((post["hlc"] for post in response.get("posts", [])), default=None))
+    return json.dumps(response)
+
+
+def handle_get_user_posts(package):
+    """
+    Retorna os posts de um usuário (perfil), identificado pelo id ou pelo username,
+    do mais recente para o mais antigo.
+    """
+    logging.info("Entrando em handle_get_user_posts")
+    logging.debug(f"Pacote recebido em handle_get_user_posts: {package}")
+    user_id = package.get("id")
+    if user_id is None:
+        user_id = lookup_user_id(package.get("username", ""))
+        if user_id == -1:
+            return json.dumps({"ret": ReturnCodes.ERROR_USER_NOT_FOUND})
+
+    response_json = forward_timeline_page("get_user_posts", user_id, package)
+    logging.info("Saindo de handle_get_user_posts")
+    return response_json
+
+
+def handle_get_home_timeline(package):
+    """
+    Retorna a timeline com os posts dos usuários que o cliente segue (e os dele),
+    intercalados por HLC no banco central.
+    """
+    logging.info("Entrando em handle_get_home_timeline")
+    logging.debug(f"Pacote recebido em handle_get_home_timeline: {package}")
+    response_json = forward_timeline_page("get_home_timeline", package["id"], package)
+    logging.info("Saindo de handle_get_home_timeline")
+    return response_json
+
+
+def handle_search_posts(package):
+    """
+    Busca textual de posts, executada no banco central pelo índice invertido:
+    só a página de resultados trafega, não a timeline inteira.
+    """
+    logging.info("Entrando em handle_search_posts")
+    logging.debug(f"Pacote recebido em handle_search_posts: {package}")
+    request = {"action": "search_posts", "query": package.get("query", "")}
+    for field in ("author", "since", "until", "offset", "limit"):
+        if field in package:
+            request[field] = package[field]
+    logging.info(f"Enviando requisição ao banco: {request}")
+    response = database_client.call(request)
+    logging.info(f"Resposta do banco recebida: {response.get('total')} resultados")
+    merge_hlc(max((post["hlc"] for post in response.get("posts", [])), default=None))
+
+    response_json = json.dumps(response)
+    logging.info(f"Saindo de handle_search_posts com {len(response.get('posts', []))} posts")
+    return response_json
+
+
+def handle_list_conversations(package):
+    """
+    Retorna uma página da caixa de entrada do usuário (conversas por última atividade, com prévia
+    e número de não lidas), mantida incrementalmente pelo banco central.
+    """
+    logging.info("Entrando em handle_list_conversations")
+    logging.debug(f"Pacote recebido em handle_list_conversations: {package}")
+    request = {"action": "list_conversations", "username": package.get("username", "")}
+    for field in ("cursor", "limit"):
+        if field in package:
+            request[field] = package[field]
+    logging.info(f"Enviando requisição ao banco: {request}")
+    response = database_client.call(request)
+    merge_hlc(max((conversation["hlc"] for conversation in response.get("conversations", [])), default=None))
+
+    response_json = json.dumps(response)
+    logging.info(f"Saindo de handle_list_conversations com {len(response.get('conversations', []))} conversas")
+    return response_json
+
+
+def dispatch(package):
+    """
+    Despacha a ação do cliente para o handler correspondente e retorna a resposta serializada (bytes).
+    """
+    action = package.get("action", "")
+    logging.info(f"Processando ação: {action}")
+    print(f"Processando ação: {action}")
+
+    if action == "add_user":
+        logging.info("Chamando handle_sign_up")
+        return handle_sign_up(package).encode('utf-8')
+    elif action == "add_follower":
+        logging.info("Chamando handle_follow")
+        return handle_follow(package).encode('utf-8')
+    elif action == "post_text":
+        logging.info("Chamando handle_receive_posts")
+        response, hlc = handle_receive_posts(package)
+        return json.dumps({"ret": ReturnCodes.SUCCESS, "msg": response, "hlc": hlc}).encode('utf-8')
+    elif action == "get_timeline":
+        logging.info("Chamando handle_send_posts")
+        return handle_send_posts(package)
+    elif action == "add_private_message":
+        logging.info("Chamando handle_private_chat")
+        return handle_private_chat(package).encode('utf-8')
+    elif action == "get_private_messages":
+        logging.info("Chamando handle_show_private_message")
+        return handle_show_private_message(package)
+    elif action == "mark_read":
+        logging.info("Chamando handle_mark_read")
+        return handle_mark_read(package).encode('utf-8')
+    elif action == "get_notifications":
+        logging.info("Chamando handle_get_notifications")
+        return handle_get_notifications(package).encode('utf-8')
+    elif action == "get_user_posts":
+        logging.info("Chamando handle_get_user_posts")
+        return handle_get_user_posts(package).encode('utf-8')
+    elif action == "get_home_timeline":
+        logging.info("Chamando handle_get_home_timeline")
+        return handle_get_home_timeline(package).encode('utf-8')
+    elif action == "search_posts":
+        logging.info("Chamando handle_search_posts")
+        return handle_search_posts(package).encode('utf-8')
+    elif action == "list_conversations":
+        logging.info("Chamando handle_list_conversations")
+        return handle_list_conversations(package).encode('utf-8')
+    elif action == "batch":
+        logging.info("Chamando handle_batch")
+        return handle_batch(package).encode('utf-8')
+    else:
+        # Tratamento para ações não reconhecidas
+        return json.dumps({"ret": ReturnCodes.ERROR_UNKNOWN_ACTION, "msg": "Ação desconhecida"}).encode('utf-8')
+
+
+def run_batch_item(item):
+    """
+    Executa um item de lote isoladamente: um item inválido ou que falhe só afeta o próprio resultado.
+    """
+    if not isinstance(item, dict) or item.get("action") == "batch":
+        # Cada item deve ser uma ação (objeto JSON); lotes aninhados não são permitidos
+        return {"ret": ReturnCodes.ERROR_INVALID_PARAMETER}
+    try:
+        result = json.loads(Compressao.decode(dispatch(item)))
+    except Exception as e:
+        logging.error(f"Erro no item do lote {item}: {e}\n{traceback.format_exc()}")
+        return {"ret": ReturnCodes.ERROR_GENERAL, "msg": f"Erro: {e}"}
+    if not isinstance(result, dict):
+        # A timeline é uma lista de posts: embrulhada para carregar o código de retorno
+        return {"ret": ReturnCodes.SUCCESS, "posts": result}
+    result.setdefault("ret", ReturnCodes.SUCCESS)
+    return result
+
+
+def handle_batch(package):
+    """
+    Executa uma lista de ações do cliente em uma única ida e volta.
+    Retorna os resultados na mesma ordem dos pedidos, cada um com seu próprio código de retorno.
+    """
+    logging.info("Entrando em handle_batch")
+    requests = package.get("requests")
+    if not isinstance(requests, list) or len(requests) > MAX_BATCH_SIZE:
+        return json.dumps({"ret": ReturnCodes.ERROR_INVALID_PARAMETER,
+                           "msg": f"O lote deve ser uma lista de até {MAX_BATCH_SIZE} ações"})
+
+    results = [run_batch_item(item) for item in requests]
+    response_json = json.dumps({"ret": ReturnCodes.SUCCESS, "results": results})
+    logging.info(f"Saindo de handle_batch com {len(results)} resultados")
+    return response_json
 
 
 def send_heartbeat():
@@ -389,119 +958,135 @@ def send_heartbeat():
         time.sleep(2)
 
 
-# ==============================
-# Inicialização principal do servidor
-# ==============================
-
-# Solicita e armazena o ID único deste servidor junto ao proxy
-control_socket.send_json({"action": "get_server_id"})
-response = control_socket.recv_json()
-server_id = response["server_id"]
-logging.info(f"Servidor registrado com ID: {server_id}")
-
-# Obtém a lista inicial de servidores ativos
-control_socket.send_json({"action": "list_servers"})
-response = control_socket.recv_json()
-server_ids = response["servers"]
-logging.info(f"Lista de servidores ativos recebida: {server_ids}")
-
-print(f"[Servidor] Recebi meu ID do proxy: {server_id}")
-
-# Após receber o ID, reconfigura o logging para usar arquivo dedicado por servidor
-for handler in logging.root.handlers[:]:
-    logging.root.removeHandler(handler)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(f"servidor_{server_id}_log.txt"),
-        logging.StreamHandler()
-    ]
-)
-logging.info(f"[LOG] Log individual configurado para servidor_{server_id}_log.txt")
-
-# Inicializa threads de tarefas recorrentes do servidor
-threading.Thread(target=update_list_of_active_servers, daemon=True).start()
-threading.Thread(target=send_heartbeat, daemon=True).start()
-threading.Thread(target=clock_sync_listener, daemon=True).start()
-threading.Thread(target=election_and_clock_sync, daemon=True).start()
-threading.Thread(target=print_local_clock, daemon=True).start()
-threading.Thread(target=drift_local_clock, daemon=True).start()
-
-# ==============================
-# Loop principal para processamento de mensagens recebidas dos clientes
-# ==============================
-while True:
-    print("Esperando proxima mensagem")
-    message = mainSocket.recv()
-    try:
-        package = json.loads(message.decode('utf-8'))
-        logging.info(f"Mensagem recebida: {package}")
-        print("Mensagem recebida: ", package)
-        action = package.get("action", "")
-        logging.info(f"Processando ação: {action}")
-        print(f"Processando ação: {action}")
-
-        # Despacha para o handler correspondente baseado na ação recebida
-        if action == "add_user":
-            logging.info("Chamando handle_sign_up")
-            response = handle_sign_up(package)
-            mainSocket.send_string(response)
-            logging.info(f"Resposta enviada: {response}")
-            print(f"Resposta enviada: {response}")
-        elif action == "add_follower":
-            logging.info("Chamando handle_follow")
-            response = handle_follow(package)
-            mainSocket.send_string(response)
-            logging.info(f"Resposta enviada: {response}")
-            print(f"Resposta enviada: {response}")
-        elif action == "post_text":
-            logging.info("Chamando handle_receive_posts")
-            response = handle_receive_posts(package)
-            response_json = json.dumps({"ret": ReturnCodes.SUCCESS, "msg": response})
-            mainSocket.send_string(response_json)
-            logging.info(f"Resposta enviada: {response_json}")
-            print(f"Resposta enviada: {response_json}")
-        elif action == "get_timeline":
-            logging.info("Chamando handle_send_posts")
-            response = handle_send_posts(package)
-            mainSocket.send(response)
-            logging.info(f"Resposta enviada (bytes): {response}")
-            print(f"Resposta enviada (bytes): {response}")
-        elif action == "add_private_message":
-            logging.info("Chamando handle_private_chat")
-            response = handle_private_chat(package)
-            mainSocket.send_string(response)
-            logging.info(f"Resposta enviada: {response}")
-            print(f"Resposta enviada: {response}")
-        elif action == "get_private_messages":
-            sender = package["remetente"]
-            recipient = package["destinatario"]
-            # Encaminha diretamente a consulta ao banco, padrão mantido
-            request = {
-                "action": "get_private_messages",
-                "remetente": sender,
-                "destinatario": recipient
-            }
-            logging.info(f"Enviando requisição ao banco: {request}")
-            dataBaseSocket.send_json(request)
-            db_response = dataBaseSocket.recv_json()
-            logging.info(f"Resposta do banco recebida: {db_response}")
-            response_json = json.dumps(db_response)
-            mainSocket.send_string(response_json)
-            logging.info(f"Resposta enviada: {response_json}")
-            print(f"Resposta enviada: {response_json}")
-        else:
-            # Tratamento para ações não reconhecidas
-            response_json = json.dumps({"ret": -99, "msg": "Ação desconhecida"})
-            mainSocket.send_string(response_json)
-            logging.info(f"Resposta enviada: {response_json}")
-            print(f"Resposta enviada: {response_json}")
+def start(shared_context=None, endpoints=None, per_server_log=True):
+    """
+    Cria os sockets, registra o servidor junto ao proxy e inicia as threads de tarefas recorrentes.
+    Com um contexto compartilhado e endereços inproc, o servidor pode rodar no mesmo processo
+    que o proxy e o banco (ver Lancador.py).
+    """
+    global context, addresses, mainSocket, database_client, control_socket, heartbeat_push
+    global membership_sub, db_events_sub, admin_socket, perfilador, server_id
+    context = shared_context or zmq.Context()
+    addresses = endpoints
+
+    database_client = ClienteBanco.ClienteBanco(context, [Configuracao.connect_address("database", addresses)])
+
+    control_socket = context.socket(zmq.REQ)
+    control_socket.connect(Configuracao.connect_address("control", addresses))
+
+    heartbeat_push = context.socket(zmq.PUSH)
+    heartbeat_push.connect(Configuracao.connect_address("heartbeats", addresses))
+
+    membership_sub = context.socket(zmq.SUB)
+    membership_sub.connect(Configuracao.connect_address("server_pub", addresses))
+    membership_sub.setsockopt_string(zmq.SUBSCRIBE, "membership ")
+
+    db_events_sub = context.socket(zmq.SUB)
+    db_events_sub.connect(Configuracao.connect_address("db_events", addresses))
+    db_events_sub.setsockopt_string(zmq.SUBSCRIBE, "invalidate ")
+
+    # Solicita e armazena o ID único deste servidor junto ao proxy
+    control_socket.send_json({"action": "get_server_id", "pid": os.getpid()})
+    response = control_socket.recv_json()
+    server_id = response["server_id"]
+    logging.info(f"Servidor registrado com ID: {server_id}")
+
+    # O proxy escolhe o servidor de cada requisição pela identidade do socket: o id recebido no registro.
+    # DEALER e não REP: o REP não anuncia a sua identidade ao ROUTER do proxy em conexões TCP
+    mainSocket = context.socket(zmq.DEALER)
+    mainSocket.setsockopt(zmq.ROUTING_ID, str(server_id).encode())
+    mainSocket.connect(Configuracao.connect_address("backend", addresses))
+
+    # A resposta do registro já traz a visão inicial de membros; as mudanças chegam por eventos
+    apply_membership(response["membership"])
+    logging.info(f"Lista de servidores ativos recebida: {server_ids}")
+
+    print(f"[Servidor] Recebi meu ID do proxy: {server_id}")
+
+    # Socket administrativo por servidor (a porta depende do id recebido no registro)
+    perfilador = Perfilador.Perfilador(f"servidor_{server_id}")
+    admin_socket = context.socket(zmq.REP)
+    admin_socket.bind(Configuracao.bind_address("server_admin", addresses, server_id=server_id))
+
+    if per_server_log:
+        # Após receber o ID, reconfigura o logging para usar arquivo dedicado por servidor
+        for handler in logging.root.handlers[:]:
+            logging.root.removeHandler(handler)
+
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            handlers=[
+                logging.FileHandler(f"servidor_{server_id}_log.txt"),
+                logging.StreamHandler()
+            ]
+        )
+        logging.info(f"[LOG] Log individual configurado para servidor_{server_id}_log.txt")
+
+    # Inicializa threads de tarefas recorrentes do servidor
+    # Depois da inscrição nos eventos do banco: nenhum cadastro posterior ao download se perde
+    load_username_filter()
+
+    threading.Thread(target=membership_listener, daemon=True).start()
+    threading.Thread(target=cache_invalidation_listener, daemon=True).start()
+    threading.Thread(target=report_cache_metrics, daemon=True).start()
+    threading.Thread(target=send_heartbeat, daemon=True).start()
+    threading.Thread(target=time_server, daemon=True).start()
+    threading.Thread(target=clock_sync_client, daemon=True).start()
+    threading.Thread(target=print_local_clock, daemon=True).start()
+    threading.Thread(target=drift_local_clock, daemon=True).start()
+    threading.Thread(target=Perfilador.admin_loop, args=(admin_socket, perfilador), daemon=True).start()
+
+
+def serve():
+    """
+    Loop principal para processamento de mensagens recebidas dos clientes (bloqueante).
+    Como um REP: o envelope (identificador do envio e endereço do cliente, até o delimitador vazio)
+    é devolvido intacto na resposta, e as requisições são atendidas uma de cada vez.
+    """
+    while True:
+        print("Esperando proxima mensagem")
+        frames = mainSocket.recv_multipart()
+        if b"" not in frames:
+            logging.warning("Mensagem sem envelope descartada")
+            continue
+        delimiter = frames.index(b"")
+        envelope, frames = frames[:delimiter + 1], frames[delimiter + 1:]
+        message = frames[0]
+        # O proxy anexa o instante de admissão: requisições que esperaram demais na fila são descartadas,
+        # pois o cliente provavelmente já desistiu delas
+        if len(frames) > 1 and time.time() - float(frames[1]) > MAX_QUEUE_WAIT:
+            mainSocket.send_multipart(envelope + [json.dumps({"ret": ReturnCodes.ERROR_OVERLOADED,
+                                                              "msg": "Requisição expirou na fila do servidor"}).encode()])
+            logging.warning(f"[ADMISSÃO] Requisição descartada após {time.time() - float(frames[1]):.2f}s na fila")
+            continue
+        try:
+            package = json.loads(message.decode('utf-8'))
+            logging.info(f"Mensagem recebida: {package}")
+            print("Mensagem recebida: ", package)
+            response = perfilador.profile(package.get("action", ""), dispatch, package)
+            # Sem cópia: respostas grandes (timeline, conversas) vêm do banco como memoryview do frame recebido
+            mainSocket.send_multipart(envelope + [response], copy=False)
+            # Só o tamanho: converter a timeline inteira em texto custaria mais que a própria requisição
+            logging.info(f"Resposta enviada: {len(response)} bytes")
+            print(f"Resposta enviada: {len(response)} bytes")
 
-    except Exception as e:
-        # Tratamento genérico de exceções
-        error_msg = f"Erro: {e}"
-        mainSocket.send_string(json.dumps({"ret": -1, "msg": error_msg}))
-        logging.error(f"Exceção capturada: {error_msg}\n{traceback.format_exc()}")
-        print(f"Erro: {e}")
+        except Exception as e:
+            # Tratamento genérico de exceções
+            error_msg = f"Erro: {e}"
+            mainSocket.send_multipart(envelope + [json.dumps({"ret": -1, "msg": error_msg}).encode()])
+            logging.error(f"Exceção capturada: {error_msg}\n{traceback.format_exc()}")
+            print(f"Erro: {e}")
+
+
+if __name__ == "__main__":
+    # Configuração inicial do sistema de logging para saída no terminal
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler()  # Provisório: terminal
+        ]
+    )
+    start()
+    serve()
@@ -0,0 +1,225 @@
+# Supervisor local: sobe e derruba processos Servidor.py conforme a carga medida pelo proxy
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import deque
+
+import zmq
+
+import Configuracao
+import Perfilador
+
+SAMPLE_INTERVAL = 1.0  # Intervalo (segundos) entre consultas às estatísticas do proxy
+DECISION_WINDOW = 5  # Amostras consideradas em cada decisão de escala
+SCALE_UP_QUEUE = 2.0  # Requisições em andamento por servidor (fila + atendimento) acima das quais sobe mais um
+SCALE_DOWN_QUEUE = 0.5  # Abaixo disso por servidor, já descontado o que sair, um servidor é drenado
+LATENCY_TARGET = 0.25  # Percentil 95 (segundos) das respostas acima do qual sobe mais um servidor
+COOLDOWN = 10.0  # Espera (segundos) após uma mudança, para medir o efeito antes da próxima
+START_GRACE = 10.0  # Tempo (segundos) para um servidor novo se registrar no proxy
+DRAIN_TIMEOUT = 6.0  # Espera máxima (segundos) pelo fim das requisições de um servidor em drenagem
+STOP_TIMEOUT = 5.0  # Espera (segundos) pelo fim do processo após o SIGTERM, antes do SIGKILL
+
+
+def available_cores():
+    """
+    Núcleos em que o supervisor pode distribuir os servidores.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class Supervisor:
+    """
+    Mantém entre min_servers e max_servers processos Servidor.py, um por núcleo (cada processo
+    fica preso a um núcleo: pelo GIL, um servidor não usa mais que isso).
+    A cada SAMPLE_INTERVAL consulta no proxy ("stats") a fila de requisições, os envios em andamento
+    por servidor, as rejeições por falta de capacidade, a latência e a idade dos heartbeats.
+    Sobe um servidor quando a fila por servidor, a latência ou as rejeições indicam falta de
+    capacidade; drena e derruba um quando a carga caberia nos demais. Servidores do supervisor que
+    morrem, não se registram ou saem do registro (sem heartbeat) são substituídos.
+    Servidores iniciados à mão contam como capacidade, mas nunca são derrubados pelo supervisor.
+    """
+
+    def __init__(self, context, min_servers, max_servers, addresses=None):
+        self.context = context
+        self.control_address = Configuracao.connect_address("control", addresses)
+        self.min_servers = min_servers
+        self.max_servers = max_servers
+        self.cores = available_cores()
+        self.workers = []  # [{"process", "core", "started", "server_id"}, ...]
+        self.samples = deque(maxlen=DECISION_WINDOW)
+        self.last_change = 0.0
+        self.directory = os.path.dirname(os.path.abspath(__file__))
+
+    def control(self, command):
+        return Perfilador.send_admin(self.context, self.control_address, command)
+
+    def start_worker(self):
+        """
+        Inicia um Servidor.py no núcleo com menos servidores do supervisor.
+        """
+        core = min(self.cores, key=lambda c: sum(1 for worker in self.workers if worker["core"] == c))
+        process = subprocess.Popen([sys.executable, "Servidor.py"], cwd=self.directory,
+                                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(process.pid, {core})
+            except OSError as e:
+                logging.warning(f"[SUPERVISOR] Não foi possível fixar o processo {process.pid} no núcleo {core}: {e}")
+        self.workers.append({"process": process, "core": core, "started": time.time(), "server_id": None})
+        self.last_change = time.time()
+        logging.info(f"[SUPERVISOR] Servidor iniciado (pid {process.pid}, núcleo {core}); {len(self.workers)} gerenciados")
+
+    def kill_worker(self, worker, reason):
+        logging.warning(f"[SUPERVISOR] Encerrando o processo {worker['process'].pid}: {reason}")
+        worker["process"].kill()
+        worker["process"].wait()
+        self.workers.remove(worker)
+        if worker["server_id"] is not None:
+            self.control({"action": "remove_server", "server_id": worker["server_id"]})
+
+    def stop_worker(self, worker):
+        """
+        Saída planejada: o proxy para de enviar requisições ao servidor, o supervisor espera as
+        que já foram enviadas terminarem e só então encerra o processo e o tira do registro.
+        """
+        server_id = worker["server_id"]
+        drain_started = time.time()
+        self.control({"action": "drain_server", "server_id": server_id})
+        logging.info(f"[SUPERVISOR] Drenando o servidor {server_id} (pid {worker['process'].pid})")
+        while time.time() - drain_started < DRAIN_TIMEOUT:
+            time.sleep(SAMPLE_INTERVAL / 4)
+            stats = self.control({"action": "stats"})
+            # Só valem estatísticas calculadas depois do início da drenagem
+            server = stats.get("servers", {}).get(server_id)
+            if stats.get("updated", 0) > drain_started and (server is None or server["in_flight"] == 0):
+                break
+        else:
+            logging.warning(f"[SUPERVISOR] Servidor {server_id} ainda com requisições após {DRAIN_TIMEOUT}s")
+
+        worker["process"].terminate()
+        try:
+            worker["process"].wait(STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            worker["process"].kill()
+            worker["process"].wait()
+        self.workers.remove(worker)
+        self.control({"action": "remove_server", "server_id": server_id})
+        self.last_change = time.time()
+        logging.info(f"[SUPERVISOR] Servidor {server_id} drenado e encerrado; {len(self.workers)} gerenciados")
+
+    def check_workers(self, servers):
+        """
+        Associa os processos aos ids registrados no proxy (pelo pid) e substitui os que morreram,
+        não se registraram a tempo ou saíram do registro por falta de heartbeat.
+        """
+        by_pid = {info["pid"]: sid for sid, info in servers.items()}
+        now = time.time()
+        for worker in list(self.workers):
+            process = worker["process"]
+            if process.poll() is not None:
+                logging.warning(f"[SUPERVISOR] Servidor {worker['server_id']} (pid {process.pid}) "
+                                f"terminou com código {process.returncode}")
+                self.workers.remove(worker)
+                if worker["server_id"] is not None:
+                    self.control({"action": "remove_server", "server_id": worker["server_id"]})
+                continue
+            server_id = by_pid.get(process.pid)
+            if server_id is not None:
+                worker["server_id"] = server_id
+            elif worker["server_id"] is not None:
+                self.kill_worker(worker, f"servidor {worker['server_id']} saiu do registro (sem heartbeat)")
+            elif now - worker["started"] > START_GRACE:
+                self.kill_worker(worker, f"não se registrou no proxy em {START_GRACE:.0f}s")
+
+    def decide(self, routable):
+        """
+        Retorna +1 (subir um servidor), -1 (drenar um) ou 0, pelas amostras da janela, e o resumo da carga.
+        """
+        if len(self.samples) < DECISION_WINDOW or time.time() - self.last_change < COOLDOWN:
+            return 0, None
+        queue = statistics.mean(sample["outstanding"] for sample in self.samples)
+        saturated = sum(sample.get("saturated", 0) for sample in self.samples)
+        latencies = [sample["p95"] for sample in self.samples if sample.get("p95") is not None]
+        p95 = statistics.median(latencies) if latencies else 0.0
+        summary = (f"fila média {queue:.1f} em {routable} servidores, p95 {p95 * 1000:.0f}ms, "
+                   f"{saturated} rejeições por capacidade")
+        if saturated or queue / max(1, routable) > SCALE_UP_QUEUE or p95 > LATENCY_TARGET:
+            return 1, summary
+        if routable > 1 and queue / (routable - 1) < SCALE_DOWN_QUEUE and p95 <= LATENCY_TARGET / 2:
+            return -1, summary
+        return 0, summary
+
+    def step(self):
+        stats = self.control({"action": "stats"})
+        if "servers" not in stats:
+            logging.warning(f"[SUPERVISOR] Estatísticas do proxy indisponíveis: {stats}")
+            return
+        servers = stats["servers"]
+        self.check_workers(servers)
+        if "outstanding" in stats:
+            self.samples.append(stats)
+
+        # Mínimo garantido sem esperar janela nem cooldown (inclusive a substituição de servidores perdidos)
+        while len(self.workers) < self.min_servers:
+            self.start_worker()
+
+        routable = sum(1 for info in servers.values() if not info["draining"])
+        decision, summary = self.decide(routable)
+        if decision > 0 and len(self.workers) < self.max_servers:
+            logging.info(f"[SUPERVISOR] Falta capacidade: {summary}")
+            self.start_worker()
+            self.samples.clear()
+        elif decision < 0 and len(self.workers) > self.min_servers:
+            candidates = [worker for worker in self.workers
+                          if worker["server_id"] is not None and not servers[worker["server_id"]]["draining"]]
+            if candidates:
+                # De preferência não o líder (evita uma troca de liderança); depois o menos ocupado, o mais novo
+                worker = min(candidates, key=lambda w: (w["server_id"] == str(stats.get("leader_id")),
+                                                        servers[w["server_id"]]["in_flight"], -w["started"]))
+                logging.info(f"[SUPERVISOR] Capacidade ociosa: {summary}")
+                self.stop_worker(worker)
+                self.samples.clear()
+
+    def run(self):
+        logging.info(f"[SUPERVISOR] Supervisionando de {self.min_servers} a {self.max_servers} servidores "
+                     f"nos núcleos {self.cores}")
+        try:
+            while True:
+                try:
+                    self.step()
+                except Exception as e:
+                    logging.error(f"[SUPERVISOR] Erro no ciclo de supervisão: {e}", exc_info=True)
+                time.sleep(SAMPLE_INTERVAL)
+        finally:
+            for worker in self.workers:
+                worker["process"].terminate()
+            for worker in self.workers:
+                worker["process"].wait()
+            logging.info("[SUPERVISOR] Servidores gerenciados encerrados")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Escala os servidores automaticamente conforme a carga do proxy")
+    parser.add_argument("--min", type=int, default=1, help="mínimo de servidores gerenciados")
+    parser.add_argument("--max", type=int, default=len(available_cores()),
+                        help="máximo de servidores gerenciados (padrão: um por núcleo)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("../supervisor.log"),
+            logging.StreamHandler()
+        ]
+    )
+    try:
+        Supervisor(zmq.Context.instance(), args.min, max(args.min, args.max)).run()
+    except KeyboardInterrupt:
+        pass
@@ -1,12 +1,38 @@
 import json
 import logging
+import random
 import threading
+import time
 from datetime import datetime, timedelta
-from queue import Queue
+from queue import Empty, Full, Queue
 
 import zmq
 
-from CodigoPython import ReturnCodes
+from CodigoPython import Compressao, Configuracao, ReturnCodes
+
+MAX_LIVE_NOTIFICATIONS = 100  # Limite da fila local de notificações recebidas em tempo real
+OVERLOAD_MAX_RETRIES = 5  # Tentativas extras quando o sistema responde que está sobrecarregado
+OVERLOAD_BASE_BACKOFF = 0.2  # Espera inicial (segundos) antes de repetir; dobra a cada tentativa
+OVERLOAD_MAX_BACKOFF = 5.0  # Espera máxima (segundos) entre tentativas
+# Falhas passageiras do sistema (não dizem nada sobre o pedido): o cadastro é repetido, sem trocar o username
+TRANSIENT_ERRORS = {ReturnCodes.ERROR_OVERLOADED, ReturnCodes.ERROR_TIMEOUT}
+# Sem resposta do proxy (caído ou reiniciado): o socket REQ é descartado e recriado (lazy pirate)
+REQUEST_TIMEOUT = 12000  # ms; maior que o timeout do próprio proxy com o reenvio das leituras
+REQUEST_RETRIES = 3  # Novas tentativas de uma leitura idempotente após recriar o socket
+TIMEOUT_RESPONSE = json.dumps({"ret": ReturnCodes.ERROR_TIMEOUT, "msg": "Sem resposta do sistema"}).encode('utf-8')
+
+
+def is_overloaded(response):
+    """
+    Indica se a resposta (bytes) é a recusa por sobrecarga do proxy, pelo "ret" do JSON.
+    Listas (timeline legada) e respostas comprimidas (Compressao) nunca são recusas: não são decodificadas.
+    """
+    if not response.startswith(b"{"):
+        return False
+    try:
+        return json.loads(response).get("ret") == ReturnCodes.ERROR_OVERLOADED
+    except (ValueError, UnicodeDecodeError):
+        return False
 
 
 class User:
@@ -24,14 +50,15 @@ class User:
 
         # Criação dos sockets do usuário (REQ para comandos, SUB para notificações)
         self.context = zmq.Context()
-        self.reqSocket = self.context.socket(zmq.REQ)
-        self.reqSocket.connect("tcp://localhost:5555")
+        self.reqSocket = None
+        self.connect_request_socket()
 
+        # Conectado ao encaminhador do shard do tópico somente após o cadastro
         self.notificationSocket = self.context.socket(zmq.SUB)
-        self.notificationSocket.connect("tcp://localhost:6010")
 
         self.followedUsers = list()  # Lista de usernames seguidos
-        self.notificationQueue = Queue()  # Fila local de notificações recebidas
+        self.notificationQueue = Queue(maxsize=MAX_LIVE_NOTIFICATIONS)  # Fila local (limitada) de notificações
+        self.lastNotificationSeq = 0  # Última sequência da caixa de notificações já lida
 
         self.userId = 0  # Será atribuído após cadastro
         self.notifyTopic = None  # Tópico PUB/SUB usado para notificações
@@ -40,27 +67,76 @@ class User:
         self.sign_up()
         self.start_threads()
 
+    def connect_request_socket(self):
+        """
+        (Re)cria o socket REQ de comandos. Um REQ que ficou sem resposta não pode enviar de novo,
+        então é descartado (sem esperar mensagens pendentes) e substituído.
+        """
+        if self.reqSocket is not None:
+            self.reqSocket.setsockopt(zmq.LINGER, 0)
+            self.reqSocket.close()
+        self.reqSocket = self.context.socket(zmq.REQ)
+        self.reqSocket.connect(Configuracao.connect_address("frontend"))
+
+    def send_and_wait(self, serialized, idempotent):
+        """
+        Envia a requisição e aguarda a resposta por até REQUEST_TIMEOUT (lazy pirate).
+        Sem resposta, recria o socket; leituras idempotentes são repetidas, as demais não
+        (poderiam ser aplicadas duas vezes) e retornam TIMEOUT_RESPONSE.
+        """
+        for attempt in range(REQUEST_RETRIES + 1):
+            self.reqSocket.send(serialized)
+            if self.reqSocket.poll(REQUEST_TIMEOUT):
+                return self.reqSocket.recv()
+            logging.warning(f"Sem resposta do proxy em {REQUEST_TIMEOUT} ms (tentativa {attempt + 1}); reconectando")
+            self.connect_request_socket()
+            if not idempotent:
+                break
+        return TIMEOUT_RESPONSE
+
+    def request(self, package):
+        """
+        Envia uma requisição ao proxy e retorna a resposta (bytes).
+        Se o sistema responder ERROR_OVERLOADED, repete com espera exponencial e jitter,
+        evitando que todos os clientes voltem ao mesmo tempo.
+        """
+        serialized = json.dumps(package).encode('utf-8')
+        idempotent = package.get("action") in Configuracao.IDEMPOTENT_ACTIONS
+        for attempt in range(OVERLOAD_MAX_RETRIES + 1):
+            response = self.send_and_wait(serialized, idempotent)
+            if not is_overloaded(response):
+                return response
+            backoff = min(OVERLOAD_MAX_BACKOFF, OVERLOAD_BASE_BACKOFF * 2 ** attempt)
+            delay = random.uniform(0, backoff)
+            logging.warning(f"Sistema sobrecarregado ({package.get('action')}), nova tentativa em {delay:.2f}s")
+            time.sleep(delay)
+        print("Sistema sobrecarregado, tente novamente mais tarde.")
+        return response
+
     def sign_up(self):
         """
         Realiza o cadastro do usuário junto ao servidor.
-        Em caso de conflito de username, solicita um novo.
+        Em caso de conflito de username, solicita um novo; com o sistema sobrecarregado ou sem
+        resposta, repete o cadastro com espera exponencial e jitter.
         """
+        attempt = 0
+        timedOut = False  # Alguma tentativa ficou sem resposta: o cadastro pode ter sido feito por ela
         while True:
             package = {
                 "action": "add_user",
                 "username": self.username
             }
-            serialized_package = json.dumps(package).encode('utf-8')
-            self.reqSocket.send(serialized_package)
-
-            signupResponseBytes = self.reqSocket.recv().decode('utf-8')
+            signupResponseBytes = self.request(package).decode('utf-8')
             signupResponse = json.loads(signupResponseBytes)
+            ret = signupResponse["ret"]
 
-            if signupResponse["ret"] == 0:
+            if ret == ReturnCodes.SUCCESS:
                 # Cadastro bem-sucedido
                 self.userId = signupResponse["id"]
                 self.notifyTopic = signupResponse["topic"]
-                self.notificationSocket.setsockopt_string(zmq.SUBSCRIBE, self.notifyTopic)
+                self.notificationSocket.connect(Configuracao.notification_endpoint(self.notifyTopic))
+                # O espaço delimita o tópico: evita que 'notificacao_user_1' receba as do usuário 10
+                self.notificationSocket.setsockopt_string(zmq.SUBSCRIBE, f"{self.notifyTopic} ")
                 print(
                     f"Usuário '{self.username}' cadastrado com sucesso com ID {self.userId} e tópico '{self.notifyTopic}'.")
 
@@ -74,10 +150,26 @@ class User:
                 logging.info(
                     f"Usuário '{self.username}' cadastrado com sucesso. ID: {self.userId}, tópico: {self.notifyTopic}")
                 break
+            elif ret in TRANSIENT_ERRORS:
+                # O username não foi recusado: repete o mesmo cadastro mais tarde
+                backoff = min(OVERLOAD_MAX_BACKOFF, OVERLOAD_BASE_BACKOFF * 2 ** attempt)
+                delay = random.uniform(backoff / 2, backoff)
+                attempt += 1
+                timedOut = timedOut or ret == ReturnCodes.ERROR_TIMEOUT
+                print(f"Sistema indisponível no momento ({signupResponse.get('msg', ret)}); "
+                      f"nova tentativa de cadastro em {delay:.1f}s")
+                time.sleep(delay)
             else:
-                # Username já existe: força o usuário a digitar outro
-                print("Username inválido - outro usuário já possui esse username!")
+                if ret == ReturnCodes.ERROR_USERNAME_TAKEN and timedOut:
+                    print("Username já em uso - possivelmente pela tentativa anterior, que ficou sem resposta.")
+                elif ret == ReturnCodes.ERROR_USERNAME_TAKEN:
+                    print("Username inválido - outro usuário já possui esse username!")
+                else:
+                    print(f"Username inválido ({signupResponse.get('msg', ret)})")
+                # Força o usuário a digitar outro
                 self.username = input("Informe um novo username: ")
+                attempt = 0
+                timedOut = False
 
         return
 
@@ -89,7 +181,15 @@ class User:
         while True:
             try:
                 message = self.notificationSocket.recv_string(flags=zmq.NOBLOCK)
-                self.notificationQueue.put_nowait(message)
+                try:
+                    self.notificationQueue.put_nowait(message)
+                except Full:
+                    # Fila cheia: descarta a mais antiga (todas continuam disponíveis na caixa do banco)
+                    try:
+                        self.notificationQueue.get_nowait()
+                    except Empty:
+                        pass
+                    self.notificationQueue.put_nowait(message)
             except zmq.Again:
                 continue
 
@@ -130,11 +230,7 @@ class User:
             "tempoEnvioMensagem": messageTimestamp.isoformat()
         }
 
-        serializedMessage = json.dumps(messagePayload).encode('utf-8')
-
-        self.reqSocket.send(serializedMessage)
-
-        response = self.reqSocket.recv()
+        self.request(messagePayload)
         logging.info(f"Usuário '{self.username}' publicou um texto: '{text}'")
 
     def view_timeline(self):
@@ -142,17 +238,23 @@ class User:
         Solicita e exibe a timeline do usuário, mostrando todos os posts disponíveis.
         """
         timelineRequestMessage = {
-            "action": "get_timeline"
+            "action": "get_timeline",
+            "accept_encoding": list(Compressao.SUPPORTED_ENCODINGS)
         }
-        self.reqSocket.send(json.dumps(timelineRequestMessage).encode('utf-8'))
-
         print("Enviou mensagem de req")
         print("Esperando resposta")
 
-        serializedPosts = self.reqSocket.recv()
+        serializedPosts = self.request(timelineRequestMessage)
         print("Recebeu postagens")
 
-        posts = json.loads(serializedPosts.decode('utf-8'))
+        posts = json.loads(Compressao.decode(serializedPosts))
+        if isinstance(posts, dict) and "posts" in posts:
+            # Formato da resposta com compressão negociada
+            posts = posts["posts"]
+        if isinstance(posts, dict):
+            # Resposta de erro (ex.: sobrecarga persistente) em vez da lista de postagens
+            logging.error(f"Erro ao obter a timeline: {posts}")
+            return
 
         logging.info(f"Usuário '{self.username}' visualizou a timeline")
 
@@ -163,6 +265,84 @@ class User:
             print(f"Texto: {post['texto']}")
             print(f"Enviado em: {post['tempoEnvioMensagem']}")
 
+    def browse_posts(self, request):
+        """
+        Exibe, página a página (paginação por cursor), os posts retornados por uma
+        consulta de perfil ou de timeline dos seguidos.
+        """
+        while True:
+            response = json.loads(self.request(request).decode('utf-8'))
+            if response.get("ret") == ReturnCodes.ERROR_USER_NOT_FOUND:
+                print("Usuário não encontrado.")
+                return
+            if response.get("ret") != ReturnCodes.SUCCESS:
+                print("Erro ao obter as postagens.")
+                logging.error(f"Erro em {request['action']} para '{self.username}': {response}")
+                return
+
+            if not response["posts"] and "cursor" not in request:
+                print("Nenhuma postagem até agora.")
+            for post in response["posts"]:
+                print("----------------------------------")
+                print(f"User: {post['username']}")
+                print(f"Texto: {post['texto']}")
+                print(f"Enviado em: {post['tempoEnvioMensagem']}")
+
+            if not response["has_more"] or input("Ver postagens mais antigas? (s/n): ").strip().lower() != "s":
+                return
+            request["cursor"] = response["next_cursor"]
+
+    def view_user_posts(self):
+        """
+        Exibe o perfil de um usuário: as postagens dele, da mais recente para a mais antiga.
+        """
+        print("\n--- Ver Perfil ---")
+        username = input("Digite o nome do usuário: ")
+        self.browse_posts({"action": "get_user_posts", "username": username})
+        logging.info(f"Usuário '{self.username}' visualizou o perfil de '{username}'")
+
+    def view_home_timeline(self):
+        """
+        Exibe apenas as postagens dos usuários seguidos (e as próprias).
+        """
+        print("\n--- Postagens de Quem Você Segue ---")
+        self.browse_posts({"action": "get_home_timeline", "id": self.userId})
+        logging.info(f"Usuário '{self.username}' visualizou a timeline dos seguidos")
+
+    def search_posts(self):
+        """
+        Busca postagens por termos (use * ao final para prefixo), opcionalmente de um autor,
+        exibindo os resultados página a página.
+        """
+        print("\n--- Buscar Postagens ---")
+        query = input("Digite os termos da busca: ")
+        author = input("Filtrar por autor (Enter para todos): ").strip()
+
+        request = {"action": "search_posts", "query": query, "offset": 0}
+        if author:
+            request["author"] = author
+
+        while True:
+            response = json.loads(self.request(request).decode('utf-8'))
+            if response.get("ret") != ReturnCodes.SUCCESS:
+                print("Erro na busca, verifique os termos informados.")
+                logging.error(f"Erro na busca de '{self.username}': {response}")
+                return
+
+            if request["offset"] == 0:
+                print(f"{response['total']} postagem(ns) encontrada(s)")
+            for post in response["posts"]:
+                print("----------------------------------")
+                print(f"User: {post['username']}")
+                print(f"Texto: {post['texto']}")
+                print(f"Enviado em: {post['tempoEnvioMensagem']}")
+
+            if not response["has_more"] or input("Ver mais resultados? (s/n): ").strip().lower() != "s":
+                break
+            request["offset"] = response["next_offset"]
+
+        logging.info(f"Usuário '{self.username}' buscou postagens por '{query}'")
+
     def follow_user(self):
         """
         Permite ao usuário seguir outro usuário na rede.
@@ -182,10 +362,7 @@ class User:
             "to_follow": usernameInput
         }
 
-        serializedMessage = json.dumps(followRequest).encode('utf-8')
-        self.reqSocket.send(serializedMessage)
-
-        responseBytes = self.reqSocket.recv()
+        responseBytes = self.request(followRequest)
         response = json.loads(responseBytes.decode('utf-8'))
 
         if response["ret"] == ReturnCodes.SUCCESS:
@@ -203,6 +380,65 @@ class User:
 
 
 
+    def display_conversation(self, sender, recipient):
+        """
+        Exibe o histórico de mensagens privadas entre dois usuários,
+        na ordem definida pelos servidores (HLC).
+        """
+        request = {
+            "action": "get_private_messages",
+            "remetente": sender,
+            "destinatario": recipient,
+            "accept_encoding": list(Compressao.SUPPORTED_ENCODINGS)
+        }
+        response = json.loads(Compressao.decode(self.request(request)))
+
+        print(f"\nConversa entre você e {recipient}")
+        print("--------------------------------------------------")
+
+        messages = response.get("mensagens", [])
+        if not messages:
+            print("Nenhuma mensagem até agora.")
+            return
+        # A leitura não altera a caixa de entrada: as mensagens exibidas são marcadas como lidas à parte
+        self.request({"action": "mark_read", "username": sender, "peer": recipient, "hlc": response["hlc"]})
+
+        for message, ts, msgSender in messages:
+            timeFormatted = datetime.fromtimestamp(ts).strftime("%H:%M")
+            if msgSender == self.username:
+                print(f"{'':25} {msgSender}: {message}  ({timeFormatted})")
+            else:
+                print(f"{msgSender}: {message}  ({timeFormatted})")
+
+    def view_conversations(self):
+        """
+        Exibe a caixa de entrada: conversas da mais recente para a mais antiga, com a prévia
+        da última mensagem e o número de mensagens não lidas, página a página.
+        """
+        print("\n--- Conversas ---")
+        request = {"action": "list_conversations", "username": self.username}
+        while True:
+            response = json.loads(self.request(request).decode('utf-8'))
+            if response.get("ret") != ReturnCodes.SUCCESS:
+                print("Erro ao obter as conversas.")
+                logging.error(f"Erro em list_conversations para '{self.username}': {response}")
+                return
+
+            if not response["conversations"] and "cursor" not in request:
+                print("Nenhuma conversa até agora.")
+            for conversation in response["conversations"]:
+                timeFormatted = datetime.fromtimestamp(conversation["timestamp"]).strftime("%d/%m %H:%M")
+                unread = f"  [{conversation['unread']} não lida(s)]" if conversation["unread"] else ""
+                print("----------------------------------")
+                print(f"{conversation['peer']}{unread}")
+                print(f"{conversation['last_sender']}: {conversation['last_message']}  ({timeFormatted})")
+
+            if not response["has_more"] or input("Ver conversas mais antigas? (s/n): ").strip().lower() != "s":
+                break
+            request["cursor"] = response["next_cursor"]
+
+        logging.info(f"Usuário '{self.username}' visualizou as conversas")
+
     def send_private_message(self):
         """
         Permite enviar uma mensagem privada para outro usuário.
@@ -233,10 +469,7 @@ class User:
             "timestamp": timestamp
         }
 
-        serializedMessage = json.dumps(messageRequest).encode('utf-8')
-        self.reqSocket.send(serializedMessage)
-
-        responseBytes = self.reqSocket.recv()
+        responseBytes = self.request(messageRequest)
         response = json.loads(responseBytes.decode('utf-8'))
 
         if response["ret"] == ReturnCodes.SUCCESS:
@@ -246,24 +479,51 @@ class User:
             print("Erro ao enviar mensagem, tente novamente!")
             logging.error(f"Erro ao enviar mensagem de '{sender}' para '{recipient}'")
 
+    def fetch_missed_notifications(self):
+        """
+        Busca na caixa do banco, em uma única chamada paginada, as notificações
+        posteriores à última sequência lida (inclusive as perdidas enquanto offline).
+        """
+        request = {
+            "action": "get_notifications",
+            "id": self.userId,
+            "since": self.lastNotificationSeq
+        }
+        response = json.loads(self.request(request).decode('utf-8'))
+
+        if response.get("ret") != ReturnCodes.SUCCESS:
+            logging.error(f"Erro ao buscar notificações do usuário '{self.username}': {response}")
+            return [], False
+
+        if response["truncated"]:
+            logging.warning(f"Notificações antigas de '{self.username}' foram descartadas antes da leitura.")
+        self.lastNotificationSeq = response["last_seq"]
+        return response["notifications"], response["has_more"]
+
     def view_notifications(self):
         """
-        Exibe todas as notificações recebidas via PUB/SUB que ainda não foram lidas.
+        Exibe as notificações ainda não lidas, recuperadas da caixa do banco.
+        As recebidas via PUB/SUB servem apenas como aviso em tempo real e já estão na caixa.
         """
         print("\n--- Ver Notificações ---")
 
-        notifications = []
+        live = 0
         while not self.notificationQueue.empty():
-            notification = self.notificationQueue.get_nowait()
-            notifications.append(notification)
+            self.notificationQueue.get_nowait()
+            live += 1
+
+        notifications, has_more = self.fetch_missed_notifications()
 
-        logging.info(f"Usuário '{self.username}' verificou notificações. Total: {len(notifications)}")
+        logging.info(f"Usuário '{self.username}' verificou notificações. Total: {len(notifications)} "
+                     f"({live} recebidas em tempo real)")
 
         if not notifications:
             print("Nenhuma nova notificação.")
         else:
-            for idx, notification in enumerate(notifications, 1):
-                print(f"[{idx}] {notification}")
+            for notification in notifications:
+                print(f"[{notification['seq']}] {notification['msg']}")
+            if has_more:
+                print("Há mais notificações: consulte novamente para ver a próxima página.")
 
     def set_forced_delay(self):
         """
@@ -291,7 +551,11 @@ def show_menu():
     print("4. Ver notificações")
     print("5. Ver timeline")
     print("6. Forçar atraso no relógio")
-    print("7. Sair")
+    print("7. Buscar postagens")
+    print("8. Ver perfil de usuário")
+    print("9. Ver postagens de quem você segue")
+    print("10. Ver conversas")
+    print("11. Sair")
 
 
 def main_menu():
@@ -322,6 +586,14 @@ def main_menu():
         elif option == 6:
             user.set_forced_delay()
         elif option == 7:
+            user.search_posts()
+        elif option == 8:
+            user.view_user_posts()
+        elif option == 9:
+            user.view_home_timeline()
+        elif option == 10:
+            user.view_conversations()
+        elif option == 11:
             print("Saindo...")
             break
         else:
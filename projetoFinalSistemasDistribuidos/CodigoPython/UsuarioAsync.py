@@ -0,0 +1,321 @@
+# Cliente assíncrono (asyncio): muitos usuários lógicos multiplexados em uma única conexão com o proxy
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from collections import deque
+
+import zmq
+import zmq.asyncio
+
+from CodigoPython import Compressao, Configuracao, ReturnCodes
+from CodigoPython.Usuario import (MAX_LIVE_NOTIFICATIONS, OVERLOAD_BASE_BACKOFF, OVERLOAD_MAX_BACKOFF,
+                                  OVERLOAD_MAX_RETRIES, TRANSIENT_ERRORS, is_overloaded)
+
+REQUEST_TIMEOUT = 10.0  # Tempo máximo (segundos) de espera pela resposta de uma requisição
+MAX_OUTSTANDING = 256  # Requisições em voo por conexão (as demais aguardam a vez no próprio cliente)
+HEDGE_PERCENTILE = 0.95  # Leitura sem resposta após esse percentil da latência observada é duplicada
+HEDGE_SAMPLE_SIZE = 1000
+HEDGE_MIN_SAMPLES = 50
+
+
+class ConexaoAsync:
+    """
+    Conexão compartilhada com o proxy: um único DEALER, no qual cada requisição leva um id de
+    correlação ([id, "", payload]); uma tarefa recebe as respostas e entrega cada uma à requisição
+    correspondente, em qualquer ordem. As notificações chegam por um SUB por shard, compartilhado
+    por todos os usuários do shard, e são repassadas à fila do usuário dono do tópico.
+    Com hedge=True, uma leitura idempotente sem resposta após o percentil 95 da latência das
+    leituras desta conexão é enviada de novo (outro id de correlação); vale a primeira resposta.
+    """
+
+    def __init__(self, context=None, addresses=None, max_outstanding=MAX_OUTSTANDING, hedge=False):
+        self.context = context or zmq.asyncio.Context.instance()
+        self.addresses = addresses
+        self.socket = self.context.socket(zmq.DEALER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(Configuracao.connect_address("frontend", addresses))
+        self.ids = itertools.count(1)
+        self.pending = {}  # id de correlação -> Future da resposta
+        self.slots = asyncio.Semaphore(max_outstanding)
+        self.subscribers = {}  # endereço do shard -> SUB
+        self.topics = {}  # tópico -> fila de notificações do usuário
+        self.tasks = []
+        self.receiver = None
+        self.hedge = hedge
+        self.read_latencies = deque(maxlen=HEDGE_SAMPLE_SIZE)
+        self.hedges = 0
+
+    async def _receive_replies(self):
+        while True:
+            request_id, _, reply = await self.socket.recv_multipart()
+            future = self.pending.pop(request_id, None)
+            if future is not None and not future.done():
+                future.set_result(reply)
+
+    def hedge_delay(self):
+        if len(self.read_latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.read_latencies)
+        return ordered[int(len(ordered) * HEDGE_PERCENTILE)]
+
+    async def _call(self, payload, timeout, idempotent=False):
+        if self.receiver is None:
+            self.receiver = asyncio.ensure_future(self._receive_replies())
+            self.tasks.append(self.receiver)
+        request_ids = [next(self.ids).to_bytes(8, "big")]
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_ids[0]] = future
+        started = time.monotonic()
+        try:
+            async with self.slots:
+                await self.socket.send_multipart([request_ids[0], b"", payload])
+                delay = self.hedge_delay() if self.hedge and idempotent else None
+                if delay is not None and delay < timeout:
+                    done, _ = await asyncio.wait([future], timeout=delay)
+                    if not done:
+                        # Envio duplicado: o mesmo Future atende a resposta que chegar primeiro
+                        request_ids.append(next(self.ids).to_bytes(8, "big"))
+                        self.pending[request_ids[1]] = future
+                        await self.socket.send_multipart([request_ids[1], b"", payload])
+                        self.hedges += 1
+                reply = await asyncio.wait_for(future, timeout - (time.monotonic() - started))
+                if idempotent:
+                    self.read_latencies.append(time.monotonic() - started)
+                return reply
+        finally:
+            # Resposta que chegar depois do timeout (ou a do envio que perdeu) é descartada pela tarefa de recepção
+            for request_id in request_ids:
+                self.pending.pop(request_id, None)
+
+    async def request(self, package, timeout=REQUEST_TIMEOUT):
+        """
+        Envia uma requisição e retorna a resposta (bytes). Como em Usuario.User.request, respostas
+        ERROR_OVERLOADED são repetidas com espera exponencial e jitter (sem bloquear os demais usuários).
+        """
+        serialized = json.dumps(package).encode('utf-8')
+        idempotent = package.get("action") in Configuracao.IDEMPOTENT_ACTIONS
+        for attempt in range(OVERLOAD_MAX_RETRIES + 1):
+            response = await self._call(serialized, timeout, idempotent)
+            if not is_overloaded(response):
+                return response
+            backoff = min(OVERLOAD_MAX_BACKOFF, OVERLOAD_BASE_BACKOFF * 2 ** attempt)
+            await asyncio.sleep(random.uniform(0, backoff))
+        return response
+
+    def subscribe(self, topic, queue):
+        """
+        Passa a entregar em "queue" as notificações do tópico.
+        """
+        address = Configuracao.notification_endpoint(topic, self.addresses)
+        subscriber = self.subscribers.get(address)
+        if subscriber is None:
+            subscriber = self.subscribers[address] = self.context.socket(zmq.SUB)
+            subscriber.setsockopt(zmq.LINGER, 0)
+            subscriber.connect(address)
+            self.tasks.append(asyncio.ensure_future(self._receive_notifications(subscriber)))
+        self.topics[topic] = queue
+        # O espaço delimita o tópico: evita que 'notificacao_user_1' receba as do usuário 10
+        subscriber.setsockopt_string(zmq.SUBSCRIBE, f"{topic} ")
+
+    async def _receive_notifications(self, subscriber):
+        while True:
+            topic, _, message = (await subscriber.recv_string()).partition(" ")
+            queue = self.topics.get(topic)
+            if queue is None:
+                continue
+            if queue.full():
+                queue.get_nowait()  # Descarta a mais antiga (todas continuam na caixa do banco)
+            queue.put_nowait(message)
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        for subscriber in self.subscribers.values():
+            subscriber.close()
+        self.socket.close()
+
+
+class UsuarioAsync:
+    """
+    Usuário lógico sobre uma ConexaoAsync. Sem menu nem input(): cada ação recebe seus parâmetros
+    e retorna a resposta decodificada, e várias ações do mesmo usuário podem estar em andamento
+    ao mesmo tempo (ex.: buscar a timeline enquanto um post é gravado).
+    """
+
+    def __init__(self, connection, username):
+        self.connection = connection
+        self.username = username
+        self.userId = 0
+        self.notifyTopic = None
+        self.lastNotificationSeq = 0
+        self.notificationQueue = asyncio.Queue(maxsize=MAX_LIVE_NOTIFICATIONS)
+
+    async def request(self, package):
+        return json.loads(Compressao.decode(await self.connection.request(package)))
+
+    async def sign_up(self):
+        """
+        Cadastra o usuário e assina o seu tópico de notificações. Retorna o código de retorno.
+        Sobrecarga ou falta de resposta não recusam o username: o cadastro é repetido com espera exponencial.
+        """
+        for attempt in range(OVERLOAD_MAX_RETRIES + 1):
+            response = await self.request({"action": "add_user", "username": self.username})
+            if response["ret"] not in TRANSIENT_ERRORS:
+                break
+            await asyncio.sleep(random.uniform(0, min(OVERLOAD_MAX_BACKOFF, OVERLOAD_BASE_BACKOFF * 2 ** attempt)))
+        if response["ret"] == ReturnCodes.SUCCESS:
+            self.userId = response["id"]
+            self.notifyTopic = response["topic"]
+            self.connection.subscribe(self.notifyTopic, self.notificationQueue)
+        return response["ret"]
+
+    async def follow(self, username):
+        return await self.request({"action": "add_follower", "id": self.userId, "to_follow": username})
+
+    async def post_text(self, text):
+        return await self.request({
+            "action": "post_text",
+            "username": self.username,
+            "id": self.userId,
+            "texto": text,
+            "tempoEnvioMensagem": time.strftime("%Y-%m-%dT%H:%M:%S")
+        })
+
+    async def send_private_message(self, recipient, text):
+        return await self.request({
+            "action": "add_private_message",
+            "remetente": self.username,
+            "destinatario": recipient,
+            "mensagem": text,
+            "timestamp": int(time.time())
+        })
+
+    async def get_private_messages(self, recipient):
+        response = await self.request({"action": "get_private_messages", "remetente": self.username,
+                                       "destinatario": recipient,
+                                       "accept_encoding": list(Compressao.SUPPORTED_ENCODINGS)})
+        if response.get("mensagens"):
+            await self.request({"action": "mark_read", "username": self.username, "peer": recipient,
+                                "hlc": response["hlc"]})
+        return response
+
+    async def get_home_timeline(self, cursor=None):
+        request = {"action": "get_home_timeline", "id": self.userId}
+        if cursor is not None:
+            request["cursor"] = cursor
+        return await self.request(request)
+
+    async def get_user_posts(self, username, cursor=None):
+        request = {"action": "get_user_posts", "username": username}
+        if cursor is not None:
+            request["cursor"] = cursor
+        return await self.request(request)
+
+    async def search_posts(self, query, offset=0):
+        return await self.request({"action": "search_posts", "query": query, "offset": offset})
+
+    async def list_conversations(self, cursor=None):
+        request = {"action": "list_conversations", "username": self.username}
+        if cursor is not None:
+            request["cursor"] = cursor
+        return await self.request(request)
+
+    async def get_notifications(self):
+        response = await self.request({"action": "get_notifications", "id": self.userId,
+                                       "since": self.lastNotificationSeq})
+        if response.get("ret") == ReturnCodes.SUCCESS:
+            self.lastNotificationSeq = response["last_seq"]
+            while not self.notificationQueue.empty():
+                self.notificationQueue.get_nowait()  # Avisos em tempo real já incluídos na caixa
+        return response
+
+
+# Gerador de carga: mistura de ações por usuário simulado (peso relativo de cada uma)
+LOAD_MIX = [("get_home_timeline", 50), ("post_text", 20), ("get_notifications", 15),
+            ("add_private_message", 10), ("search_posts", 5)]
+LOAD_WORDS = ["sistemas", "distribuidos", "relogio", "lider", "mensagem", "servidor", "cache", "fila"]
+
+
+async def simulate_user(user, others, deadline, think_time, latencies):
+    """
+    Laço de um usuário simulado até o prazo: ações sorteadas conforme LOAD_MIX, com tempo de
+    reflexão exponencial; às vezes o post e a leitura da timeline seguem juntos (duas requisições em voo).
+    """
+    actions, weights = zip(*LOAD_MIX)
+    rng = random.Random()
+
+    async def timed(action, call):
+        started = time.perf_counter()
+        response = await call
+        ok = not isinstance(response, dict) or response.get("ret", 0) == ReturnCodes.SUCCESS
+        latencies.setdefault(action, []).append((time.perf_counter() - started, ok))
+
+    while time.monotonic() < deadline:
+        await asyncio.sleep(rng.expovariate(1 / think_time) if think_time > 0 else 0)
+        action = rng.choices(actions, weights)[0]
+        text = " ".join(rng.choices(LOAD_WORDS, k=rng.randint(2, 6)))
+        try:
+            if action == "get_home_timeline":
+                await timed(action, user.get_home_timeline())
+            elif action == "post_text":
+                await asyncio.gather(timed("post_text", user.post_text(text)),
+                                     timed("get_home_timeline", user.get_home_timeline()))
+            elif action == "get_notifications":
+                await timed(action, user.get_notifications())
+            elif action == "add_private_message":
+                await timed(action, user.send_private_message(rng.choice(others).username, text))
+            else:
+                await timed(action, user.search_posts(rng.choice(LOAD_WORDS)))
+        except asyncio.TimeoutError:
+            latencies.setdefault(action, []).append((REQUEST_TIMEOUT, False))
+
+
+async def run_load(users, duration, think_time, follows, prefix, hedge=False):
+    """
+    Cadastra "users" usuários em uma única conexão, faz cada um seguir "follows" outros
+    e executa a mistura de ações por "duration" segundos. Retorna as métricas por ação.
+    """
+    connection = ConexaoAsync(hedge=hedge)
+    population = [UsuarioAsync(connection, f"{prefix}{i}") for i in range(users)]
+    started = time.perf_counter()
+    await asyncio.gather(*(user.sign_up() for user in population))
+    await asyncio.gather(*(user.follow(other.username) for user in population
+                           for other in random.sample(population, min(follows, users)) if other is not user))
+    logging.info(f"[CARGA] {users} usuários cadastrados em {time.perf_counter() - started:.1f}s")
+
+    latencies = {}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(simulate_user(user, population, deadline, think_time, latencies) for user in population))
+    connection.close()
+
+    summary = {}
+    for action, samples in sorted(latencies.items()):
+        times = sorted(elapsed for elapsed, _ in samples)
+        summary[action] = {
+            "requests": len(samples),
+            "errors": sum(1 for _, ok in samples if not ok),
+            "p50_ms": round(times[len(times) // 2] * 1000, 2),
+            "p99_ms": round(times[min(len(times) - 1, int(len(times) * 0.99))] * 1000, 2),
+        }
+    summary["throughput"] = round(sum(len(samples) for samples in latencies.values()) / duration, 1)
+    summary["hedges"] = connection.hedges
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gerador de carga: muitos usuários em um único processo e conexão")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30, help="duração da fase de carga (segundos)")
+    parser.add_argument("--think-time", type=float, default=5.0, help="tempo médio entre ações de um usuário (segundos)")
+    parser.add_argument("--follows", type=int, default=10, help="usuários seguidos por usuário")
+    parser.add_argument("--prefix", default=f"carga{int(time.time())}_", help="prefixo dos usernames simulados")
+    parser.add_argument("--hedge", action="store_true", help="duplica as leituras lentas (percentil 95)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    result = asyncio.run(run_load(args.users, args.duration, args.think_time, args.follows, args.prefix, args.hedge))
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,80 @@
+# Os módulos do projeto se importam pelo nome (ex.: "import Relogio"): a pasta CodigoPython vai para o sys.path
+import importlib.util
+import json
+import os
+import sys
+
+import pytest
+
+CODIGO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODIGO)
+# Os clientes (Usuario, UsuarioAsync) são importados como pacote: "from CodigoPython import ..."
+sys.path.insert(1, os.path.dirname(CODIGO))
+
+
+class EventosFalsos:
+    """
+    Substitui o socket PUB de eventos do banco, guardando as mensagens publicadas.
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    def send_string(self, message):
+        self.sent.append(message)
+
+
+class BancoDireto:
+    """
+    Cliente do banco que chama process_request de uma instância local, registrando as ações pedidas.
+    Ações em "failing" levantam erro, como um banco sem resposta.
+    """
+
+    def __init__(self, banco):
+        self.banco = banco
+        self.actions = []
+        self.failing = set()
+
+    def call(self, request, timeout=None, raw=False):
+        self.actions.append(request["action"])
+        if request["action"] in self.failing:
+            raise TimeoutError("sem resposta do banco")
+        response = self.banco.process_request(request)
+        return json.dumps(response).encode() if raw else response
+
+    def call_many(self, requests, timeout=None):
+        return [self.call(request) for request in requests]
+
+
+def novo_banco(directory, hot_posts=None, spill_batch=None, hot_messages=None):
+    """
+    Instância nova do módulo BancoDeDados (o estado do banco é global no módulo), sem sockets:
+    os testes chamam process_request diretamente. O armazenamento fica em "directory"; o estado
+    de uma instância anterior encerrada no mesmo diretório é restaurado, como em start().
+    """
+    spec = importlib.util.spec_from_file_location("BancoDeDados_teste", os.path.join(CODIGO, "BancoDeDados.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.events_pub = EventosFalsos()
+    module.HOT_POSTS_LIMIT = hot_posts or module.HOT_POSTS_LIMIT
+    module.POST_SPILL_BATCH = spill_batch or module.POST_SPILL_BATCH
+    module.HOT_MESSAGES_PER_CONVERSATION = hot_messages or module.HOT_MESSAGES_PER_CONVERSATION
+    module.open_storage(str(directory))
+    return module
+
+
+@pytest.fixture
+def banco(tmp_path):
+    return novo_banco(tmp_path)
+
+
+@pytest.fixture
+def servidor(banco):
+    """
+    Instância nova do módulo Servidor, sem sockets, ligada ao banco do teste por um BancoDireto.
+    """
+    spec = importlib.util.spec_from_file_location("Servidor_teste", os.path.join(CODIGO, "Servidor.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.database_client = BancoDireto(banco)
+    return module
@@ -0,0 +1,48 @@
+# Testes do controle de admissão do proxy (token bucket por usuário)
+import json
+
+import Proxy
+
+
+def frames(package):
+    return [b"cliente", b"", json.dumps(package).encode()]
+
+
+def test_lote_custa_um_token_por_item():
+    key, action, cost = Proxy.inspect_request(frames({"action": "batch", "id": 7, "requests": [{}] * 30}))
+    assert (key, action, cost) == ("id:7", "batch", 30)
+    assert Proxy.inspect_request(frames({"action": "get_timeline"}))[2] == 1
+    assert Proxy.inspect_request([b"cliente", b"", b"lixo"])[1:] == (None, 1)
+
+
+def test_lote_grande_e_admitido_mas_esgota_os_tokens():
+    buckets = {}
+    assert Proxy.take_token(buckets, "u", 0.0, cost=100)
+    # Saldo negativo: nada é admitido até a reposição cobrir o lote inteiro
+    assert not Proxy.take_token(buckets, "u", 0.0)
+    assert not Proxy.take_token(buckets, "u", 1.0)
+    assert Proxy.take_token(buckets, "u", (100 - Proxy.USER_BURST + 1) / Proxy.USER_RATE_LIMIT + 0.01)
+
+
+def test_rajada_limitada_por_usuario():
+    buckets = {}
+    admitted = sum(Proxy.take_token(buckets, "u", 0.0) for _ in range(Proxy.USER_BURST * 2))
+    assert admitted == Proxy.USER_BURST
+    assert Proxy.take_token(buckets, "outro", 0.0)
+
+
+def test_rejeicao_por_saturacao_nao_consome_tokens():
+    buckets = {}
+    for _ in range(Proxy.USER_BURST * 3):
+        assert Proxy.admission(buckets, "u", 0.0, 1, outstanding=10, max_pending=10) == "saturated"
+    # Com capacidade de volta, o usuário ainda tem a rajada inteira
+    results = [Proxy.admission(buckets, "u", 0.0, 1, outstanding=0, max_pending=10) for _ in range(Proxy.USER_BURST)]
+    assert results == [None] * Proxy.USER_BURST
+    assert Proxy.admission(buckets, "u", 0.0, 1, outstanding=0, max_pending=10) == "rate_limited"
+
+
+def test_devolucao_de_tokens():
+    buckets = {}
+    assert Proxy.admission(buckets, "u", 0.0, 10, outstanding=0, max_pending=10) is None
+    Proxy.refund_token(buckets, "u", 10)
+    assert buckets["u"][0] == Proxy.USER_BURST
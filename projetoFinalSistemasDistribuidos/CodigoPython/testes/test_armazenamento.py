@@ -0,0 +1,106 @@
+# Testes do armazenamento em camadas (janela quente em memória, blocos frios em segmentos)
+import random
+
+import Armazenamento
+
+
+def chave(post):
+    return post["hlc"], post["server_id"]
+
+
+def posts_embaralhados(count, seed=1):
+    posts = [{"hlc": hlc, "server_id": hlc % 3, "texto": f"p{hlc}"} for hlc in range(1, count + 1)]
+    random.Random(seed).shuffle(posts)
+    return posts
+
+
+def test_ascending_e_descending_em_ordem(tmp_path):
+    storage = Armazenamento.ArmazenamentoPosts(str(tmp_path), hot_limit=50, spill_batch=40, key=chave)
+    for post in posts_embaralhados(500):
+        storage.add(post)
+    assert storage.blocks
+    expected = sorted(range(1, 501))
+    assert [post["hlc"] for post in storage.ascending()] == expected
+    assert [post["hlc"] for post in storage.descending()] == expected[::-1]
+    assert [post["hlc"] for post in storage.ascending(after=(250, 250 % 3))] == expected[250:]
+
+
+def test_ascending_le_blocos_sob_demanda(tmp_path, monkeypatch):
+    storage = Armazenamento.ArmazenamentoPosts(str(tmp_path), hot_limit=50, spill_batch=40, key=chave)
+    for hlc in range(1, 1001):
+        storage.add({"hlc": hlc, "server_id": 0})
+    reads = []
+    original = storage.segments.read
+    monkeypatch.setattr(storage.segments, "read", lambda *args: reads.append(args) or original(*args))
+    page = []
+    for post in storage.ascending():
+        page.append(post["hlc"])
+        if len(page) == 10:
+            break
+    assert page == list(range(1, 11))
+    assert len(reads) == 1  # Só o primeiro bloco, não o histórico inteiro
+
+
+def test_segmentos_sobrevivem_ao_reinicio(tmp_path):
+    storage = Armazenamento.ArmazenamentoPosts(str(tmp_path), hot_limit=50, spill_batch=40, key=chave)
+    for hlc in range(1, 301):
+        storage.add({"hlc": hlc, "server_id": 0})
+    cold = storage.cold_count
+    conversations = Armazenamento.ArmazenamentoConversas(str(tmp_path), hot_limit=10)
+    for hlc in range(1, 31):
+        conversations.insert("bob", "alice", hlc, [f"m{hlc}", hlc, "bob"])
+
+    # Nova instância sobre o mesmo diretório: o histórico frio é recarregado, não apagado
+    restarted = Armazenamento.ArmazenamentoPosts(str(tmp_path), hot_limit=50, spill_batch=40, key=chave)
+    assert restarted.cold_count == cold
+    assert [post["hlc"] for post in restarted.ascending()] == list(range(1, cold + 1))
+    restarted.add({"hlc": 1000, "server_id": 0})
+    assert [post["hlc"] for post in restarted.descending()][:2] == [1000, cold]
+
+    restarted_conversations = Armazenamento.ArmazenamentoConversas(str(tmp_path), hot_limit=10)
+    assert restarted_conversations.conversations() == {("alice", "bob")}
+    stored = restarted_conversations.read("alice", "bob")
+    assert stored and stored == conversations.read("alice", "bob")[:len(stored)]
+    assert restarted_conversations.last("bob", "alice")[1] == stored[-1]
+
+
+def test_bloco_incompleto_no_fim_e_descartado(tmp_path):
+    storage = Armazenamento.ArmazenamentoPosts(str(tmp_path), hot_limit=10, spill_batch=10, key=chave)
+    for hlc in range(1, 31):
+        storage.add({"hlc": hlc, "server_id": 0})
+    cold = storage.cold_count
+    with open(storage.segments.files[-1].name, "ab") as f:
+        f.write(b'[{"hlc": 99, "serv')  # Gravação interrompida
+    restarted = Armazenamento.ArmazenamentoPosts(str(tmp_path), hot_limit=10, spill_batch=10, key=chave)
+    assert restarted.cold_count == cold
+    for hlc in range(100, 130):
+        restarted.add({"hlc": hlc, "server_id": 0})
+    again = Armazenamento.ArmazenamentoPosts(str(tmp_path), hot_limit=10, spill_batch=10, key=chave)
+    assert again.cold_count == restarted.cold_count
+
+
+def test_get_le_so_o_bloco_da_chave(tmp_path, monkeypatch):
+    storage = Armazenamento.ArmazenamentoPosts(str(tmp_path), hot_limit=50, spill_batch=40, key=chave)
+    for hlc in range(1, 1001):
+        storage.add({"hlc": hlc, "server_id": 0})
+    reads = []
+    original = storage.segments.read
+    monkeypatch.setattr(storage.segments, "read", lambda *args: reads.append(args) or original(*args))
+    assert storage.get((100, 0))["hlc"] == 100
+    assert storage.get((100, 1)) is None
+    assert len(reads) == 1  # Só o bloco da chave, sem percorrer os blocos seguintes
+    assert storage.get((900, 0))["hlc"] == 900
+    assert len(reads) == 2
+
+
+def test_ultima_mensagem_pelo_maior_hlc(tmp_path):
+    conversations = Armazenamento.ArmazenamentoConversas(str(tmp_path), hot_limit=2)
+    for hlc in range(10, 14):
+        conversations.insert("alice", "bob", hlc, [f"m{hlc}", hlc, "alice"])
+    # Mensagens antigas (carga em massa, réplica atrasada) gravadas depois em um bloco próprio
+    for hlc in range(1, 5):
+        conversations.insert("alice", "bob", hlc, [f"m{hlc}", hlc, "bob"])
+    conversations.flush()
+    assert conversations.last("alice", "bob") == (13, ["m13", 13, "alice"])
+    restarted = Armazenamento.ArmazenamentoConversas(str(tmp_path), hot_limit=2)
+    assert restarted.last("bob", "alice") == (13, ["m13", 13, "alice"])
@@ -0,0 +1,83 @@
+# Testes do banco: leitura paginada da timeline e reinício sobre segmentos existentes
+import Relogio
+import ReturnCodes
+from conftest import novo_banco
+
+
+def novo_post(user_id, username, physical_ms):
+    return {"id": user_id, "username": username, "texto": f"post {physical_ms}",
+            "tempoEnvioMensagem": "2026-01-01T00:00:00", "hlc": Relogio.encode_hlc(physical_ms, 0), "server_id": 1}
+
+
+def test_get_posts_com_limite_retorna_os_mais_recentes(banco):
+    banco.process_request({"action": "add_user", "username": "alice"})
+    for i in range(30):
+        banco.process_request({"action": "add_post", "post": novo_post(1, "alice", 1000_000 + i)})
+    posts = banco.process_request({"action": "get_posts", "format": "list", "limit": 5})
+    assert [Relogio.decode_hlc(post["hlc"])[0] for post in posts] == list(range(1000_025, 1000_030))
+
+
+def test_reinicio_restaura_historico_frio(tmp_path):
+    banco = novo_banco(tmp_path, hot_posts=10, spill_batch=10, hot_messages=4)
+    banco.process_request({"action": "add_user", "username": "alice"})
+    banco.process_request({"action": "add_user", "username": "bob"})
+    for i in range(40):
+        banco.process_request({"action": "add_post", "post": novo_post(2, "bob", 1000_000 + i)})
+    for i in range(10):
+        banco.process_request({"action": "add_private_message", "remetente": "alice", "destinatario": "bob",
+                               "mensagem": f"m{i}", "timestamp": i, "hlc": Relogio.encode_hlc(2000_000 + i, 0)})
+    cold_posts = banco.database["posts"].cold_count
+
+    restarted = novo_banco(tmp_path, hot_posts=10, spill_batch=10, hot_messages=4)
+    posts = restarted.process_request({"action": "get_posts", "format": "list"})
+    assert len(posts) == cold_posts
+    # O autor volta com o id original e o perfil dele lista os posts restaurados
+    assert restarted.process_request({"action": "get_user_id", "username": "BOB"})["id"] == 2
+    profile = restarted.process_request({"action": "get_user_posts", "id": 2, "limit": 100})
+    assert len(profile["posts"]) == cold_posts
+    # Novos cadastros não reutilizam ids de autores restaurados
+    assert restarted.process_request({"action": "add_user", "username": "carol"})["id"] == 3
+    # Novas escritas ficam depois do histórico restaurado
+    reply = restarted.process_request({"action": "add_post", "post": novo_post(3, "carol", 1)})
+    assert reply["hlc"] > posts[-1]["hlc"]
+    # Conversa fria também é restaurada (mensagens e índice da caixa de entrada)
+    messages = restarted.process_request({"action": "get_private_messages", "remetente": "bob",
+                                          "destinatario": "alice"})["mensagens"]
+    assert messages and messages[0] == ["m0", 0, "alice"]
+    assert restarted.database["conversation_summary"]["bob"]["alice"]["last_message"]
+
+
+def test_reinicio_apos_encerramento_recupera_todo_o_estado(tmp_path):
+    banco = novo_banco(tmp_path, hot_posts=10, spill_batch=10, hot_messages=4)
+    for username in ("alice", "bob", "carol", "dave"):
+        banco.process_request({"action": "add_user", "username": username})
+    banco.process_request({"action": "add_follower", "id": 1, "to_follow": "bob"})
+    banco.process_request({"action": "add_notifications", "users": [1, 1], "msg": "oi", "timestamp": 5})
+    for i in range(15):
+        banco.process_request({"action": "add_post", "post": novo_post(2, "bob", 1000_000 + i)})
+    # carol e dave nunca postam: só trocam mensagens privadas (uma parte fica na janela quente)
+    for i in range(6):
+        banco.process_request({"action": "add_private_message", "remetente": "carol", "destinatario": "dave",
+                               "mensagem": f"m{i}", "timestamp": i, "hlc": Relogio.encode_hlc(2000_000 + i, 0)})
+    posts = banco.process_request({"action": "get_posts", "format": "list"})
+    inbox = banco.process_request({"action": "list_conversations", "username": "dave"})
+    banco.shutdown()
+
+    restarted = novo_banco(tmp_path, hot_posts=10, spill_batch=10, hot_messages=4)
+    # A timeline não tem buraco: os posts da janela quente foram gravados no encerramento
+    assert restarted.process_request({"action": "get_posts", "format": "list"}) == posts
+    # Cadastros voltam com os ids originais, inclusive de quem nunca postou
+    assert restarted.process_request({"action": "add_user", "username": "Bob"})["ret"] == \
+        ReturnCodes.ERROR_USERNAME_TAKEN
+    assert restarted.process_request({"action": "get_user_id", "username": "dave"})["id"] == 4
+    assert restarted.process_request({"action": "add_user", "username": "erin"})["id"] == 5
+    # Caixa de entrada (com as não lidas) e mensagens de participantes que nunca postaram
+    assert restarted.process_request({"action": "list_conversations", "username": "dave"}) == inbox
+    messages = restarted.process_request({"action": "get_private_messages", "remetente": "dave",
+                                          "destinatario": "carol"})
+    assert messages["ret"] == ReturnCodes.SUCCESS and len(messages["mensagens"]) == 6
+    # Seguidores e notificações
+    assert restarted.process_request({"action": "get_followers", "id": 2})["followers"] == [1]
+    notifications = restarted.process_request({"action": "get_notifications", "id": 1})
+    assert [n["seq"] for n in notifications["notifications"]] == [1, 2]
+
@@ -0,0 +1,30 @@
+# Ordem causal das escritas no banco: cada escrita fica após as já gravadas
+import Relogio
+
+
+def novo_post(user_id, hlc, server_id=1):
+    return {"id": user_id, "username": "alice", "texto": "oi", "tempoEnvioMensagem": "2026-01-01T00:00:00",
+            "hlc": hlc, "server_id": server_id}
+
+
+def test_escrita_de_servidor_atrasado_fica_apos_as_gravadas(banco):
+    banco.process_request({"action": "add_user", "username": "alice"})
+    ahead = Relogio.encode_hlc(2000_000, 5)
+    first = banco.process_request({"action": "add_post", "post": novo_post(1, ahead, server_id=1)})
+    # Servidor com relógio atrasado: o post é gravado logo após o anterior, não antes dele
+    second = banco.process_request({"action": "add_post", "post": novo_post(1, Relogio.encode_hlc(1000_000, 0), 2)})
+    assert first["hlc"] == ahead
+    assert second["hlc"] > first["hlc"]
+    posts = banco.process_request({"action": "get_posts", "format": "list"})
+    assert [post["server_id"] for post in posts] == [1, 2]
+
+
+def test_mensagem_privada_fica_apos_as_gravadas(banco):
+    banco.process_request({"action": "add_user", "username": "alice"})
+    banco.process_request({"action": "add_user", "username": "bob"})
+    ahead = Relogio.encode_hlc(2000_000, 0)
+    banco.process_request({"action": "add_post", "post": novo_post(1, ahead)})
+    reply = banco.process_request({"action": "add_private_message", "remetente": "bob", "destinatario": "alice",
+                                   "mensagem": "oi", "timestamp": 1, "hlc": Relogio.encode_hlc(1000_000, 0)})
+    assert reply["hlc"] > ahead
+
@@ -0,0 +1,70 @@
+# Testes do cache LRU com invalidação por geração
+import Cache
+
+
+def test_lru_despeja_o_menos_usado():
+    cache = Cache.CacheLRU("teste", capacity=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get_or_load("a", lambda: 0) == 1  # "a" passa a ser o mais recente
+    cache.put("c", 3)
+    assert cache.get_or_load("b", lambda: "recarregado") == "recarregado"
+    assert cache.stats()["evictions"] == 2
+
+
+def test_item_expira_pelo_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(Cache.time, "monotonic", lambda: now[0])
+    cache = Cache.CacheLRU("teste", capacity=10, ttl=30)
+    cache.put("a", 1)
+    now[0] += 29
+    assert cache.get_or_load("a", lambda: 2) == 1
+    now[0] += 1
+    assert cache.get_or_load("a", lambda: 2) == 2
+
+
+def test_get_or_load_nao_grava_valor_carregado_antes_de_invalidacao():
+    cache = Cache.CacheLRU("teste", capacity=10, ttl=60)
+
+    def loader():
+        cache.clear()  # Evento do banco chega durante a leitura
+        return "antigo"
+
+    assert cache.get_or_load("a", loader) == "antigo"
+    assert cache.get_or_load("a", lambda: "novo") == "novo"
+
+
+def test_banco_publica_invalidacoes(banco):
+    banco.process_request({"action": "add_user", "username": "alice"})
+    banco.process_request({"action": "add_user", "username": "bob"})
+    banco.process_request({"action": "add_follower", "id": 1, "to_follow": "bob"})
+    events = [event.split(" ", 2)[1] for event in banco.events_pub.sent]
+    assert events == ["usernames", "usernames", "followers"]
+    assert banco.events_pub.sent[-1] == "invalidate followers [2]"
+
+
+def test_get_many_or_load_carrega_so_as_faltantes():
+    cache = Cache.CacheLRU("teste", capacity=10, ttl=60)
+    cache.put("a", 1)
+    calls = []
+
+    def loader(keys):
+        calls.append(list(keys))
+        return [ord(key) for key in keys]
+
+    assert cache.get_many_or_load(["a", "b", "c", "b"], loader) == {"a": 1, "b": 98, "c": 99}
+    assert calls == [["b", "c"]]
+    assert cache.get_many_or_load(["b", "c"], loader) == {"b": 98, "c": 99}
+    assert len(calls) == 1
+
+
+def test_get_many_or_load_nao_grava_valor_carregado_antes_de_invalidacao():
+    cache = Cache.CacheLRU("teste", capacity=10, ttl=60)
+
+    def loader(keys):
+        # Uma invalidação chega enquanto a carga está em andamento: o valor pode estar desatualizado
+        cache.invalidate("a")
+        return [-1 for _ in keys]
+
+    assert cache.get_many_or_load(["a"], loader) == {"a": -1}
+    assert cache.stats()["size"] == 0
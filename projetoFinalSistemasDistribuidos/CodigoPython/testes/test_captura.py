@@ -0,0 +1,51 @@
+# Testes da captura de tráfego do proxy e do replay contra o frontend
+import json
+import threading
+import time
+
+import zmq
+
+import Captura
+import Replay
+import ReturnCodes
+
+
+def test_captura_grava_e_le_os_registros(tmp_path):
+    path = str(tmp_path / "captura.bin")
+    recorder = Captura.GravadorCaptura(zmq.Context.instance(), path)
+    payloads = [json.dumps({"action": "get_timeline", "n": i}).encode() for i in range(5)]
+    for i, payload in enumerate(payloads):
+        recorder.record(1000.0 + i, payload)
+    time.sleep(Captura.FLUSH_INTERVAL + 0.5)
+    assert Captura.read_trace(path) == [(1000.0 + i, payload) for i, payload in enumerate(payloads)]
+    # Registro incompleto no fim (captura interrompida) é ignorado
+    with open(path, "ab") as trace:
+        trace.write(Captura.RECORD_HEADER.pack(2000.0, 100) + b"{")
+    assert len(Captura.read_trace(path)) == 5
+
+
+def test_classificacao_das_respostas():
+    assert Replay.classify(json.dumps({"ret": ReturnCodes.ERROR_OVERLOADED}).encode()) == "overloaded"
+    assert Replay.classify(json.dumps({"ret": ReturnCodes.ERROR_USER_NOT_FOUND}).encode()) == "error"
+    assert Replay.classify(json.dumps([{"texto": "timeline legada"}]).encode()) == "ok"
+    assert Replay.classify(b"\x00zlib\x00...") == "ok"
+
+
+def test_replay_mantem_varias_requisicoes_em_voo():
+    context = zmq.Context.instance()
+    frontend = context.socket(zmq.ROUTER)
+    frontend.bind("inproc://replay-teste")
+    records = [(1000.0 + i / 100, json.dumps({"action": "get_timeline", "n": i}).encode()) for i in range(20)]
+
+    def proxy_falso():
+        # Só responde depois de receber todas: o replay não espera cada resposta para enviar a próxima
+        received = [frontend.recv_multipart() for _ in records]
+        for frames in reversed(received):
+            code = ReturnCodes.ERROR_OVERLOADED if json.loads(frames[-1])["n"] == 0 else ReturnCodes.SUCCESS
+            frontend.send_multipart(frames[:-1] + [json.dumps({"ret": code}).encode()])
+
+    threading.Thread(target=proxy_falso, daemon=True).start()
+    summary = Replay.replay(records, "inproc://replay-teste", speed=0)
+    frontend.close()
+    assert summary["answered"] == 20 and summary["lost"] == 0
+    assert (summary["ok"], summary["overloaded"], summary["error"]) == (19, 1, 0)
@@ -0,0 +1,50 @@
+# Testes da carga em massa do banco (arquivos NDJSON de CargaEmMassa)
+import CargaEmMassa
+import ReturnCodes
+
+
+def test_carga_de_arquivo_gerado(banco, tmp_path):
+    path = str(tmp_path / "carga.ndjson")
+    CargaEmMassa.generate(path, users=20, follows=3, posts=300, messages=50, seed=1)
+    reply = banco.process_request({"action": "bulk_load", "path": path})
+    assert reply["ret"] == ReturnCodes.SUCCESS
+    counts = reply["counts"]
+    assert (counts["user"], counts["post"], counts["message"]) == (20, 300, 50)
+    assert counts["follow"] + counts["skipped"] == sum(
+        1 for record in CargaEmMassa.read_records(path) if record["type"] == "follow")
+
+    posts = banco.process_request({"action": "get_posts", "format": "list"})
+    assert len(posts) == 300
+    assert [post["hlc"] for post in posts] == sorted(post["hlc"] for post in posts)
+    assert reply["hlc"] >= posts[-1]["hlc"]
+    # Índices montados no fim da carga: busca, perfis e caixas de entrada
+    assert banco.process_request({"action": "search_posts", "query": "sistemas"})["total"] > 0
+    profile = banco.process_request({"action": "get_user_posts", "id": 1, "limit": 100})
+    assert all(post["username"] == "user0" for post in profile["posts"])
+    inboxes = [banco.process_request({"action": "list_conversations", "username": f"user{i}", "limit": 100})
+               for i in range(20)]
+    assert sum(len(inbox["conversations"]) for inbox in inboxes) == 2 * len(
+        {frozenset((r["remetente"], r["destinatario"])) for r in CargaEmMassa.read_records(path)
+         if r["type"] == "message"})
+    # Um único evento de invalidação para a carga inteira
+    assert banco.events_pub.sent == ["invalidate all []"]
+
+
+def test_registros_invalidos_sao_ignorados(banco):
+    banco.process_request({"action": "add_user", "username": "alice"})
+    reply = banco.process_request({"action": "bulk_load", "records": [
+        {"type": "user", "username": "ALICE"},  # Já cadastrado
+        {"type": "user", "username": "bob"},
+        {"type": "follow", "username": "bob", "to_follow": "alice"},
+        {"type": "follow", "username": "bob", "to_follow": "ninguem"},
+        {"type": "post", "username": "ninguem", "texto": "sem autor", "timestamp": 1},
+        {"type": "post", "username": "bob", "texto": "oi", "timestamp": 2},
+        {"type": "message", "remetente": "bob", "destinatario": "alice", "mensagem": "oi", "timestamp": 3},
+        {"type": "message", "remetente": "bob", "destinatario": "bob", "mensagem": "eu", "timestamp": 4},
+        {"type": "desconhecido"},
+        {"type": "post", "username": "bob"},  # Falta o texto
+    ]})
+    assert reply["counts"] == {"user": 1, "follow": 1, "post": 1, "message": 1, "skipped": 6}
+    assert banco.process_request({"action": "get_followers", "id": 1})["followers"] == [2]
+    inbox = banco.process_request({"action": "list_conversations", "username": "alice"})
+    assert inbox["conversations"][0]["unread"] == 1
@@ -0,0 +1,61 @@
+# Testes do cliente do banco com várias requisições em andamento
+import json
+import threading
+
+import pytest
+import zmq
+
+import ClienteBanco
+import ReturnCodes
+
+
+def banco_falso(context, endpoint, batch, ignore=()):
+    """
+    ROUTER que espera "batch" requisições e responde a todas em ordem inversa (ecoando o pedido).
+    Requisições com ação em "ignore" ficam sem resposta.
+    """
+    router = context.socket(zmq.ROUTER)
+    router.bind(endpoint)
+
+    def run():
+        received = [router.recv_multipart() for _ in range(batch)]
+        for identity, request_id, payload in reversed(received):
+            request = json.loads(payload)
+            if request["action"] not in ignore:
+                router.send_multipart([identity, request_id, json.dumps({"echo": request}).encode()])
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return router, thread
+
+
+def test_call_many_respostas_fora_de_ordem():
+    context = zmq.Context()
+    router, thread = banco_falso(context, "inproc://banco-teste-1", 3)
+    client = ClienteBanco.ClienteBanco(context, ["inproc://banco-teste-1"], timeout=2)
+    requests = [{"action": "get_user_id", "username": name} for name in ("a", "b", "c")]
+    # O banco só responde depois de receber as três: elas estão em andamento ao mesmo tempo
+    assert [reply["echo"] for reply in client.call_many(requests)] == requests
+    thread.join(1)
+    assert client.stats()["pending"] == 0
+
+
+def test_timeout_falha_so_a_requisicao_sem_resposta():
+    context = zmq.Context()
+    router, thread = banco_falso(context, "inproc://banco-teste-2", 2, ignore={"lenta"})
+    client = ClienteBanco.ClienteBanco(context, ["inproc://banco-teste-2"], timeout=0.3)
+    slow = client.submit({"action": "lenta"})
+    fast = client.submit({"action": "rapida"})
+    assert fast.result(1)["echo"]["action"] == "rapida"
+    with pytest.raises(ClienteBanco.BancoTimeoutError):
+        slow.result(2)
+
+
+def test_servidor_valida_remetente_e_destinatario(servidor, banco):
+    for username in ("alice", "bob"):
+        banco.process_request({"action": "add_user", "username": username})
+    message = {"action": "add_private_message", "destinatario": "bob", "mensagem": "oi", "timestamp": 1}
+    assert servidor.add_private_message(dict(message, remetente="alice"))[0] == ReturnCodes.SUCCESS
+    assert servidor.add_private_message(dict(message, remetente="ninguem"))[0] == ReturnCodes.ERROR_USER_NOT_FOUND
+    # O remetente inexistente é recusado sem gravar a mensagem
+    assert servidor.database_client.actions.count("add_private_message") == 1
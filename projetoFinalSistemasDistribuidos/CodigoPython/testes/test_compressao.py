@@ -0,0 +1,42 @@
+# Testes da compressão negociada das respostas grandes
+import json
+
+import Compressao
+
+
+class SocketFalso:
+    def __init__(self):
+        self.sent = []
+
+    def send_multipart(self, frames, copy=True):
+        self.sent.append(frames)
+
+
+def test_negociacao():
+    assert Compressao.negotiate(["br", "zlib"]) == "zlib"
+    assert Compressao.negotiate(["br"]) is None
+    assert Compressao.negotiate("zlib") is None  # Deve ser uma lista
+    assert Compressao.negotiate(None) is None
+
+
+def test_so_respostas_grandes_sao_comprimidas():
+    small = json.dumps({"ret": 0}).encode()
+    assert Compressao.encode(small, "zlib") == small
+    large = json.dumps([{"texto": "post repetido"}] * 200).encode()
+    assert Compressao.encode(large, None) == large
+    compressed = Compressao.encode(large, "zlib")
+    assert Compressao.is_compressed(compressed) and len(compressed) < len(large)
+    assert Compressao.decode(compressed) == large
+    assert Compressao.decode(large) == large
+
+
+def test_banco_comprime_a_resposta_negociada(banco):
+    banco.socket = SocketFalso()
+    posts = [{"texto": f"post {i}"} for i in range(100)]
+    banco.send_reply([b"cliente", b"1"], posts, "zlib")
+    banco.send_reply([b"cliente", b"2"], posts)
+    (compressed_frames, plain_frames) = banco.socket.sent
+    assert compressed_frames[:2] == [b"cliente", b"1"]
+    assert Compressao.is_compressed(compressed_frames[2])
+    assert json.loads(Compressao.decode(compressed_frames[2])) == posts
+    assert json.loads(plain_frames[2]) == posts
@@ -0,0 +1,28 @@
+# Testes dos endereços dos canais: portas de servidores diferentes nunca coincidem
+import pytest
+
+import Configuracao
+
+
+def porta(address):
+    return int(address.rsplit(":", 1)[1])
+
+
+def test_portas_por_servidor_nao_colidem_com_ids_altos():
+    # O supervisor nunca reutiliza ids: depois de muitas substituições eles passam de 100
+    ports = {}
+    for server_id in range(1, 1001):
+        for channel in ("time", "server_admin"):
+            port = porta(Configuracao.bind_address(channel, server_id=server_id))
+            assert port not in ports, f"{channel} de {server_id} colide com {ports.get(port)}"
+            ports[port] = (channel, server_id)
+    fixed = [porta(Configuracao.bind_address(name)) for name, canal in Configuracao.DEFAULT_ENDPOINTS.items()
+             if canal.param is None]
+    fixed += [porta(Configuracao.bind_address(name, shard=shard)) for name in ("shard_internal", "shard_public")
+              for shard in range(Configuracao.NOTIFICATION_SHARDS)]
+    assert not set(fixed) & set(ports)
+
+
+def test_porta_fora_do_intervalo_tcp():
+    with pytest.raises(ValueError):
+        Configuracao.bind_address("time", server_id=40000)
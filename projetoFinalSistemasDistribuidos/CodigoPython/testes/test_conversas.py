@@ -0,0 +1,51 @@
+# Testes da caixa de entrada: conversas por última atividade, com prévia e mensagens não lidas
+import Relogio
+import ReturnCodes
+
+
+def enviar(banco, sender, recipient, text, physical_ms):
+    return banco.process_request({"action": "add_private_message", "remetente": sender, "destinatario": recipient,
+                                  "mensagem": text, "timestamp": physical_ms // 1000,
+                                  "hlc": Relogio.encode_hlc(physical_ms, 0)})
+
+
+def test_conversas_da_mais_recente_para_a_mais_antiga(banco):
+    for username in ("alice", "bob", "carol", "dave"):
+        banco.process_request({"action": "add_user", "username": username})
+    enviar(banco, "bob", "alice", "oi alice", 1000_000)
+    enviar(banco, "carol", "alice", "oi", 1000_001)
+    enviar(banco, "alice", "dave", "oi dave", 1000_002)
+    enviar(banco, "bob", "alice", "de novo", 1000_003)  # A conversa com bob volta ao topo
+    reply = banco.process_request({"action": "list_conversations", "username": "ALICE", "limit": 2})
+    assert [(c["peer"], c["last_message"], c["unread"]) for c in reply["conversations"]] == [
+        ("bob", "de novo", 2), ("dave", "oi dave", 0)]
+    assert reply["has_more"]
+    reply = banco.process_request({"action": "list_conversations", "username": "alice", "limit": 2,
+                                   "cursor": reply["next_cursor"]})
+    assert [c["peer"] for c in reply["conversations"]] == ["carol"] and not reply["has_more"]
+    assert banco.process_request({"action": "list_conversations", "username": "erin"})["ret"] == \
+        ReturnCodes.ERROR_USER_NOT_FOUND
+
+
+def test_leitura_da_conversa_nao_altera_as_nao_lidas(banco):
+    for username in ("alice", "bob"):
+        banco.process_request({"action": "add_user", "username": username})
+
+    def nao_lidas():
+        return banco.process_request({"action": "list_conversations", "username": "bob"})["conversations"][0]["unread"]
+
+    enviar(banco, "alice", "bob", "m0", 2000_000)
+    enviar(banco, "alice", "bob", "m1", 2000_001)
+    # Leituras repetidas (reenvio, hedge, cache) não marcam nada como lido
+    for _ in range(2):
+        read = banco.process_request({"action": "get_private_messages", "remetente": "bob", "destinatario": "alice"})
+    assert nao_lidas() == 2
+    # Mensagem posterior à leitura: o mark_read da leitura anterior não a esconde
+    enviar(banco, "alice", "bob", "m2", 2000_002)
+    assert banco.process_request({"action": "mark_read", "username": "bob", "peer": "alice",
+                                  "hlc": read["hlc"]})["unread"] == 3
+    read = banco.process_request({"action": "get_private_messages", "remetente": "bob", "destinatario": "alice"})
+    banco.process_request({"action": "mark_read", "username": "bob", "peer": "alice", "hlc": read["hlc"]})
+    assert nao_lidas() == 0
+    assert banco.process_request({"action": "mark_read", "username": "bob", "peer": "carol"})["ret"] == \
+        ReturnCodes.ERROR_USER_NOT_FOUND
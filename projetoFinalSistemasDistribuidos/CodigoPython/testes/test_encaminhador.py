@@ -0,0 +1,36 @@
+# Testes da distribuição de notificações por shards (encaminhadores XSUB/XPUB)
+import time
+import zlib
+
+import zmq
+
+import Configuracao
+import Encaminhador
+
+
+def test_shard_estavel_pelo_crc32():
+    topics = [f"notificacao_user_{user_id}" for user_id in range(1, 201)]
+    shards = [Configuracao.notification_shard(topic) for topic in topics]
+    # O mesmo cálculo é feito pelos clientes C e Java: não pode depender do processo (como hash())
+    assert shards == [zlib.crc32(topic.encode()) % Configuracao.NOTIFICATION_SHARDS for topic in topics]
+    assert set(shards) == set(range(Configuracao.NOTIFICATION_SHARDS))
+
+
+def test_encaminhador_entrega_so_o_topico_assinado():
+    context = zmq.Context()
+    addresses = Configuracao.endpoints(internal="inproc", external="inproc")
+    shard = Configuracao.notification_shard("notificacao_user_1")
+    publisher = context.socket(zmq.PUB)
+    publisher.bind(Configuracao.bind_address("shard_internal", addresses, shard=shard))
+    Encaminhador.start([shard], context, addresses)
+    time.sleep(0.1)
+    subscriber = context.socket(zmq.SUB)
+    subscriber.setsockopt(zmq.RCVTIMEO, 2000)
+    subscriber.connect(Configuracao.notification_endpoint("notificacao_user_1", addresses))
+    # O espaço delimita o tópico: o usuário 1 não recebe as notificações dos usuários 10 a 19
+    subscriber.setsockopt_string(zmq.SUBSCRIBE, "notificacao_user_1 ")
+    time.sleep(0.2)  # Assinaturas propagadas pelo encaminhador
+    publisher.send_string("notificacao_user_10 para o 10")
+    publisher.send_string("notificacao_user_1 para o 1")
+    assert subscriber.recv_string() == "notificacao_user_1 para o 1"
+    assert not subscriber.poll(100)
@@ -0,0 +1,42 @@
+# Testes da busca textual: índice invertido e ação search_posts do banco
+import Indice
+import Relogio
+import ReturnCodes
+
+
+def test_termos_normalizados_e_prefixo():
+    index = Indice.IndiceInvertido()
+    index.add(1, "Notificação do líder")
+    index.add(2, "notificacoes atrasadas")
+    index.add(3, "o lider caiu")
+    assert index.search("NOTIFICACAO") == {1}
+    assert index.search("notific*") == {1, 2}
+    assert index.search("lider notific*") == {1}  # Todos os termos devem aparecer
+    assert index.search("servidor") == set()
+    assert index.search("!!") is None
+    assert index.terms == sorted(index.postings)
+
+
+def postar(banco, user_id, username, text, physical_ms):
+    return banco.process_request({"action": "add_post", "post": {
+        "id": user_id, "username": username, "texto": text, "tempoEnvioMensagem": "2026-01-01T00:00:00",
+        "hlc": Relogio.encode_hlc(physical_ms, 0), "server_id": 1}})
+
+
+def test_busca_no_banco_com_autor_e_paginas(banco):
+    for username in ("alice", "bob"):
+        banco.process_request({"action": "add_user", "username": username})
+    for i in range(7):
+        postar(banco, 1, "alice", f"relógio {i}", 1000_000 + 2 * i)
+        postar(banco, 2, "bob", f"relogio {i}", 1000_000 + 2 * i + 1)
+
+    reply = banco.process_request({"action": "search_posts", "query": "relogio", "author": "ALICE", "limit": 5})
+    assert reply["total"] == 7 and reply["has_more"]
+    assert [post["texto"] for post in reply["posts"]] == [f"relógio {i}" for i in range(6, 1, -1)]
+    reply = banco.process_request({"action": "search_posts", "query": "relogio", "author": "alice",
+                                   "offset": reply["next_offset"], "limit": 5})
+    assert [post["texto"] for post in reply["posts"]] == ["relógio 1", "relógio 0"] and not reply["has_more"]
+    # Período pelo tempo físico do HLC (segundos)
+    reply = banco.process_request({"action": "search_posts", "query": "rel*", "since": 1000.010})
+    assert reply["total"] == 4
+    assert banco.process_request({"action": "search_posts", "query": ""})["ret"] == ReturnCodes.ERROR_INVALID_PARAMETER
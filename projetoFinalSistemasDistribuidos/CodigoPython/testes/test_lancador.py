@@ -0,0 +1,40 @@
+# Teste do modo de processo único: todos os componentes em threads, com os canais em inproc
+import json
+import time
+
+import zmq
+
+import Configuracao
+import Lancador
+import ReturnCodes
+
+
+def test_sistema_completo_em_um_processo(tmp_path, monkeypatch):
+    (tmp_path / "run").mkdir()
+    monkeypatch.chdir(tmp_path / "run")  # O armazenamento do banco fica em ../armazenamento
+    context = zmq.Context()
+    context, addresses, servers = Lancador.start(servers=2, internal="inproc", external="inproc", context=context)
+    assert len(servers) == 2
+    client = context.socket(zmq.REQ)
+    client.setsockopt(zmq.RCVTIMEO, 5000)
+    client.connect(Configuracao.connect_address("frontend", addresses))
+
+    def request(package):
+        client.send_json(package)
+        return json.loads(client.recv())
+
+    alice = request({"action": "add_user", "username": "alice"})
+    bob = request({"action": "add_user", "username": "bob"})
+    assert alice["ret"] == bob["ret"] == ReturnCodes.SUCCESS
+    notifications = context.socket(zmq.SUB)
+    notifications.setsockopt(zmq.RCVTIMEO, 5000)
+    notifications.connect(Configuracao.notification_endpoint(alice["topic"], addresses))
+    notifications.setsockopt_string(zmq.SUBSCRIBE, f"{alice['topic']} ")
+    time.sleep(0.2)
+
+    assert request({"action": "add_follower", "id": alice["id"], "to_follow": "bob"})["ret"] == ReturnCodes.SUCCESS
+    assert request({"action": "post_text", "id": bob["id"], "username": "bob", "texto": "oi",
+                    "tempoEnvioMensagem": "2026-01-01T00:00:00"})["ret"] == ReturnCodes.SUCCESS
+    assert [post["texto"] for post in request({"action": "get_timeline", "username": "alice"})] == ["oi"]
+    # A notificação do post chega ao seguidor pelo encaminhador do shard, também em inproc
+    assert notifications.recv_string().startswith(f"{alice['topic']} ")
@@ -0,0 +1,48 @@
+# Testes da liderança por concessão (proxy) e da visão local de membros (servidores)
+import importlib.util
+import os
+
+import pytest
+
+from conftest import CODIGO
+
+
+@pytest.fixture
+def proxy():
+    # Instância nova do módulo: o estado da liderança é global no módulo Proxy
+    spec = importlib.util.spec_from_file_location("Proxy_lideranca", os.path.join(CODIGO, "Proxy.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_lider_mantem_o_cargo_enquanto_a_concessao_vale(proxy):
+    proxy.server_registry.update({"1": {}, "2": {}})
+    assert proxy.refresh_leadership(100.0)
+    assert proxy.leader_id == 2
+    # Um servidor de id maior entra: sem eleição até a concessão do líder atual expirar
+    proxy.server_registry["3"] = {}
+    assert not proxy.refresh_leadership(100.0 + proxy.LEADER_LEASE - 0.1)
+    assert proxy.leader_id == 2
+    assert proxy.refresh_leadership(100.0 + proxy.LEADER_LEASE)
+    assert proxy.leader_id == 3
+
+
+def test_sem_servidores_nao_ha_lider(proxy):
+    proxy.refresh_leadership(100.0)
+    assert proxy.leader_id is None
+    assert proxy.membership_snapshot(100.0)["lease_remaining"] == 0.0
+
+
+def test_servidor_ignora_visao_antiga_e_concessao_vencida(servidor, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(servidor.time, "time", lambda: now[0])
+    servidor.server_id = 2
+    servidor.apply_membership({"version": 5, "servers": ["1", "2"], "leader_id": 2, "lease_remaining": 6.0})
+    assert servidor.is_leader()
+    # Snapshot atrasado (versão anterior) não troca o líder
+    servidor.apply_membership({"version": 4, "servers": ["1"], "leader_id": 1, "lease_remaining": 6.0})
+    assert servidor.leader_id == 2
+    # Sem renovação, o servidor deixa de se considerar líder quando a concessão acaba
+    now[0] += 6.0
+    assert not servidor.is_leader()
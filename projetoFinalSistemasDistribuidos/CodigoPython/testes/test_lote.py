@@ -0,0 +1,48 @@
+# Testes da ação "batch": um item inválido ou com erro não derruba os demais
+import json
+
+import ReturnCodes
+import Servidor
+
+
+def test_lote_no_banco_isola_itens_invalidos(banco):
+    banco.process_request({"action": "add_user", "username": "alice"})
+    reply = banco.process_request({"action": "batch", "requests": [
+        "não é uma ação",
+        {"action": "batch", "requests": []},
+        {"action": "get_user_id", "username": "alice"},
+        {"action": "get_posts", "format": "list"},
+        {"action": "get_followers"},  # Falta o id: erro só neste item
+        {"action": "get_user_id", "username": "ALICE"},
+    ]})
+    assert reply["ret"] == ReturnCodes.SUCCESS
+    results = reply["results"]
+    assert results[0]["ret"] == ReturnCodes.ERROR_INVALID_PARAMETER
+    assert results[1]["ret"] == ReturnCodes.ERROR_INVALID_PARAMETER
+    assert results[2] == {"ret": ReturnCodes.SUCCESS, "id": 1}
+    assert results[3] == {"ret": ReturnCodes.SUCCESS, "posts": []}
+    assert results[4]["ret"] == ReturnCodes.ERROR_GENERAL
+    assert results[5] == {"ret": ReturnCodes.SUCCESS, "id": 1}
+
+
+def test_lote_no_banco_exige_lista(banco):
+    assert banco.process_request({"action": "batch", "requests": "x"})["ret"] == ReturnCodes.ERROR_INVALID_PARAMETER
+
+
+def test_lote_no_servidor_isola_itens_invalidos(monkeypatch):
+    def dispatch(item):
+        if item["action"] == "falha":
+            raise RuntimeError("banco indisponível")
+        if item["action"] == "get_timeline":
+            return json.dumps([{"texto": "oi"}]).encode()
+        return json.dumps({"ret": ReturnCodes.SUCCESS, "msg": item["action"]}).encode()
+
+    monkeypatch.setattr(Servidor, "dispatch", dispatch)
+    results = json.loads(Servidor.handle_batch({"action": "batch", "requests": [
+        42, {"action": "batch"}, {"action": "falha"}, {"action": "get_timeline"}, {"action": "post_text"}]}))["results"]
+    assert [result["ret"] for result in results] == [ReturnCodes.ERROR_INVALID_PARAMETER,
+                                                     ReturnCodes.ERROR_INVALID_PARAMETER,
+                                                     ReturnCodes.ERROR_GENERAL,
+                                                     ReturnCodes.SUCCESS, ReturnCodes.SUCCESS]
+    assert results[3]["posts"] == [{"texto": "oi"}]
+    assert results[4]["msg"] == "post_text"
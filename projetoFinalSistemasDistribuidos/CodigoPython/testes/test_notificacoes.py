@@ -0,0 +1,41 @@
+# Testes da caixa durável de notificações e da recuperação do que foi perdido offline
+import ReturnCodes
+
+
+def test_cliente_offline_recupera_a_partir_da_ultima_sequencia(banco):
+    for username in ("alice", "bob", "carol"):
+        banco.process_request({"action": "add_user", "username": username})
+    reply = banco.process_request({"action": "add_notifications", "users": [2, 3], "msg": "post 1", "timestamp": 1})
+    assert reply["seqs"] == {2: 1, 3: 1}
+    banco.process_request({"action": "add_notifications", "users": [2], "msg": "post 2", "timestamp": 2})
+    banco.process_request({"action": "add_notifications", "users": [2, 99], "msg": "post 3", "timestamp": 3})
+
+    first = banco.process_request({"action": "get_notifications", "id": 2, "limit": 2})
+    assert [n["msg"] for n in first["notifications"]] == ["post 1", "post 2"]
+    assert first["has_more"] and not first["truncated"]
+    rest = banco.process_request({"action": "get_notifications", "id": 2, "since": first["last_seq"]})
+    assert [n["seq"] for n in rest["notifications"]] == [3] and not rest["has_more"]
+    # Sem novidades: a sequência informada volta como a última vista
+    empty = banco.process_request({"action": "get_notifications", "id": 2, "since": rest["last_seq"]})
+    assert empty["notifications"] == [] and empty["last_seq"] == 3
+
+
+def test_caixa_cheia_indica_notificacoes_perdidas(banco):
+    banco.process_request({"action": "add_user", "username": "alice"})
+    for i in range(banco.NOTIFICATION_INBOX_SIZE + 5):
+        banco.process_request({"action": "add_notifications", "users": [1], "msg": f"n{i}", "timestamp": i})
+    reply = banco.process_request({"action": "get_notifications", "id": 1, "since": 0})
+    assert reply["truncated"]
+    assert reply["notifications"][0]["seq"] == 6
+    assert banco.process_request({"action": "get_notifications", "id": 42})["ret"] == \
+        ReturnCodes.ERROR_USER_NOT_FOUND
+
+
+def test_get_notifications_limita_a_pagina(banco):
+    banco.process_request({"action": "add_user", "username": "alice"})
+    banco.process_request({"action": "add_notifications", "users": [1] * 3, "msg": "oi", "timestamp": 0})
+    for limit in (-5, 0):
+        reply = banco.process_request({"action": "get_notifications", "id": 1, "limit": limit})
+        assert len(reply["notifications"]) == 1 and reply["has_more"]
+    reply = banco.process_request({"action": "get_notifications", "id": 1, "limit": 10 ** 9})
+    assert len(reply["notifications"]) == 3
@@ -0,0 +1,58 @@
+# Testes do perfilador sob demanda e do seu socket administrativo
+import threading
+import time
+import tracemalloc
+
+import zmq
+
+import Perfilador
+
+
+def esperar_idle(perfilador, limite=5):
+    fim = time.time() + limite
+    while perfilador.state != "idle" and time.time() < fim:
+        time.sleep(0.01)
+    assert perfilador.state == "idle"
+
+
+def test_janelas_sobrepostas_nao_desligam_o_tracemalloc_da_outra(tmp_path):
+    a = Perfilador.Perfilador("a")
+    b = Perfilador.Perfilador("b")
+    assert a.start(0.05, str(tmp_path / "a.txt"))["status"] == "ok"
+    assert b.start(1, str(tmp_path / "b.txt"))["status"] == "ok"
+    esperar_idle(a)
+    # A janela de "a" terminou, mas a de "b" continua aberta e ainda precisa do rastreamento
+    assert tracemalloc.is_tracing()
+    esperar_idle(b)
+    assert not tracemalloc.is_tracing()
+    assert (tmp_path / "a.txt").exists() and (tmp_path / "b.txt").exists()
+
+
+def test_nao_desliga_tracemalloc_ligado_por_terceiros(tmp_path):
+    tracemalloc.start()
+    try:
+        perfilador = Perfilador.Perfilador("c")
+        perfilador.start(0.05, str(tmp_path / "c.txt"))
+        esperar_idle(perfilador)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_admin_loop_responde_uma_vez_por_pedido():
+    context = zmq.Context()
+    rep = context.socket(zmq.REP)
+    rep.bind("inproc://admin-teste")
+    threading.Thread(target=Perfilador.admin_loop, args=(rep, Perfilador.Perfilador("d")), daemon=True).start()
+    req = context.socket(zmq.REQ)
+    req.setsockopt(zmq.RCVTIMEO, 2000)
+    req.connect("inproc://admin-teste")
+
+    req.send(b"nao e json")
+    assert req.recv_json()["status"] == "error"
+    req.send_json({"action": "desconhecida"})
+    assert req.recv_json() == {"status": "error", "msg": "Ação desconhecida"}
+    # O socket continua atendendo normalmente depois dos erros
+    req.send_json({"action": "profile_status"})
+    assert req.recv_json()["status"] == "idle"
+    req.close(0)
@@ -0,0 +1,42 @@
+# Testes do índice de posts por autor: perfil e timeline dos seguidos, paginados por cursor
+import Relogio
+import ReturnCodes
+
+
+def postar(banco, user_id, username, physical_ms):
+    banco.process_request({"action": "add_post", "post": {
+        "id": user_id, "username": username, "texto": f"{username} {physical_ms}",
+        "tempoEnvioMensagem": "2026-01-01T00:00:00", "hlc": Relogio.encode_hlc(physical_ms, 0), "server_id": 1}})
+
+
+def paginas(banco, request):
+    pages = []
+    while True:
+        reply = banco.process_request(request)
+        pages.append([post["texto"] for post in reply["posts"]])
+        if not reply["has_more"]:
+            return pages
+        request = dict(request, cursor=reply["next_cursor"])
+
+
+def test_perfil_paginado_do_mais_recente(banco):
+    for username in ("alice", "bob"):
+        banco.process_request({"action": "add_user", "username": username})
+    for i in range(5):
+        postar(banco, 1, "alice", 1000 + 2 * i)
+        postar(banco, 2, "bob", 1001 + 2 * i)
+    assert paginas(banco, {"action": "get_user_posts", "id": 1, "limit": 2}) == [
+        ["alice 1008", "alice 1006"], ["alice 1004", "alice 1002"], ["alice 1000"]]
+    assert banco.process_request({"action": "get_user_posts", "id": 9})["ret"] == ReturnCodes.ERROR_USER_NOT_FOUND
+
+
+def test_timeline_dos_seguidos_intercala_autores(banco):
+    for username in ("alice", "bob", "carol"):
+        banco.process_request({"action": "add_user", "username": username})
+    banco.process_request({"action": "add_follower", "id": 1, "to_follow": "bob"})
+    for i in range(3):
+        postar(banco, 1, "alice", 1000 + 3 * i)
+        postar(banco, 2, "bob", 1001 + 3 * i)
+        postar(banco, 3, "carol", 1002 + 3 * i)  # Não seguida: fica de fora
+    assert paginas(banco, {"action": "get_home_timeline", "id": 1, "limit": 4}) == [
+        ["bob 1007", "alice 1006", "bob 1004", "alice 1003"], ["bob 1001", "alice 1000"]]
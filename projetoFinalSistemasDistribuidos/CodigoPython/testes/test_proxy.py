@@ -0,0 +1,188 @@
+# Testes do roteamento do proxy: reenvio de leituras sem resposta, hedge e notificações legadas
+import importlib.util
+import json
+import os
+import threading
+import time
+
+import pytest
+import zmq
+
+import Configuracao
+import ReturnCodes
+from conftest import CODIGO
+
+
+class ServidorFalso:
+    """
+    DEALER com a identidade de um servidor registrado: responde cada requisição ecoando o seu id,
+    a não ser que esteja travado (silent), quando guarda as requisições sem responder.
+    """
+
+    def __init__(self, context, addresses, server_id):
+        self.server_id = server_id
+        self.silent = False
+        self.received = 0
+        self.socket = context.socket(zmq.DEALER)
+        self.socket.setsockopt(zmq.IDENTITY, str(server_id).encode())
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(Configuracao.connect_address("backend", addresses))
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stop.is_set():
+            if not self.socket.poll(50):
+                continue
+            # [identificador do envio, envelope do cliente..., pacote, instante do envio]
+            frames = self.socket.recv_multipart()
+            self.received += 1
+            if self.silent:
+                continue
+            response = json.dumps({"ret": ReturnCodes.SUCCESS, "server_id": self.server_id}).encode()
+            self.socket.send_multipart(frames[:-2] + [response])
+
+    def close(self):
+        self.stop.set()
+        self.thread.join(1)
+        self.socket.close()
+
+
+@pytest.fixture
+def proxy():
+    """
+    Instância nova do módulo Proxy (o estado é global no módulo) em um contexto próprio, com todos
+    os canais inproc. Retorna uma função que inicia o proxy com os parâmetros de start() e registra
+    servidores falsos com os ids informados.
+    """
+    context = zmq.Context()
+    addresses = Configuracao.endpoints(internal="inproc", external="inproc")
+    spec = importlib.util.spec_from_file_location("Proxy_teste", os.path.join(CODIGO, "Proxy.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.HEARTBEAT_TIMEOUT = 1000  # Os servidores falsos não enviam heartbeats
+    servers = []
+
+    def start(server_ids=(), **options):
+        module.start(context, addresses, **options)
+        threading.Thread(target=module.serve, daemon=True).start()
+        for server_id in server_ids:
+            servers.append(ServidorFalso(context, addresses, server_id))
+            with module.lock:
+                module.server_registry[str(server_id)] = {"id": server_id, "pid": None, "draining": False}
+                module.last_heartbeat[str(server_id)] = time.time()
+        time.sleep(0.1)  # Conexões inproc dos servidores ao backend
+        return module, context, addresses, servers
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def cliente(context, addresses):
+    client = context.socket(zmq.DEALER)
+    client.setsockopt(zmq.LINGER, 0)
+    client.setsockopt(zmq.RCVTIMEO, 3000)
+    client.connect(Configuracao.connect_address("frontend", addresses))
+    return client
+
+
+def pedir(client, action):
+    started = time.time()
+    client.send_json({"action": action, "username": "alice"})
+    return client.recv_json(), time.time() - started
+
+
+def test_leitura_sem_resposta_e_reenviada_a_outro_servidor(proxy):
+    module, context, addresses, (travado, _) = proxy([1, 2])
+    module.IN_FLIGHT_TIMEOUT = 0.3
+    travado.silent = True
+    client = cliente(context, addresses)
+    # O primeiro envio vai ao servidor 1 (empate de carga); sem resposta, a leitura segue ao 2
+    response, elapsed = pedir(client, "get_timeline")
+    assert response == {"ret": ReturnCodes.SUCCESS, "server_id": 2}
+    assert elapsed >= 0.3
+    client.close()
+
+
+def test_escrita_sem_resposta_recebe_timeout(proxy):
+    module, context, addresses, (travado, _) = proxy([1, 2])
+    module.IN_FLIGHT_TIMEOUT = 0.3
+    travado.silent = True
+    client = cliente(context, addresses)
+    # Escritas não são reenviadas (poderiam ser aplicadas duas vezes)
+    response, _ = pedir(client, "post_text")
+    assert response["ret"] == ReturnCodes.ERROR_TIMEOUT
+    assert travado.received == 1
+    client.close()
+
+
+def test_hedge_responde_antes_do_timeout(proxy):
+    module, context, addresses, (lento, _) = proxy([1, 2], hedge=True)
+    module.HEDGE_MIN_SAMPLES = 1
+    client = cliente(context, addresses)
+    assert pedir(client, "get_timeline")[0]["server_id"] == 1
+    time.sleep(1.2)  # Limpeza periódica: o atraso do hedge é calculado a partir da leitura acima
+    lento.silent = True
+    response, elapsed = pedir(client, "get_timeline")
+    # A cópia enviada ao servidor 2 responde; o cliente não espera o IN_FLIGHT_TIMEOUT do servidor 1
+    assert response == {"ret": ReturnCodes.SUCCESS, "server_id": 2}
+    assert elapsed < module.IN_FLIGHT_TIMEOUT / 2
+    client.close()
+
+
+def test_hedge_desligado_nao_duplica_leituras(proxy):
+    module, context, addresses, (lento, rapido) = proxy([1, 2])
+    module.HEDGE_MIN_SAMPLES = 1
+    module.IN_FLIGHT_TIMEOUT = 0.5
+    client = cliente(context, addresses)
+    pedir(client, "get_timeline")
+    time.sleep(1.2)
+    lento.silent = True
+    # Sem hedge, a leitura só chega ao servidor 2 pelo reenvio após o timeout
+    response, elapsed = pedir(client, "get_timeline")
+    assert response["server_id"] == 2 and elapsed >= 0.5
+    assert rapido.received == 1
+    client.close()
+
+
+def notificacoes_recebidas(context, addresses):
+    topic = "notificacao_user_7"
+    subscribers = []
+    for address in (Configuracao.connect_address("notifications", addresses),
+                    Configuracao.connect_address("shard_internal", addresses,
+                                                 shard=Configuracao.notification_shard(topic))):
+        subscriber = context.socket(zmq.SUB)
+        subscriber.setsockopt(zmq.LINGER, 0)
+        subscriber.setsockopt_string(zmq.SUBSCRIBE, f"{topic} ")
+        subscriber.connect(address)
+        subscribers.append(subscriber)
+    time.sleep(0.2)  # Assinaturas propagadas aos PUBs
+    control = context.socket(zmq.REQ)
+    control.setsockopt(zmq.LINGER, 0)
+    control.connect(Configuracao.connect_address("control", addresses))
+    control.send_json({"action": "notify_users", "post_owner": "bob", "users_to_notify": {"7": topic}, "msg": "oi"})
+    assert control.recv_json()["status"] == "ok"
+    time.sleep(0.2)
+    counts = []
+    for subscriber in subscribers:
+        count = 0
+        while subscriber.poll(0):
+            subscriber.recv_string()
+            count += 1
+        counts.append(count)
+        subscriber.close()
+    control.close()
+    return counts
+
+
+def test_notificacao_sem_porta_legada_sai_uma_vez(proxy):
+    module, context, addresses, _ = proxy()
+    assert module.notification_pub is None
+    assert notificacoes_recebidas(context, addresses) == [0, 1]
+
+
+def test_notificacao_com_porta_legada(proxy):
+    module, context, addresses, _ = proxy(legacy_notifications=True)
+    assert notificacoes_recebidas(context, addresses) == [1, 1]
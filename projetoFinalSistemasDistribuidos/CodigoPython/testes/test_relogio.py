@@ -0,0 +1,103 @@
+# Testes do relógio local (drift e correção por slewing) e do relógio lógico híbrido (HLC)
+import pytest
+
+import Relogio
+
+
+@pytest.fixture
+def agora(monkeypatch):
+    """
+    Tempo real controlado pelo teste: agora[0] é o valor devolvido por time.time().
+    """
+    now = [1000.0]
+    monkeypatch.setattr(Relogio.time, "time", lambda: now[0])
+    return now
+
+
+def test_slewing_corrige_o_offset_sem_saltos(agora):
+    clock = Relogio.RelogioLocal()
+    duration = clock.adjust(0.5)
+    assert duration == pytest.approx(0.5 / Relogio.MAX_SLEW_RATE)
+    agora[0] += duration / 2
+    assert clock.read() == pytest.approx(agora[0] + 0.25)
+    agora[0] += duration
+    assert clock.read() == pytest.approx(agora[0] + 0.5)
+
+
+def test_offset_negativo_desacelera_sem_voltar_no_tempo(agora):
+    clock = Relogio.RelogioLocal()
+    clock.set_drift_rate(-1.0)  # Limitado: com o slewing, o relógio ainda anda à velocidade mínima
+    clock.adjust(-10.0)
+    readings = []
+    for _ in range(200):
+        agora[0] += 0.5
+        readings.append(clock.read())
+    assert all(later - earlier >= 0.5 * Relogio.MIN_CLOCK_RATE - 1e-9
+               for earlier, later in zip(readings, readings[1:]))
+
+
+class RelogioFixo:
+    """
+    Relógio físico controlado pelo teste (segundos).
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def read(self):
+        return self.seconds
+
+
+def test_now_estritamente_crescente():
+    hlc = Relogio.RelogioHibrido(RelogioFixo(1000.0))
+    values = [hlc.now() for _ in range(1000)]
+    assert values == sorted(set(values))
+
+
+def test_update_fica_apos_valor_remoto():
+    hlc = Relogio.RelogioHibrido(RelogioFixo(1000.0))
+    remote = Relogio.encode_hlc(1000_500, 7)
+    merged = hlc.update(remote)
+    assert merged > remote
+    assert hlc.now() > merged
+
+
+def test_update_com_remoto_atrasado_segue_relogio_local():
+    hlc = Relogio.RelogioHibrido(RelogioFixo(1000.0))
+    assert Relogio.decode_hlc(hlc.update(Relogio.encode_hlc(900_000, 3))) == (1000_000, 0)
+
+
+def test_update_recusa_valor_alem_do_limite():
+    clock = RelogioFixo(1000.0)
+    hlc = Relogio.RelogioHibrido(clock)
+    before = hlc.now()
+    with pytest.raises(Relogio.HLCForaDoLimite):
+        hlc.update((10 ** 14) << Relogio.HLC_COUNTER_BITS)
+    with pytest.raises(Relogio.HLCForaDoLimite):
+        hlc.update(Relogio.encode_hlc(1000_000 + Relogio.MAX_HLC_OFFSET_MS + 1, 0))
+    # O relógio não foi alterado pelas tentativas recusadas
+    assert Relogio.decode_hlc(hlc.now()) == (1000_000, Relogio.decode_hlc(before)[1] + 1)
+    # Dentro do limite, o valor é aceito
+    assert hlc.update(Relogio.encode_hlc(1000_000 + Relogio.MAX_HLC_OFFSET_MS, 0)) > before
+
+
+def test_update_com_contador_esgotado_avanca_tempo_fisico():
+    hlc = Relogio.RelogioHibrido(RelogioFixo(1000.0))
+    remote = Relogio.encode_hlc(1000_001, Relogio.HLC_MAX_COUNTER)
+    merged = hlc.update(remote)
+    assert merged > remote
+    assert Relogio.decode_hlc(merged) == (1000_002, 0)
+
+
+def test_now_com_contador_esgotado_avanca_tempo_fisico():
+    hlc = Relogio.RelogioHibrido(RelogioFixo(1000.0))
+    values = [hlc.now() for _ in range(Relogio.HLC_MAX_COUNTER + 3)]
+    assert values == sorted(set(values))
+    assert Relogio.decode_hlc(values[-1]) == (1000_001, 1)
+
+
+def test_encode_recusa_contador_fora_do_intervalo():
+    with pytest.raises(ValueError):
+        Relogio.encode_hlc(1, Relogio.HLC_MAX_COUNTER + 1)
+    with pytest.raises(ValueError):
+        Relogio.encode_hlc(1, -1)
@@ -0,0 +1,47 @@
+# Testes do repasse das respostas grandes sem cópia nem recodificação
+import json
+import threading
+
+import zmq
+
+import ClienteBanco
+import Compressao
+
+
+def test_resposta_crua_e_o_proprio_frame_recebido():
+    context = zmq.Context()
+    router = context.socket(zmq.ROUTER)
+    router.bind("inproc://banco-sem-copia")
+    timeline = json.dumps([{"texto": f"post {i}"} for i in range(2000)]).encode()
+
+    def banco_falso():
+        for _ in range(2):
+            identity, request_id, payload = router.recv_multipart()
+            reply = timeline if json.loads(payload)["action"] == "get_posts" else b'{"ret": 0}'
+            router.send_multipart([identity, request_id, reply])
+
+    threading.Thread(target=banco_falso, daemon=True).start()
+    client = ClienteBanco.ClienteBanco(context, ["inproc://banco-sem-copia"], timeout=2)
+    raw = client.call({"action": "get_posts", "format": "list"}, raw=True)
+    assert isinstance(raw, memoryview) and raw == timeline
+    assert client.call({"action": "get_user_id"}) == {"ret": 0}
+
+
+def test_descompressao_de_memoryview():
+    payload = json.dumps([{"texto": "post repetido"}] * 200).encode()
+    compressed = memoryview(Compressao.encode(payload, "zlib"))
+    assert Compressao.is_compressed(compressed)
+    assert Compressao.decode(compressed) == payload
+    assert Compressao.decode(memoryview(payload)) == payload
+
+
+def test_timeline_no_formato_legado_sem_envelope(banco):
+    banco.process_request({"action": "add_user", "username": "alice"})
+    banco.process_request({"action": "add_post", "post": {
+        "id": 1, "username": "alice", "texto": "oi", "tempoEnvioMensagem": "2026-01-01T00:00:00",
+        "hlc": 1 << 16, "server_id": 1}})
+    assert [post["texto"] for post in banco.process_request({"action": "get_posts", "format": "list"})] == ["oi"]
+    assert banco.process_request({"action": "get_posts"})["ret"] == 0
+    # Em lote, a lista pura volta embrulhada com o código de retorno
+    reply = banco.process_request({"action": "batch", "requests": [{"action": "get_posts", "format": "list"}]})
+    assert [post["texto"] for post in reply["results"][0]["posts"]] == ["oi"]
@@ -0,0 +1,26 @@
+# Testes da timeline global do servidor: a resposta legada é completa; só a página pedida é truncada
+import json
+
+import Relogio
+
+
+def postar(banco, count):
+    banco.process_request({"action": "add_user", "username": "alice"})
+    for i in range(count):
+        banco.process_request({"action": "add_post", "post": {
+            "id": 1, "username": "alice", "texto": f"post {i}", "tempoEnvioMensagem": "2026-01-01T00:00:00",
+            "hlc": Relogio.encode_hlc(1000_000 + i, 0), "server_id": 1}})
+
+
+def test_timeline_legada_nao_e_truncada(servidor, banco):
+    postar(banco, 1200)
+    posts = json.loads(servidor.handle_send_posts({"action": "get_timeline"}))
+    assert len(posts) == 1200
+
+
+def test_timeline_com_limite_traz_os_mais_recentes(servidor, banco):
+    postar(banco, 30)
+    page = json.loads(servidor.handle_send_posts({"action": "get_timeline", "limit": 5}))
+    assert [post["texto"] for post in page] == [f"post {i}" for i in range(25, 30)]
+    # Limites diferentes não compartilham a resposta em cache
+    assert len(json.loads(servidor.handle_send_posts({"action": "get_timeline"}))) == 30
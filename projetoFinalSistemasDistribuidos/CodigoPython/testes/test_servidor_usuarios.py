@@ -0,0 +1,58 @@
+# Testes do filtro de usernames dos servidores: uma recusa pelo filtro só vale com o filtro em dia com o banco
+import json
+
+import pytest
+
+import ReturnCodes
+
+
+@pytest.fixture
+def servidor(servidor, banco):
+    banco.process_request({"action": "add_user", "username": "alice"})
+    servidor.load_username_filter()
+    servidor.database_client.actions.clear()
+    return servidor
+
+
+def test_username_fora_do_filtro_recusado_sem_consultar_o_id(servidor):
+    servidor.username_filter_checked = 0.0  # Conferência vencida: a primeira recusa confere a versão
+    assert servidor.lookup_user_id("bob") == -1
+    assert servidor.database_client.actions == ["get_username_count"]
+    # Dentro do intervalo, a versão conferida vale para as próximas recusas
+    assert servidor.lookup_user_id("carol") == -1
+    assert servidor.database_client.actions == ["get_username_count"]
+
+
+def test_cadastro_com_evento_perdido_e_encontrado(servidor, banco):
+    # O cadastro acontece no banco, mas o evento nunca chega a este servidor
+    bob_id = banco.process_request({"action": "add_user", "username": "bob"})["id"]
+    assert "bob" not in servidor.username_filter
+    servidor.username_filter_checked = 0.0
+    assert servidor.lookup_user_id("BOB") == bob_id
+    assert servidor.database_client.actions == ["get_username_count", "get_username_filter", "get_user_id"]
+    assert "bob" in servidor.username_filter
+
+
+def test_id_em_cache_descartado_quando_o_filtro_esta_defasado(servidor, banco):
+    servidor.user_id_cache.put("bob", -1)  # Consulta anterior ao cadastro, cuja invalidação se perdeu
+    bob_id = banco.process_request({"action": "add_user", "username": "bob"})["id"]
+    servidor.username_filter_checked = 0.0
+    assert servidor.username_may_exist("dave") is False
+    assert servidor.lookup_user_id("bob") == bob_id
+
+
+def test_sem_conferir_a_versao_a_consulta_vai_ao_banco(servidor, banco):
+    bob_id = banco.process_request({"action": "add_user", "username": "bob"})["id"]
+    servidor.database_client.failing.add("get_username_count")
+    servidor.username_filter_checked = 0.0
+    assert servidor.lookup_user_id("bob") == bob_id
+    assert servidor.database_client.actions == ["get_username_count", "get_user_id"]
+
+
+def test_cadastro_duplicado_decidido_pelo_banco(servidor):
+    servidor.user_id_cache.put("alice", 1)
+    response = json.loads(servidor.handle_sign_up({"action": "add_user", "username": "Alice"}))
+    assert response["ret"] == ReturnCodes.ERROR_USERNAME_TAKEN
+    assert servidor.database_client.actions == ["add_user"]
+    response = json.loads(servidor.handle_sign_up({"action": "add_user", "username": "carol"}))
+    assert response["ret"] == ReturnCodes.SUCCESS
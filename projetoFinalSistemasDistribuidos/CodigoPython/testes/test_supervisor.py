@@ -0,0 +1,57 @@
+# Testes das decisões de escala do supervisor, a partir das estatísticas do proxy
+import pytest
+
+import Supervisor
+
+
+@pytest.fixture
+def supervisor(monkeypatch):
+    supervisor = Supervisor.Supervisor(None, min_servers=1, max_servers=4)
+    supervisor.started = []
+    supervisor.stopped = []
+    monkeypatch.setattr(supervisor, "start_worker", lambda: supervisor.started.append(True))
+    monkeypatch.setattr(supervisor, "stop_worker", supervisor.stopped.append)
+    return supervisor
+
+
+def amostras(supervisor, outstanding, p95=0.01, saturated=0):
+    for _ in range(Supervisor.DECISION_WINDOW):
+        supervisor.samples.append({"outstanding": outstanding, "p95": p95, "saturated": saturated})
+
+
+def test_sobe_servidor_por_fila_latencia_ou_rejeicoes(supervisor):
+    assert supervisor.decide(2)[0] == 0  # Janela incompleta
+    amostras(supervisor, outstanding=2 * Supervisor.SCALE_UP_QUEUE + 1)
+    assert supervisor.decide(2)[0] == 1
+    amostras(supervisor, outstanding=1, p95=Supervisor.LATENCY_TARGET * 2)
+    assert supervisor.decide(2)[0] == 1
+    amostras(supervisor, outstanding=1, saturated=1)
+    assert supervisor.decide(2)[0] == 1
+    supervisor.last_change = Supervisor.time.time()  # Dentro do cooldown, nenhuma mudança
+    assert supervisor.decide(2)[0] == 0
+
+
+def test_drena_servidor_ocioso_mas_nunca_o_ultimo(supervisor):
+    amostras(supervisor, outstanding=0)
+    assert supervisor.decide(2)[0] == -1
+    assert supervisor.decide(1)[0] == 0
+
+
+class ProcessoFalso:
+    def __init__(self, pid):
+        self.pid = pid
+
+    def poll(self):
+        return None
+
+
+def test_drenagem_prefere_quem_nao_e_lider(supervisor, monkeypatch):
+    servers = {str(sid): {"pid": 100 + sid, "draining": False, "in_flight": 0} for sid in (1, 2, 3)}
+    supervisor.workers = [{"process": ProcessoFalso(100 + sid), "core": 0, "started": sid, "server_id": None}
+                          for sid in (1, 2, 3)]
+    monkeypatch.setattr(supervisor, "control",
+                        lambda command: {"servers": servers, "outstanding": 0, "leader_id": 3, "p95": 0.01})
+    for _ in range(Supervisor.DECISION_WINDOW):
+        supervisor.step()
+    assert [worker["server_id"] for worker in supervisor.stopped] == ["2"]
+    assert not supervisor.started
@@ -0,0 +1,71 @@
+# Testes do cadastro no cliente: falhas passageiras são repetidas, sem pedir outro username
+import json
+
+import pytest
+
+from CodigoPython import ReturnCodes, Usuario
+
+
+class SocketFalso:
+    def __init__(self):
+        self.endpoints = []
+        self.options = []
+
+    def connect(self, endpoint):
+        self.endpoints.append(endpoint)
+
+    def setsockopt_string(self, option, value):
+        self.options.append(value)
+
+
+def usuario_com_respostas(monkeypatch, responses):
+    user = Usuario.User.__new__(Usuario.User)
+    user.username = "alice"
+    user.notificationSocket = SocketFalso()
+    sent = []
+
+    def request(package):
+        sent.append(package["username"])
+        return json.dumps(responses.pop(0)).encode()
+
+    user.request = request
+    monkeypatch.setattr(Usuario.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(Usuario.logging, "basicConfig", lambda **kwargs: None)
+    return user, sent
+
+
+@pytest.mark.parametrize("transient", [ReturnCodes.ERROR_OVERLOADED, ReturnCodes.ERROR_TIMEOUT])
+def test_falha_passageira_repete_o_mesmo_username(monkeypatch, transient):
+    user, sent = usuario_com_respostas(monkeypatch, [
+        {"ret": transient}, {"ret": transient},
+        {"ret": ReturnCodes.SUCCESS, "id": 3, "topic": "notificacao_user_3"}])
+    monkeypatch.setattr("builtins.input", lambda prompt="": pytest.fail("não deveria pedir outro username"))
+    user.sign_up()
+    assert sent == ["alice", "alice", "alice"]
+    assert user.userId == 3
+
+
+def test_username_em_uso_pede_outro(monkeypatch):
+    user, sent = usuario_com_respostas(monkeypatch, [
+        {"ret": ReturnCodes.ERROR_USERNAME_TAKEN, "id": None, "topic": None},
+        {"ret": ReturnCodes.SUCCESS, "id": 4, "topic": "notificacao_user_4"}])
+    monkeypatch.setattr("builtins.input", lambda prompt="": "alice2")
+    user.sign_up()
+    assert sent == ["alice", "alice2"]
+    assert user.username == "alice2"
+
+
+@pytest.mark.parametrize("reply, overloaded", [
+    (b'{"ret": -50, "msg": "Sistema sobrecarregado"}', True),
+    (b'{"msg": "Sistema sobrecarregado", "ret": -50}', True),
+    (b'{"ret":-50}', True),
+    (b'{"ret": -500}', False),
+    (b'[{"texto": "{\\"ret\\": -50"}]', False),
+    (b'{"ret": 0, "texto": "{\\"ret\\": -50"}', False),
+])
+def test_sobrecarga_reconhecida_pelo_ret(monkeypatch, reply, overloaded):
+    user = Usuario.User.__new__(Usuario.User)
+    replies = [reply, json.dumps({"ret": ReturnCodes.SUCCESS}).encode()]
+    user.send_and_wait = lambda serialized, idempotent: replies.pop(0)
+    monkeypatch.setattr(Usuario.time, "sleep", lambda seconds: None)
+    assert user.request({"action": "get_timeline"}) == (b'{"ret": 0}' if overloaded else reply)
@@ -0,0 +1,84 @@
+# Testes do cliente assíncrono: muitas requisições em voo em uma única conexão com o proxy
+import asyncio
+import json
+
+import zmq
+import zmq.asyncio
+
+from CodigoPython import Configuracao, ReturnCodes, UsuarioAsync
+
+
+def conexao_com_proxy_falso(count):
+    """
+    Conexão sobre um contexto próprio e um ROUTER no lugar do proxy, que só responde depois de
+    receber "count" requisições, na ordem inversa, ecoando a ação de cada uma.
+    """
+    context = zmq.asyncio.Context()
+    addresses = Configuracao.endpoints(internal="inproc", external="inproc")
+    frontend = context.socket(zmq.ROUTER)
+    frontend.bind(Configuracao.bind_address("frontend", addresses))
+
+    async def proxy_falso():
+        received = [await frontend.recv_multipart() for _ in range(count)]
+        for identity, request_id, empty, payload in reversed(received):
+            reply = {"ret": ReturnCodes.SUCCESS, "echo": json.loads(payload)["n"]}
+            await frontend.send_multipart([identity, request_id, empty, json.dumps(reply).encode()])
+
+    return UsuarioAsync.ConexaoAsync(context, addresses), proxy_falso, context, addresses
+
+
+def test_respostas_fora_de_ordem_chegam_a_cada_requisicao():
+    async def run():
+        connection, proxy_falso, _, _ = conexao_com_proxy_falso(50)
+        server = asyncio.ensure_future(proxy_falso())
+        replies = await asyncio.gather(*(connection.request({"action": "get_timeline", "n": n}, timeout=5)
+                                         for n in range(50)))
+        await server
+        connection.close()
+        return [json.loads(reply)["echo"] for reply in replies]
+
+    # Todas em voo ao mesmo tempo: o proxy falso só responde depois de receber as 50
+    assert asyncio.run(run()) == list(range(50))
+
+
+def test_notificacoes_entregues_a_fila_do_dono_do_topico():
+    async def run():
+        connection, _, context, addresses = conexao_com_proxy_falso(0)
+        shard = Configuracao.notification_shard("notificacao_user_1")
+        publisher = context.socket(zmq.PUB)
+        publisher.bind(Configuracao.bind_address("shard_public", addresses, shard=shard))
+        alice, other = asyncio.Queue(), asyncio.Queue()
+        connection.subscribe("notificacao_user_1", alice)
+        connection.subscribe("notificacao_user_10", other)
+        await asyncio.sleep(0.2)
+        await publisher.send_string("notificacao_user_1 novo post de bob")
+        message = await asyncio.wait_for(alice.get(), 2)
+        connection.close()
+        publisher.close()
+        return message, other.qsize()
+
+    assert asyncio.run(run()) == ("novo post de bob", 0)
+
+
+class ConexaoDeRespostas:
+    def __init__(self, replies):
+        self.replies = replies
+        self.sent = []
+        self.topics = []
+
+    async def request(self, package, timeout=None):
+        self.sent.append(package["username"])
+        return json.dumps(self.replies.pop(0)).encode()
+
+    def subscribe(self, topic, queue):
+        self.topics.append(topic)
+
+
+def test_cadastro_repete_o_mesmo_username_em_sobrecarga(monkeypatch):
+    monkeypatch.setattr(UsuarioAsync.random, "uniform", lambda low, high: 0)
+    connection = ConexaoDeRespostas([{"ret": ReturnCodes.ERROR_OVERLOADED},
+                                     {"ret": ReturnCodes.SUCCESS, "id": 3, "topic": "notificacao_user_3"}])
+    user = UsuarioAsync.UsuarioAsync(connection, "alice")
+    assert asyncio.run(user.sign_up()) == ReturnCodes.SUCCESS
+    assert connection.sent == ["alice", "alice"]
+    assert connection.topics == ["notificacao_user_3"]